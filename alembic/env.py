@@ -0,0 +1,55 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.database import Base, DB_URL
+import app.db.models  # noqa: F401  registra las tablas en Base.metadata
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Índices por expresión: Postgres guarda la expresión normalizada (casts) y
+# autogenerate siempre los vería distintos; se mantienen a mano en las migraciones
+INDICES_POR_EXPRESION = {"ix_publicaciones_busqueda_fts"}
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    return not (type_ == "index" and name in INDICES_POR_EXPRESION)
+
+
+def get_url() -> str:
+    # -x url=... permite apuntar a otra base (p. ej. una local para probar)
+    return context.get_x_argument(as_dictionary=True).get("url", DB_URL)
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # Engine propio, sin el statement_timeout de la app: un CREATE INDEX
+    # CONCURRENTLY sobre una tabla grande puede tardar minutos
+    connectable = create_engine(get_url(), poolclass=NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
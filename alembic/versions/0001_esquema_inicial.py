@@ -0,0 +1,82 @@
+"""Esquema inicial (tablas previas a Alembic)
+
+Las bases que ya existían se marcan con `alembic stamp 0001_esquema_inicial`.
+
+Revision ID: 0001_esquema_inicial
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_esquema_inicial"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "marcas_vehiculos",
+        sa.Column("id_marca_vehiculo", sa.Integer(), primary_key=True),
+        sa.Column("nombre_marca_vehiculo", sa.String(), nullable=False),
+    )
+    op.create_table(
+        "categorias_vehiculos",
+        sa.Column("id_categoria_vehiculo", sa.Integer(), primary_key=True),
+        sa.Column("nombre_categoria_vehiculo", sa.String(), nullable=False),
+    )
+    op.create_table(
+        "usuarios",
+        sa.Column("id_usuario", sa.Integer(), primary_key=True),
+        sa.Column("nombre_usuario", sa.String(), nullable=False),
+        sa.Column("password", sa.String(), nullable=False),
+        sa.Column("tipo_usuario", sa.String(), nullable=False),
+    )
+    op.create_table(
+        "publicaciones",
+        sa.Column("id_publicacion", sa.Integer(), primary_key=True),
+        sa.Column("id_usuario", sa.Integer(), sa.ForeignKey("usuarios.id_usuario"), nullable=False),
+        sa.Column("descripcion", sa.String(), nullable=False),
+        sa.Column("fecha_publicacion", sa.Date(), nullable=False),
+        sa.Column("descripcion_corta", sa.String(), nullable=False),
+        sa.Column("titulo", sa.String(), nullable=False),
+        sa.Column("url", sa.String(), nullable=True),
+        sa.Column("year_vehiculo", sa.Integer(), nullable=False),
+        sa.Column(
+            "id_categoria_vehiculo", sa.Integer(),
+            sa.ForeignKey("categorias_vehiculos.id_categoria_vehiculo"), nullable=False,
+        ),
+        sa.Column(
+            "id_marca_vehiculo", sa.Integer(),
+            sa.ForeignKey("marcas_vehiculos.id_marca_vehiculo"), nullable=False,
+        ),
+        sa.Column("detalle", sa.String(), nullable=False),
+    )
+    op.create_table(
+        "comentarios",
+        sa.Column("id_comentario", sa.Integer(), primary_key=True),
+        sa.Column("descripcion_comentario", sa.String(), nullable=False),
+        sa.Column("id_usuario", sa.Integer(), sa.ForeignKey("usuarios.id_usuario"), nullable=False),
+        sa.Column("id_publicacion", sa.Integer(), sa.ForeignKey("publicaciones.id_publicacion"), nullable=False),
+    )
+    op.create_table(
+        "likes",
+        sa.Column("id_like", sa.Integer(), primary_key=True),
+        sa.Column("id_usuario", sa.Integer(), sa.ForeignKey("usuarios.id_usuario"), nullable=False),
+        sa.Column("id_comentario", sa.Integer(), sa.ForeignKey("comentarios.id_comentario"), nullable=True),
+        sa.Column("id_publicacion", sa.Integer(), sa.ForeignKey("publicaciones.id_publicacion"), nullable=True),
+    )
+    op.create_table(
+        "imagenes",
+        sa.Column("id_imagen", sa.Integer(), primary_key=True),
+        sa.Column("id_publicacion", sa.Integer(), sa.ForeignKey("publicaciones.id_publicacion"), nullable=False),
+        sa.Column("url_foto", sa.String(), nullable=False),
+        sa.Column("numero_imagen", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    for tabla in ("imagenes", "likes", "comentarios", "publicaciones", "usuarios", "categorias_vehiculos", "marcas_vehiculos"):
+        op.drop_table(tabla)
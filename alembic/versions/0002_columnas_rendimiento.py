@@ -0,0 +1,84 @@
+"""Columnas de derivados, versión, contadores de likes y fecha de comentarios
+
+Revision ID: 0002_columnas_rendimiento
+Revises: 0001_esquema_inicial
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_columnas_rendimiento"
+down_revision = "0001_esquema_inicial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Búsqueda por similitud (índices trigram en 0003)
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Derivados de imagen (miniatura, tamaño medio, placeholder)
+    op.add_column("imagenes", sa.Column("url_thumb", sa.String(), nullable=True))
+    op.add_column("imagenes", sa.Column("url_medium", sa.String(), nullable=True))
+    op.add_column("imagenes", sa.Column("placeholder", sa.String(), nullable=True))
+
+    # Los DEFAULT no volátiles no reescriben la tabla (PostgreSQL 11+)
+    op.add_column(
+        "publicaciones",
+        sa.Column("fecha_actualizacion", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.add_column("publicaciones", sa.Column("like_count", sa.Integer(), nullable=False, server_default=sa.text("0")))
+    op.add_column("comentarios", sa.Column("like_count", sa.Integer(), nullable=False, server_default=sa.text("0")))
+    op.add_column(
+        "comentarios",
+        sa.Column("fecha_creacion", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+
+    # Likes duplicados de antes de las restricciones únicas (se conserva el primero)
+    op.execute(
+        """
+        DELETE FROM likes a USING likes b
+        WHERE a.id_like > b.id_like
+          AND a.id_usuario = b.id_usuario
+          AND (a.id_publicacion = b.id_publicacion OR a.id_comentario = b.id_comentario)
+        """
+    )
+    op.execute(
+        """
+        UPDATE publicaciones p SET like_count = l.total
+        FROM (SELECT id_publicacion, count(*) AS total FROM likes
+              WHERE id_publicacion IS NOT NULL GROUP BY id_publicacion) l
+        WHERE l.id_publicacion = p.id_publicacion
+        """
+    )
+    op.execute(
+        """
+        UPDATE comentarios c SET like_count = l.total
+        FROM (SELECT id_comentario, count(*) AS total FROM likes
+              WHERE id_comentario IS NOT NULL GROUP BY id_comentario) l
+        WHERE l.id_comentario = c.id_comentario
+        """
+    )
+
+    # NOT VALID no recorre la tabla: el ACCESS EXCLUSIVE del ADD dura hasta el
+    # commit de esta transacción, que termina enseguida
+    op.execute(
+        "ALTER TABLE likes ADD CONSTRAINT ck_likes_un_objetivo "
+        "CHECK ((id_comentario IS NULL) <> (id_publicacion IS NULL)) NOT VALID"
+    )
+    # VALIDATE en su propio paso (autocommit_block hace commit antes): solo toma
+    # SHARE UPDATE EXCLUSIVE mientras recorre likes, las escrituras siguen
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE likes VALIDATE CONSTRAINT ck_likes_un_objetivo")
+
+
+def downgrade() -> None:
+    op.drop_constraint("ck_likes_un_objetivo", "likes", type_="check")
+    op.drop_column("comentarios", "fecha_creacion")
+    op.drop_column("comentarios", "like_count")
+    op.drop_column("publicaciones", "like_count")
+    op.drop_column("publicaciones", "fecha_actualizacion")
+    op.drop_column("imagenes", "placeholder")
+    op.drop_column("imagenes", "url_medium")
+    op.drop_column("imagenes", "url_thumb")
@@ -0,0 +1,77 @@
+"""Índices para el feed, detalle, búsqueda, comentarios y likes (CONCURRENTLY)
+
+Se crean fuera de transacción con CREATE INDEX CONCURRENTLY para no bloquear
+escrituras. Si una corrida se corta, el índice queda inválido: al reintentar se
+borra y se vuelve a crear; los válidos se saltean.
+
+Revision ID: 0003_indices_rendimiento
+Revises: 0002_columnas_rendimiento
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migraciones import crear_indice_concurrente
+
+
+revision = "0003_indices_rendimiento"
+down_revision = "0002_columnas_rendimiento"
+branch_labels = None
+depends_on = None
+
+
+# (nombre, definición) — mismos nombres que en app/db/models.py
+INDICES = [
+    # Feed: ORDER BY fecha_publicacion DESC, id_publicacion DESC (+ seek del cursor)
+    ("ix_publicaciones_fecha_id", "ON publicaciones (fecha_publicacion, id_publicacion)"),
+    ("ix_publicaciones_marca_fecha_id", "ON publicaciones (id_marca_vehiculo, fecha_publicacion, id_publicacion)"),
+    ("ix_publicaciones_categoria_fecha_id", "ON publicaciones (id_categoria_vehiculo, fecha_publicacion, id_publicacion)"),
+    ("ix_publicaciones_usuario", "ON publicaciones (id_usuario)"),
+    # Búsqueda
+    (
+        "ix_publicaciones_busqueda_fts",
+        "ON publicaciones USING gin (to_tsvector('spanish'::regconfig, titulo || ' ' || descripcion_corta))",
+    ),
+    ("ix_publicaciones_titulo_trgm", "ON publicaciones USING gin (titulo gin_trgm_ops)"),
+    ("ix_publicaciones_descripcion_corta_trgm", "ON publicaciones USING gin (descripcion_corta gin_trgm_ops)"),
+    # Portada e imágenes ordenadas
+    ("ix_imagenes_publicacion_numero", "ON imagenes (id_publicacion, numero_imagen, id_imagen)"),
+    # Comentarios de una publicación en orden cronológico
+    ("ix_comentarios_publicacion_fecha", "ON comentarios (id_publicacion, fecha_creacion, id_comentario)"),
+    # Likes
+    ("ix_likes_publicacion", "ON likes (id_publicacion) WHERE id_publicacion IS NOT NULL"),
+    ("ix_likes_comentario", "ON likes (id_comentario) WHERE id_comentario IS NOT NULL"),
+]
+
+# Índices únicos que después respaldan las restricciones (ADD CONSTRAINT ... USING INDEX)
+RESTRICCIONES_UNICAS = [
+    ("likes", "uq_likes_usuario_publicacion", "(id_usuario, id_publicacion)"),
+    ("likes", "uq_likes_usuario_comentario", "(id_usuario, id_comentario)"),
+]
+
+
+def _restriccion_existe(nombre: str) -> bool:
+    return op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_constraint WHERE conname = :nombre"), {"nombre": nombre}
+    ).scalar() is not None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for nombre, definicion in INDICES:
+            crear_indice_concurrente(nombre, definicion)
+        for tabla, nombre, columnas in RESTRICCIONES_UNICAS:
+            crear_indice_concurrente(nombre, f"ON {tabla} {columnas}", unico=True)
+
+    # Adjuntar el índice ya construido es solo un cambio de catálogo
+    for tabla, nombre, _ in RESTRICCIONES_UNICAS:
+        if not _restriccion_existe(nombre):
+            op.execute(f"ALTER TABLE {tabla} ADD CONSTRAINT {nombre} UNIQUE USING INDEX {nombre}")
+
+
+def downgrade() -> None:
+    for tabla, nombre, _ in RESTRICCIONES_UNICAS:
+        op.execute(f"ALTER TABLE {tabla} DROP CONSTRAINT IF EXISTS {nombre}")
+    with op.get_context().autocommit_block():
+        for nombre, _ in INDICES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre}")
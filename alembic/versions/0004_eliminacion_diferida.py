@@ -0,0 +1,30 @@
+"""Tombstone de publicaciones (fecha_eliminacion) para la purga en segundo plano
+
+Revision ID: 0004_eliminacion_diferida
+Revises: 0003_indices_rendimiento
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migraciones import crear_indice_concurrente
+
+
+revision = "0004_eliminacion_diferida"
+down_revision = "0003_indices_rendimiento"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("publicaciones", sa.Column("fecha_eliminacion", sa.DateTime(timezone=True), nullable=True))
+    with op.get_context().autocommit_block():
+        crear_indice_concurrente(
+            "ix_publicaciones_eliminacion", "ON publicaciones (fecha_eliminacion) WHERE fecha_eliminacion IS NOT NULL"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_publicaciones_eliminacion")
+    op.drop_column("publicaciones", "fecha_eliminacion")
@@ -0,0 +1,25 @@
+"""Índice por url_foto para contar referencias de los objetos por contenido
+
+Revision ID: 0005_imagenes_por_contenido
+Revises: 0004_eliminacion_diferida
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+from app.db.migraciones import crear_indice_concurrente
+
+
+revision = "0005_imagenes_por_contenido"
+down_revision = "0004_eliminacion_diferida"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        crear_indice_concurrente("ix_imagenes_url_foto", "ON imagenes (url_foto)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_imagenes_url_foto")
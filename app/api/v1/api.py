@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.routers import usuario, upload,auth, categoria_vehiculo, comentario, like, marca_vehiculo, publicacion
+from app.api.v1.routers import usuario, upload,auth, categoria_vehiculo, comentario, like, marca_vehiculo, publicacion, health
 
 
 api_router = APIRouter()
@@ -10,4 +10,5 @@ api_router.include_router(comentario.router)
 api_router.include_router(like.router)
 api_router.include_router(marca_vehiculo.router)
 api_router.include_router(publicacion.router)
-api_router.include_router(upload.router)
\ No newline at end of file
+api_router.include_router(upload.router)
+api_router.include_router(health.router)
\ No newline at end of file
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from typing import List
 
+from app.core import config
+from app.core.http_cache import respuesta_cacheable
 from app.db.database import get_db
 from app.db.models import CategoriaVehiculo
 from app.schemas.categorias_vehiculos import CategoriaVehiculosCreate, CategoriaVehiculosUpdate, CategoriaVehiculosOut
+from app.services.catalog_service import categorias_catalogo
 
 router = APIRouter()
 
@@ -15,17 +18,20 @@ def create_categoria(categoria: CategoriaVehiculosCreate, db: Session = Depends(
     db.add(nueva_categoria)
     db.commit()
     db.refresh(nueva_categoria)
+    categorias_catalogo.invalidar(db)
     return nueva_categoria
 
 
 @router.get("/", response_model=List[CategoriaVehiculosOut])
-def get_all_categorias(db: Session = Depends(get_db)):
-    return db.query(CategoriaVehiculo).all()
+def get_all_categorias(request: Request, db: Session = Depends(get_db)):
+    # Servido desde el catálogo en memoria; 304 si el navegador ya tiene esta versión
+    categorias, etag = categorias_catalogo.obtener(db)
+    return respuesta_cacheable(request, categorias, etag, config.CATALOG_CACHE_CONTROL)
 
 
 @router.get("/{categoria_id}", response_model=CategoriaVehiculosOut)
 def get_categoria(categoria_id: int, db: Session = Depends(get_db)):
-    categoria = db.query(CategoriaVehiculo).filter(CategoriaVehiculo.id_categoria_vehiculo == categoria_id).first()
+    categoria = categorias_catalogo.buscar(db, categoria_id)
     if not categoria:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     return categoria
@@ -46,6 +52,7 @@ def update_categoria(
 
     db.commit()
     db.refresh(categoria)
+    categorias_catalogo.invalidar(db)
     return categoria
 
 
@@ -57,3 +64,4 @@ def delete_categoria(categoria_id: int, db: Session = Depends(get_db)):
 
     db.delete(categoria)
     db.commit()
+    categorias_catalogo.invalidar(db)
@@ -1,75 +1,105 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from typing import List, Optional
 
+from app.core.pagination import encode_cursor, decode_cursor
 from app.db.database import get_db
 from app.db.models import Comentario, Usuario
 from app.schemas.comentarios import ComentarioCreate, ComentarioOut
 
 router = APIRouter()
 
+
+def comentario_dict(comentario: Comentario, nombre_usuario: Optional[str]) -> dict:
+    # Una sola pasada de pydantic: la validación de response_model
+    return {
+        "id_comentario": comentario.id_comentario,
+        "descripcion_comentario": comentario.descripcion_comentario,
+        "id_usuario": comentario.id_usuario,
+        "id_publicacion": comentario.id_publicacion,
+        "like_count": comentario.like_count,
+        "nombre_usuario": nombre_usuario or f"Usuario {comentario.id_usuario}",
+        "fecha_comentario": comentario.fecha_creacion,
+    }
+
+
+def pagina_comentarios(
+    db: Session, filtros: list, limit: int, cursor: Optional[str], request: Request, response: Response
+) -> List[dict]:
+    """
+    Comentarios en orden cronológico, paginados por (fecha_creacion, id_comentario).
+
+    El cuerpo sigue siendo la lista de siempre; la página siguiente va en el
+    header Link (rel="next"), sin header en la última página.
+    """
+    stmt = (
+        select(Comentario, Usuario.nombre_usuario)
+        .join(Usuario, Comentario.id_usuario == Usuario.id_usuario)
+        .where(*filtros)
+        .order_by(Comentario.fecha_creacion, Comentario.id_comentario)
+        .limit(limit + 1)  # Una fila extra para saber si hay página siguiente
+    )
+    if cursor:
+        stmt = stmt.where(
+            tuple_(Comentario.fecha_creacion, Comentario.id_comentario) > tuple_(*decode_cursor(cursor))
+        )
+    filas = db.execute(stmt).all()
+
+    hay_mas = len(filas) > limit
+    filas = filas[:limit]
+    if hay_mas:
+        ultimo = filas[-1].Comentario
+        siguiente = request.url.include_query_params(
+            cursor=encode_cursor(ultimo.fecha_creacion, ultimo.id_comentario)
+        )
+        response.headers["Link"] = f'<{siguiente}>; rel="next"'
+    return [comentario_dict(c, nombre) for c, nombre in filas]
+
+
 @router.post("/", response_model=ComentarioOut, status_code=status.HTTP_201_CREATED)
 def crear_comentario(comentario: ComentarioCreate, db: Session = Depends(get_db)):
     nuevo_comentario = Comentario(**comentario.dict())
     db.add(nuevo_comentario)
     db.commit()
     db.refresh(nuevo_comentario)
-    
+
     # Obtener el nombre del usuario para la respuesta
-    usuario = db.query(Usuario).filter(Usuario.id_usuario == nuevo_comentario.id_usuario).first()
-    
-    # Crear respuesta con campos adicionales
-    response = ComentarioOut.from_orm(nuevo_comentario)
-    response.nombre_usuario = usuario.nombre_usuario if usuario else f"Usuario {nuevo_comentario.id_usuario}"
-    response.fecha_comentario = "hace un momento"  # Como no tienes fecha en BD
-    
-    return response
+    nombre_usuario = db.scalar(
+        select(Usuario.nombre_usuario).where(Usuario.id_usuario == nuevo_comentario.id_usuario)
+    )
+    return comentario_dict(nuevo_comentario, nombre_usuario)
+
 
 @router.get("/", response_model=List[ComentarioOut])
-def obtener_comentarios(db: Session = Depends(get_db)):
-    # Obtener comentarios con JOIN para incluir nombre de usuario
-    comentarios = (
-        db.query(Comentario, Usuario.nombre_usuario)
-        .join(Usuario, Comentario.id_usuario == Usuario.id_usuario)
-        .all()
-    )
-    
-    # Formatear respuesta
-    result = []
-    for comentario, nombre_usuario in comentarios:
-        comment_dict = ComentarioOut.from_orm(comentario).dict()
-        comment_dict['nombre_usuario'] = nombre_usuario
-        comment_dict['fecha_comentario'] = "Sin fecha"  # Como no tienes fecha en BD
-        result.append(ComentarioOut(**comment_dict))
-    
-    return result
+def obtener_comentarios(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    return pagina_comentarios(db, [], limit, cursor, request, response)
+
 
 @router.get("/publicacion/{id_publicacion}", response_model=List[ComentarioOut])
-def obtener_comentarios_por_publicacion(id_publicacion: int, db: Session = Depends(get_db)):
-    # Obtener comentarios de la publicación con JOIN para incluir nombre de usuario
-    comentarios = (
-        db.query(Comentario, Usuario.nombre_usuario)
-        .join(Usuario, Comentario.id_usuario == Usuario.id_usuario)
-        .filter(Comentario.id_publicacion == id_publicacion)
-        .all()
-    )
-    
-    # Formatear respuesta
-    result = []
-    for comentario, nombre_usuario in comentarios:
-        comment_dict = ComentarioOut.from_orm(comentario).dict()
-        comment_dict['nombre_usuario'] = nombre_usuario
-        comment_dict['fecha_comentario'] = "Sin fecha"  # Como no tienes fecha en BD
-        result.append(ComentarioOut(**comment_dict))
-    
-    return result
+def obtener_comentarios_por_publicacion(
+    id_publicacion: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    # Usa ix_comentarios_publicacion_fecha: filtro y orden salen del índice
+    return pagina_comentarios(db, [Comentario.id_publicacion == id_publicacion], limit, cursor, request, response)
+
 
 @router.delete("/{id_comentario}", status_code=status.HTTP_204_NO_CONTENT)
 def eliminar_comentario(id_comentario: int, db: Session = Depends(get_db)):
     comentario = db.query(Comentario).filter(Comentario.id_comentario == id_comentario).first()
     if not comentario:
         raise HTTPException(status_code=404, detail="Comentario no encontrado")
-    
+
     db.delete(comentario)
-    db.commit()
\ No newline at end of file
+    db.commit()
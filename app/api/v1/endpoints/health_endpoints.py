@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+
+from app.db.database import get_pool_stats
+from app.services.detail_cache import detalle_cache
+from app.services.purge_service import metricas_purga
+
+router = APIRouter()
+
+
+@router.get("/db-pool")
+def estado_pool():
+    # Conexiones en uso, overflow y tiempos de espera del pool de esta instancia
+    return get_pool_stats()
+
+
+@router.get("/cache")
+def estado_cache():
+    # Hit ratio de la cache de detalle de publicaciones (contadores de esta instancia)
+    return {"detalle_publicacion": detalle_cache.stats()}
+
+
+@router.get("/purga")
+def estado_purga():
+    # Publicaciones purgadas / fallidas, reintentos y blobs borrados en esta instancia
+    return metricas_purga.stats()
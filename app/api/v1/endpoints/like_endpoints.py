@@ -1,49 +1,196 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, update, delete, and_, false
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from app.db.database import get_db
-from app.db.models import Like
-from app.schemas.likes import LikesCreate, LikesOut
+from app.core import config
+from app.core.security import get_current_user_opcional
+from app.db.database import get_async_db
+from app.db.models import Like, Publicacion, Comentario
+from app.schemas.likes import LikesCreate, LikesOut, LikeToggleOut, LikeEstadoOut
+from app.services.detail_cache import detalle_cache
 
 router = APIRouter()
 
-@router.post("/", response_model=LikesOut, status_code=status.HTTP_201_CREATED)
-def dar_like(like: LikesCreate, db: Session = Depends(get_db)):
+
+def validar_objetivo(like: LikesCreate) -> None:
     if (like.id_comentario is None and like.id_publicacion is None) or \
        (like.id_comentario is not None and like.id_publicacion is not None):
         raise HTTPException(status_code=400, detail="Debe especificar solo un tipo de like: comentario o publicación")
 
-    # Evitar duplicados (usuario ya dio like)
-    ya_existe = db.query(Like).filter(
-        Like.id_usuario == like.id_usuario,
-        Like.id_comentario == like.id_comentario,
-        Like.id_publicacion == like.id_publicacion
-    ).first()
 
-    if ya_existe:
-        raise HTTPException(status_code=400, detail="Ya diste like")
+def filtro_like(like: LikesCreate):
+    # Exactamente uno de los dos objetivos viene informado (validar_objetivo)
+    if like.id_publicacion is not None:
+        return and_(Like.id_usuario == like.id_usuario, Like.id_publicacion == like.id_publicacion)
+    return and_(Like.id_usuario == like.id_usuario, Like.id_comentario == like.id_comentario)
+
+
+async def insertar_like(db: AsyncSession, like: LikesCreate):
+    """
+    INSERT ... ON CONFLICT DO NOTHING sobre las restricciones únicas de likes:
+    dos toques simultáneos no duplican. Devuelve el id nuevo o None si ya existía.
+    """
+    try:
+        return await db.scalar(
+            insert(Like)
+            .values(**like.dict())
+            .on_conflict_do_nothing()
+            .returning(Like.id_like)
+        )
+    except IntegrityError:
+        # FK: la publicación / comentario (o el usuario) no existe
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Publicación o comentario no encontrado")
+
+
+async def ajustar_contador(db: AsyncSession, like: LikesCreate, delta: int) -> int:
+    """Suma delta a like_count del objetivo en la misma transacción y devuelve el valor nuevo."""
+    if like.id_publicacion is not None:
+        # fecha_actualizacion se mueve por onupdate: el detalle y el feed muestran el contador
+        stmt = (
+            update(Publicacion)
+            .where(Publicacion.id_publicacion == like.id_publicacion)
+            .values(like_count=Publicacion.like_count + delta)
+            .returning(Publicacion.like_count)
+        )
+    else:
+        stmt = (
+            update(Comentario)
+            .where(Comentario.id_comentario == like.id_comentario)
+            .values(like_count=Comentario.like_count + delta)
+            .returning(Comentario.like_count)
+        )
+    return await db.scalar(stmt)
+
+
+async def contador_actual(db: AsyncSession, like: LikesCreate) -> int:
+    if like.id_publicacion is not None:
+        stmt = select(Publicacion.like_count).where(Publicacion.id_publicacion == like.id_publicacion)
+    else:
+        stmt = select(Comentario.like_count).where(Comentario.id_comentario == like.id_comentario)
+    return await db.scalar(stmt) or 0
+
+
+async def despues_de_cambio(like: LikesCreate) -> None:
+    if like.id_publicacion is not None:
+        await detalle_cache.invalidar(like.id_publicacion)
+
+
+@router.post("/", response_model=LikesOut, status_code=status.HTTP_201_CREATED)
+async def dar_like(like: LikesCreate, db: AsyncSession = Depends(get_async_db)):
+    validar_objetivo(like)
+
+    for _ in range(2):
+        id_like = await insertar_like(db, like)
+        if id_like is not None:
+            break
+        # Mismo contrato que antes: un like repetido es un 400
+        if await db.scalar(select(Like.id_like).where(filtro_like(like))) is not None:
+            raise HTTPException(status_code=400, detail="Ya diste like")
+        # Otro request lo quitó entre el INSERT y el SELECT: se intenta de nuevo
+    else:
+        raise HTTPException(status_code=409, detail="El like cambió mientras se registraba, intente de nuevo")
+
+    await ajustar_contador(db, like, 1)
+    await db.commit()
+    await despues_de_cambio(like)
+    return {**like.dict(), "id_like": id_like}
+
+
+@router.post("/toggle", response_model=LikeToggleOut)
+async def alternar_like(like: LikesCreate, db: AsyncSession = Depends(get_async_db)):
+    """Da o quita el like según el estado actual; devuelve el estado y el contador nuevos."""
+    validar_objetivo(like)
+
+    if await insertar_like(db, like) is not None:
+        liked, like_count = True, await ajustar_contador(db, like, 1)
+    else:
+        borrado = await db.scalar(delete(Like).where(filtro_like(like)).returning(Like.id_like))
+        if borrado is not None:
+            liked, like_count = False, await ajustar_contador(db, like, -1)
+        else:
+            # Otro request lo quitó entre el INSERT y el DELETE
+            liked, like_count = False, await contador_actual(db, like)
+
+    await db.commit()
+    await despues_de_cambio(like)
+    return {"liked": liked, "like_count": like_count}
+
+
+async def estado_likes(db: AsyncSession, modelo, columna_id, columna_like, ids: List[int], usuario: Optional[dict]):
+    """
+    Contador y "¿le di like?" de varios objetivos en una sola query: el contador
+    sale de like_count y el estado de un LEFT JOIN por la restricción única.
+    El usuario es el del token: el estado de likes de otro no se puede consultar.
+    """
+    if len(ids) > config.LIKES_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {config.LIKES_BATCH_MAX} ids por consulta")
+
+    if usuario is None:
+        stmt = select(columna_id.label("id"), modelo.like_count, false().label("liked"))
+    else:
+        stmt = (
+            select(columna_id.label("id"), modelo.like_count, Like.id_like.is_not(None).label("liked"))
+            .outerjoin(Like, and_(columna_like == columna_id, Like.id_usuario == usuario["id"]))
+        )
+    filas = (await db.execute(stmt.where(columna_id.in_(set(ids))))).all()
+    return [{"id": f.id, "like_count": f.like_count, "liked": f.liked} for f in filas]
+
+
+@router.get("/publicaciones", response_model=List[LikeEstadoOut])
+async def likes_de_publicaciones(
+    ids: List[int] = Query(...),
+    usuario: Optional[dict] = Depends(get_current_user_opcional),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Contador de cada publicación; `liked` solo con token (sin token, siempre false)."""
+    return await estado_likes(db, Publicacion, Publicacion.id_publicacion, Like.id_publicacion, ids, usuario)
+
+
+@router.get("/comentarios", response_model=List[LikeEstadoOut])
+async def likes_de_comentarios(
+    ids: List[int] = Query(...),
+    usuario: Optional[dict] = Depends(get_current_user_opcional),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Contador de cada comentario; `liked` solo con token (sin token, siempre false)."""
+    return await estado_likes(db, Comentario, Comentario.id_comentario, Like.id_comentario, ids, usuario)
 
-    nuevo_like = Like(**like.dict())
-    db.add(nuevo_like)
-    db.commit()
-    db.refresh(nuevo_like)
-    return nuevo_like
 
 @router.get("/", response_model=List[LikesOut])
-def obtener_likes(db: Session = Depends(get_db)):
-    return db.query(Like).all()
+async def obtener_likes(
+    limit: int = Query(100, ge=1, le=500),
+    despues_de: Optional[int] = Query(None, description="id_like del último elemento de la página anterior"),
+    id_usuario: Optional[int] = Query(None),
+    id_publicacion: Optional[int] = Query(None),
+    id_comentario: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Paginado por id_like (keyset) en lugar de devolver la tabla completa
+    stmt = select(Like).order_by(Like.id_like).limit(limit)
+    if despues_de is not None:
+        stmt = stmt.where(Like.id_like > despues_de)
+    if id_usuario is not None:
+        stmt = stmt.where(Like.id_usuario == id_usuario)
+    if id_publicacion is not None:
+        stmt = stmt.where(Like.id_publicacion == id_publicacion)
+    if id_comentario is not None:
+        stmt = stmt.where(Like.id_comentario == id_comentario)
+    return (await db.scalars(stmt)).all()
+
 
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
-def quitar_like(like: LikesCreate, db: Session = Depends(get_db)):
-    like_db = db.query(Like).filter(
-        Like.id_usuario == like.id_usuario,
-        Like.id_comentario == like.id_comentario,
-        Like.id_publicacion == like.id_publicacion
-    ).first()
-
-    if not like_db:
+async def quitar_like(like: LikesCreate, db: AsyncSession = Depends(get_async_db)):
+    validar_objetivo(like)
+
+    # DELETE ... RETURNING: solo descuenta quien realmente borró la fila
+    borrado = await db.scalar(delete(Like).where(filtro_like(like)).returning(Like.id_like))
+    if borrado is None:
         raise HTTPException(status_code=404, detail="Like no encontrado")
 
-    db.delete(like_db)
-    db.commit()
+    await ajustar_contador(db, like, -1)
+    await db.commit()
+    await despues_de_cambio(like)
@@ -1,27 +1,38 @@
 from fastapi import APIRouter, Depends, Header, HTTPException, status, Response, Cookie
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.db.models import Usuario
-from app.core.security import verify_password, create_access_token, decode_token
+from app.core.security import verify_password_async, create_access_token, decode_token
 
 router = APIRouter()
 
 @router.post("/login")
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    usuario = db.query(Usuario).filter(Usuario.nombre_usuario == form_data.username).first()
+    usuario = await db.scalar(select(Usuario).where(Usuario.nombre_usuario == form_data.username))
+    # Se devuelve la conexión antes de bcrypt (no se retiene mientras se verifica)
+    await db.commit()
 
-    if not usuario or not verify_password(form_data.password, usuario.password):
+    valida, nuevo_hash = (
+        await verify_password_async(form_data.password, usuario.password) if usuario else (False, None)
+    )
+    if not valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales incorrectas",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if nuevo_hash:
+        # Cambió BCRYPT_ROUNDS: se guarda el hash con el costo actual
+        usuario.password = nuevo_hash
+        await db.commit()
+
     access_token = create_access_token(data={
         "sub": usuario.nombre_usuario, 
         "id": usuario.id_usuario,
@@ -34,7 +45,8 @@ def login(
     }
 
 @router.get("/me")
-def me(authorization: str = Header(None), db: Session = Depends(get_db)):
+async def me(authorization: str = Header(None)):
+    # Todo sale del token: no necesita sesión de base
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="No autorizado")
     
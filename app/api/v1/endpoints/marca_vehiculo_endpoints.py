@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from typing import List
 
+from app.core import config
+from app.core.http_cache import respuesta_cacheable
 from app.db.database import get_db
 from app.db.models import MarcaVehiculo
 from app.schemas.marcas_vehiculos import MarcaVehiculoCreate, MarcaVehiculosUpdate, MarcaVehiculosOut
+from app.services.catalog_service import marcas_catalogo
 
 router = APIRouter()
 
@@ -18,17 +21,20 @@ def create_brand(
     db.add(nueva_marca)
     db.commit()
     db.refresh(nueva_marca)
+    marcas_catalogo.invalidar(db)
     return nueva_marca
 
 
 @router.get("/", response_model=List[MarcaVehiculosOut])
-def get_all_brands(db: Session = Depends(get_db)):
-    return db.query(MarcaVehiculo).all()
+def get_all_brands(request: Request, db: Session = Depends(get_db)):
+    # Servido desde el catálogo en memoria; 304 si el navegador ya tiene esta versión
+    marcas, etag = marcas_catalogo.obtener(db)
+    return respuesta_cacheable(request, marcas, etag, config.CATALOG_CACHE_CONTROL)
 
 
 @router.get("/{marca_id}", response_model=MarcaVehiculosOut)
 def get_brand(marca_id: str, db: Session = Depends(get_db)):
-    marca = db.query(MarcaVehiculo).filter(MarcaVehiculo.id_marca_vehiculo == marca_id).first()
+    marca = marcas_catalogo.buscar(db, int(marca_id)) if marca_id.isdigit() else None
     if not marca:
         raise HTTPException(status_code=404, detail="Marca no encontrada")
     return marca
@@ -49,6 +55,7 @@ def update_brand(
 
     db.commit()
     db.refresh(marca)
+    marcas_catalogo.invalidar(db)
     return marca
 
 
@@ -60,3 +67,4 @@ def delete_brand(marca_id: str, db: Session = Depends(get_db)):
 
     db.delete(marca)
     db.commit()
+    marcas_catalogo.invalidar(db)
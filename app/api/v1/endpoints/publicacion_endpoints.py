@@ -1,307 +1,558 @@
-from fastapi import APIRouter, Depends, UploadFile, HTTPException, Form, status, File, Query, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, HTTPException, status, Query, Request, Response, BackgroundTasks
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import tuple_, select, func, delete, update, and_, true
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime
-from google.cloud import storage
+from datetime import datetime, time
 from app.core.security import get_current_user
-from app.db.database import get_db
-from app.db.models import Publicacion, Imagen, Usuario, MarcaVehiculo, CategoriaVehiculo
-from app.schemas.publicaciones import PublicacionCreate, PublicacionOut, PublicacionDetails, PublicacionEditDetails
-from app.schemas.imagenes import ImageCreate, ImagenOut
-from google.cloud.exceptions import NotFound
-import os
+from app.db.database import get_async_db
+from app.db.models import Publicacion, Imagen, MarcaVehiculo, CategoriaVehiculo
+from app.schemas.publicaciones import (
+    PublicacionCreate, PublicacionOut, PublicacionDetails, PublicacionEditDetails,
+    PublicacionFormulario, PublicacionEdicionFormulario, PublicacionesLote,
+)
+from app.schemas.imagenes import ImageCreate, ImagenOut, ImagenesFinalizar
+from app.services.storage_service import inspeccionar_blobs, public_url
+from app.services.image_service import generar_derivados_imagenes, liberar_subidas
+from app.services.ingest_service import recibir_formulario, esquema_multipart, subida_directa_valida, BYTES_FIRMA
+from app.services.purge_service import purgar_publicacion
+from app.services.search_service import condicion_busqueda, relevancia
+from app.services.publicacion_queries import (
+    vigente, filtros_publicacion, select_tarjetas, select_total, select_detalle,
+)
+from app.services.cache import TTLCache
+from app.services.catalog_service import version_catalogos
+from app.services.detail_cache import detalle_cache
+from app.core.http_cache import cliente_actualizado, fecha_http
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core import config
+import orjson
 import uuid
-from urllib.parse import urlparse
+import hashlib
 from pathlib import Path
 
 router = APIRouter()
-BUCKET_NAME = os.getenv("BUCKET_NAME")
-
-# --- Helper para subir imagen ---
-def upload_to_gcs(file: UploadFile):
-    client = storage.Client()  # credenciales de GOOGLE_APPLICATION_CREDENTIALS
-    bucket = client.bucket(BUCKET_NAME)
-    blob = bucket.blob(file.filename)
-    blob.upload_from_file(file.file, content_type=file.content_type)
-    return f"https://storage.googleapis.com/{BUCKET_NAME}/{file.filename}"
 
+# Conteos de facetas por combinación de filtros (TTL corto)
+facetas_cache = TTLCache(ttl=config.FACETS_CACHE_TTL, maxsize=config.FACETS_CACHE_MAXSIZE)
 
 # --- Crear publicación ---
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", status_code=status.HTTP_201_CREATED, openapi_extra=esquema_multipart(PublicacionFormulario))
 async def crear_publicacion(
-    titulo: str = Form(...),
-    descripcion_corta: str = Form(...),
-    descripcion: str = Form(...),
-    detalle: str = Form(...),
-    url: str = Form(None),
-    year_vehiculo: int = Form(...),
-    id_categoria_vehiculo: int = Form(...),
-    id_marca_vehiculo: int = Form(...),
-    files: List[UploadFile] = File(...),
-    db: Session = Depends(get_db),
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
+    # Las imágenes ("files", vacío si se suben directo al bucket) van a GCS a medida que llegan
+    datos, archivos = await recibir_formulario(request, db, PublicacionFormulario)
+    subidas = [a.url for a in archivos]
     try:
         nueva = Publicacion(
             id_usuario=current_user["id"],
-            titulo=titulo,
-            descripcion_corta=descripcion_corta,
-            descripcion=descripcion,
-            detalle=detalle,
-            url=url,
-            year_vehiculo=year_vehiculo,
-            id_categoria_vehiculo=id_categoria_vehiculo,
-            id_marca_vehiculo=id_marca_vehiculo,
+            **datos.model_dump(),
             fecha_publicacion=datetime.utcnow()
         )
         db.add(nueva)
-        db.commit()
-        db.refresh(nueva)
+        await db.flush()  # Para obtener id_publicacion
 
         # Crear imágenes con número secuencial (la primera será la portada)
-        for idx, file in enumerate(files):
-            img_url = upload_to_gcs(file)
+        nuevas_imagenes = []
+        for idx, img_url in enumerate(subidas):
             nueva_img = Imagen(
                 id_publicacion=nueva.id_publicacion,
                 url_foto=img_url,
                 numero_imagen=idx + 1  # Numeración desde 1
             )
             db.add(nueva_img)
+            nuevas_imagenes.append(nueva_img)
+
+        await db.commit()
 
-        db.commit()
-        db.refresh(nueva)
+        # Miniaturas y WebP se generan después de responder
+        background_tasks.add_task(generar_derivados_imagenes, [img.id_imagen for img in nuevas_imagenes])
 
-        return {"id": nueva.id_publicacion, "titulo": nueva.titulo, "imagenes": [f.filename for f in files]}
+        return {"id": nueva.id_publicacion, "titulo": nueva.titulo, "imagenes": [a.filename for a in archivos]}
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        # No dejar en el bucket imágenes que no quedaron registradas (si nadie más las usa)
+        await liberar_subidas(db, subidas)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# --- Helpers para GET condicional (ETag / Last-Modified) ---
+def calcular_etag_version(catalogos: str, *partes) -> str:
+    """
+    ETag a partir de la versión de los datos (no del cuerpo), así se puede
+    responder 304 antes de correr los joins. Incluye la versión de los catálogos
+    (version_catalogos) porque las respuestas llevan nombres de marca y categoría.
+    """
+    base = "|".join(str(p) for p in (*partes, catalogos))
+    return '"' + hashlib.sha1(base.encode()).hexdigest() + '"'
+
+
+def headers_de_cache(etag: str, ultima_modificacion, cache_control: str) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if ultima_modificacion is not None:
+        headers["Last-Modified"] = fecha_http(ultima_modificacion)
+    return headers
+
+
+async def marcar_actualizada(db: AsyncSession, id_publicacion: int) -> None:
+    """Mueve fecha_actualizacion cuando cambian solo las imágenes de la publicación."""
+    await db.execute(
+        update(Publicacion)
+        .where(Publicacion.id_publicacion == id_publicacion)
+        .values(fecha_actualizacion=func.now())
+    )
+
+
+# --- Helpers para las respuestas ---
+def fecha_hora(fecha) -> datetime:
+    """fecha_publicacion (date) como datetime, el tipo que declaran los esquemas de detalle."""
+    return datetime.combine(fecha, time.min)
+
+
+def tarjeta(fila) -> dict:
+    # Solo tipos nativos (int, str, date): van directo a orjson sin jsonable_encoder
+    return {
+        "id": fila.id_publicacion,
+        "titulo": fila.titulo,
+        "descripcion_corta": fila.descripcion_corta,
+        "url_portada": fila.url_portada,
+        "url_portada_thumb": fila.url_portada_thumb,
+        "placeholder_portada": fila.placeholder_portada,
+        "year_vehiculo": fila.year_vehiculo,
+        "id_marca_vehiculo": fila.id_marca_vehiculo,
+        "nombre_marca_vehiculo": fila.nombre_marca_vehiculo,
+        "id_categoria_vehiculo": fila.id_categoria_vehiculo,
+        "nombre_categoria_vehiculo": fila.nombre_categoria_vehiculo,
+        "fecha_publicacion": fila.fecha_publicacion,
+        "like_count": fila.like_count
+    }
+
+
 # --- Listar publicaciones ---
 @router.get("/", status_code=status.HTTP_200_OK)
 async def listar_publicaciones(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(7, ge=1, le=50),
+    cursor: Optional[str] = Query(None),
     marca: Optional[int] = Query(None),
     año: Optional[int] = Query(None),
     modelo: Optional[str] = Query(None),
     categoria: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    # Si viene cursor se pagina por (fecha_publicacion, id_publicacion) e ignora skip
+    posicion = decode_cursor(cursor) if cursor else None
+
     try:
-        query = db.query(Publicacion)
-
-        if marca:
-            query = query.filter(Publicacion.id_marca_vehiculo == marca)
-        if año:
-            query = query.filter(Publicacion.year_vehiculo == año)
-        if modelo and modelo.strip():
-            query = query.filter(Publicacion.titulo.ilike(f"%{modelo.strip()}%"))
-        if categoria:
-            query = query.filter(Publicacion.id_categoria_vehiculo == categoria)
-
-        total = query.count()
-        
+        filtros = filtros_publicacion(marca, año, modelo, categoria)
+
+        total = None
+        if posicion:
+            # Seek sobre la tupla del orden: no recorre las filas anteriores como OFFSET.
+            # Tampoco se cuenta: count(*) y max() recorren todas las filas que
+            # coinciden, y el total ya vino con la primera página
+            filtros.append(
+                tuple_(Publicacion.fecha_publicacion, Publicacion.id_publicacion) < tuple_(*posicion)
+            )
+            skip = 0
+        else:
+            total, ultima_modificacion = (await db.execute(select_total(filtros))).one()
+
+            # 304 antes de traer la página si no cambió nada con estos filtros
+            etag = calcular_etag_version(await version_catalogos(db), request.url.query, total, ultima_modificacion)
+            headers = headers_de_cache(etag, ultima_modificacion, config.LISTADO_CACHE_CONTROL)
+            if cliente_actualizado(request, etag, ultima_modificacion):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
         # Ordenar por fecha de publicación descendente (más nuevo primero)
         # Agregamos también id_publicacion desc como criterio secundario para consistencia
-        publicaciones = (
-            query.order_by(
+        resultado = await db.execute(
+            select_tarjetas(Publicacion.fecha_actualizacion)
+            .where(*filtros)
+            .order_by(
                 Publicacion.fecha_publicacion.desc(),
                 Publicacion.id_publicacion.desc()
             )
             .offset(skip)
-            .limit(limit)
-            .all()
+            .limit(limit + 1)  # Una fila extra para saber si hay página siguiente
         )
+        filas = resultado.all()
 
-        resultados = []
-        for pub in publicaciones:
-            # Buscar la imagen portada (la primera imagen: numero_imagen = 1)
-            portada = (
-                db.query(Imagen)
-                .filter(
-                    Imagen.id_publicacion == pub.id_publicacion,
-                    Imagen.numero_imagen == 1
-                )
-                .first()
-            )
-            marca_nombre = (
-                db.query(MarcaVehiculo.nombre_marca_vehiculo)
-                .filter(MarcaVehiculo.id_marca_vehiculo == pub.id_marca_vehiculo)
-                .scalar()
+        hay_mas = len(filas) > limit
+        filas = filas[:limit]
+        next_cursor = (
+            encode_cursor(filas[-1].fecha_publicacion, filas[-1].id_publicacion)
+            if hay_mas else None
+        )
+
+        if posicion:
+            # ETag de la página misma: qué filas trae y cuándo cambió la última.
+            # Sin Last-Modified: una fila borrada de la página no lo movería
+            ultima_modificacion = max((fila.fecha_actualizacion for fila in filas), default=None)
+            etag = calcular_etag_version(
+                await version_catalogos(db),
+                request.url.query, hay_mas, ultima_modificacion, *(fila.id_publicacion for fila in filas)
             )
-            categoria_nombre = (
-                db.query(CategoriaVehiculo.nombre_categoria_vehiculo)
-                .filter(CategoriaVehiculo.id_categoria_vehiculo == pub.id_categoria_vehiculo)
-                .scalar()
+            headers = headers_de_cache(etag, None, config.LISTADO_CACHE_CONTROL)
+            if cliente_actualizado(request, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        resultados = [tarjeta(fila) for fila in filas]
+
+        return ORJSONResponse({"total": total, "publicaciones": resultados, "next_cursor": next_cursor}, headers=headers)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en búsqueda: {str(e)}")
+
+
+# --- Buscar publicaciones por relevancia ---
+@router.get("/buscar", status_code=status.HTTP_200_OK)
+async def buscar_publicaciones(
+    q: str = Query(..., min_length=1, max_length=100),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(7, ge=1, le=50),
+    marca: Optional[int] = Query(None),
+    año: Optional[int] = Query(None),
+    categoria: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Búsqueda en título, descripción corta y marca con stemming en español y
+    tolerancia a errores de tipeo, ordenada por relevancia.
+    """
+    texto = q.strip()
+    if not texto:
+        raise HTTPException(status_code=400, detail="Debe indicar un texto a buscar")
+
+    try:
+        filtros = filtros_publicacion(marca, año, texto, categoria)
+        total = await db.scalar(select_total(filtros))
+
+        puntaje = relevancia(texto).label("relevancia")
+        resultado = await db.execute(
+            select_tarjetas(puntaje)
+            .where(*filtros)
+            .order_by(
+                puntaje.desc(),
+                Publicacion.fecha_publicacion.desc(),
+                Publicacion.id_publicacion.desc()
             )
-            resultados.append({
-                "id": pub.id_publicacion,
-                "titulo": pub.titulo,
-                "descripcion_corta": pub.descripcion_corta,
-                "url_portada": portada.url_foto if portada else None,
-                "year_vehiculo": pub.year_vehiculo,
-                "id_marca_vehiculo": pub.id_marca_vehiculo,
-                "nombre_marca_vehiculo": marca_nombre,
-                "id_categoria_vehiculo": pub.id_categoria_vehiculo,
-                "nombre_categoria_vehiculo": categoria_nombre,
-                "fecha_publicacion": pub.fecha_publicacion
-            })
-
-        return {"total": total, "publicaciones": resultados}
+            .offset(skip)
+            .limit(limit)
+        )
+
+        resultados = []
+        for fila in resultado.all():
+            item = tarjeta(fila)
+            item["relevancia"] = round(float(fila.relevancia), 4)
+            resultados.append(item)
+
+        return ORJSONResponse({"total": total, "publicaciones": resultados})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en búsqueda: {str(e)}")
 
 
-# --- Obtener publicación detalle ---
-@router.get("/{id_publicacion}", response_model=PublicacionDetails)
-async def obtener_publicacion(id_publicacion: int, db: Session = Depends(get_db)):
-    pub = (
-        db.query(Publicacion, Usuario.nombre_usuario, MarcaVehiculo.nombre_marca_vehiculo, CategoriaVehiculo.nombre_categoria_vehiculo)
-        .join(Usuario, Usuario.id_usuario == Publicacion.id_usuario)
-        .join(MarcaVehiculo, MarcaVehiculo.id_marca_vehiculo == Publicacion.id_marca_vehiculo)
-        .join(CategoriaVehiculo, CategoriaVehiculo.id_categoria_vehiculo == Publicacion.id_categoria_vehiculo)
-        .filter(Publicacion.id_publicacion == id_publicacion)
-        .first()
-    )
-    if not pub:
-        raise HTTPException(status_code=404, detail="Publicación no encontrada")
-    publicacion, nombre_usuario, nombre_marca, nombre_categoria = pub
-
-    # La portada es la primera imagen (numero_imagen = 1)
-    portada = (
-        db.query(Imagen)
-        .filter(
-            Imagen.id_publicacion == publicacion.id_publicacion,
-            Imagen.numero_imagen == 1
+# --- Conteos por faceta para la barra de filtros ---
+@router.get("/facetas", status_code=status.HTTP_200_OK)
+async def obtener_facetas(
+    marca: Optional[int] = Query(None),
+    año: Optional[int] = Query(None),
+    modelo: Optional[str] = Query(None),
+    categoria: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Cantidad de publicaciones por marca, categoría y año con los filtros actuales.
+
+    Cada faceta se cuenta aplicando los demás filtros pero no el propio, así la barra
+    puede mostrar cuántas hay en las otras opciones. Todo sale de una sola query con
+    GROUPING SETS.
+    """
+    texto = modelo.strip().lower() if modelo and modelo.strip() else None
+    clave = (marca, año, texto, categoria)
+    cacheado = facetas_cache.get(clave)
+    if cacheado is not None:
+        return cacheado
+
+    try:
+        cond_marca = Publicacion.id_marca_vehiculo == marca if marca else true()
+        cond_categoria = Publicacion.id_categoria_vehiculo == categoria if categoria else true()
+        cond_year = Publicacion.year_vehiculo == año if año else true()
+
+        # GROUPING(marca, categoria, año): 0b011 = fila de marca, 0b101 = categoría,
+        # 0b110 = año, 0b111 = total
+        grupo = func.grouping(
+            Publicacion.id_marca_vehiculo,
+            Publicacion.id_categoria_vehiculo,
+            Publicacion.year_vehiculo
+        ).label("grupo")
+
+        resultado = await db.execute(
+            select(
+                grupo,
+                Publicacion.id_marca_vehiculo,
+                MarcaVehiculo.nombre_marca_vehiculo,
+                Publicacion.id_categoria_vehiculo,
+                CategoriaVehiculo.nombre_categoria_vehiculo,
+                Publicacion.year_vehiculo,
+                func.count().filter(and_(cond_categoria, cond_year)).label("por_marca"),
+                func.count().filter(and_(cond_marca, cond_year)).label("por_categoria"),
+                func.count().filter(and_(cond_marca, cond_categoria)).label("por_year"),
+                func.count().filter(and_(cond_marca, cond_categoria, cond_year)).label("total"),
+            )
+            .select_from(Publicacion)
+            .outerjoin(MarcaVehiculo, MarcaVehiculo.id_marca_vehiculo == Publicacion.id_marca_vehiculo)
+            .outerjoin(CategoriaVehiculo, CategoriaVehiculo.id_categoria_vehiculo == Publicacion.id_categoria_vehiculo)
+            .where(vigente(), *([condicion_busqueda(texto)] if texto else []))
+            .group_by(
+                func.grouping_sets(
+                    tuple_(Publicacion.id_marca_vehiculo, MarcaVehiculo.nombre_marca_vehiculo),
+                    tuple_(Publicacion.id_categoria_vehiculo, CategoriaVehiculo.nombre_categoria_vehiculo),
+                    tuple_(Publicacion.year_vehiculo),
+                    tuple_(),
+                )
+            )
         )
-        .first()
-    )
-    
-    # Obtener imágenes ordenadas por numero_imagen
-    imagenes = (
-        db.query(Imagen)
-        .filter(Imagen.id_publicacion == publicacion.id_publicacion)
-        .order_by(Imagen.numero_imagen)
-        .all()
-    )
 
+        facetas = {"total": 0, "marcas": [], "categorias": [], "years": []}
+        for fila in resultado.all():
+            if fila.grupo == 0b011 and fila.por_marca:
+                facetas["marcas"].append({
+                    "id_marca_vehiculo": fila.id_marca_vehiculo,
+                    "nombre_marca_vehiculo": fila.nombre_marca_vehiculo,
+                    "cantidad": fila.por_marca
+                })
+            elif fila.grupo == 0b101 and fila.por_categoria:
+                facetas["categorias"].append({
+                    "id_categoria_vehiculo": fila.id_categoria_vehiculo,
+                    "nombre_categoria_vehiculo": fila.nombre_categoria_vehiculo,
+                    "cantidad": fila.por_categoria
+                })
+            elif fila.grupo == 0b110 and fila.por_year:
+                facetas["years"].append({"year_vehiculo": fila.year_vehiculo, "cantidad": fila.por_year})
+            elif fila.grupo == 0b111:
+                facetas["total"] = fila.total
+
+        facetas["marcas"].sort(key=lambda f: (-f["cantidad"], f["nombre_marca_vehiculo"] or ""))
+        facetas["categorias"].sort(key=lambda f: (-f["cantidad"], f["nombre_categoria_vehiculo"] or ""))
+        facetas["years"].sort(key=lambda f: -f["year_vehiculo"])
+
+        facetas_cache.set(clave, facetas)
+        return facetas
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculando facetas: {str(e)}")
+
+
+def portada_de(imagenes: list) -> Optional[dict]:
+    # La portada es la imagen con numero_imagen = 1
+    return next((img for img in imagenes if img["numero_imagen"] == 1), None)
+
+
+def datos_comunes(fila) -> dict:
+    publicacion = fila.Publicacion
     return {
         "id": publicacion.id_publicacion,
         "id_usuario": publicacion.id_usuario,
-        "nombre_usuario": nombre_usuario,
+        "nombre_usuario": fila.nombre_usuario,
         "descripcion": publicacion.descripcion,
         "descripcion_corta": publicacion.descripcion_corta,
         "titulo": publicacion.titulo,
         "url": publicacion.url,
         "year_vehiculo": publicacion.year_vehiculo,
         "id_categoria_vehiculo": publicacion.id_categoria_vehiculo,
-        "nombre_categoria_vehiculo": nombre_categoria,
+        "nombre_categoria_vehiculo": fila.nombre_categoria_vehiculo,
         "id_marca_vehiculo": publicacion.id_marca_vehiculo,
-        "nombre_marca_vehiculo": nombre_marca,
+        "nombre_marca_vehiculo": fila.nombre_marca_vehiculo,
         "detalle": publicacion.detalle,
-        "fecha_publicacion": publicacion.fecha_publicacion,
-        "url_portada": portada.url_foto if portada else None,
-        "imagenes": [img.url_foto for img in imagenes] if imagenes else []
+        "fecha_publicacion": fecha_hora(publicacion.fecha_publicacion),
     }
 
-# Obtener publicación para editar (incluye IDs de imagen y numero_imagen)
-@router.get("/edit-post/{id_publicacion}", response_model=PublicacionEditDetails)
-async def obtener_publicacion_para_editar(id_publicacion: int, db: Session = Depends(get_db)):
-    pub = (
-        db.query(Publicacion, Usuario.nombre_usuario, MarcaVehiculo.nombre_marca_vehiculo, CategoriaVehiculo.nombre_categoria_vehiculo)
-        .join(Usuario, Usuario.id_usuario == Publicacion.id_usuario)
-        .join(MarcaVehiculo, MarcaVehiculo.id_marca_vehiculo == Publicacion.id_marca_vehiculo)
-        .join(CategoriaVehiculo, CategoriaVehiculo.id_categoria_vehiculo == Publicacion.id_categoria_vehiculo)
-        .filter(Publicacion.id_publicacion == id_publicacion)
-        .first()
-    )
-    if not pub:
-        raise HTTPException(status_code=404, detail="Publicación no encontrada")
-    publicacion, nombre_usuario, nombre_marca, nombre_categoria = pub
-
-    # La portada es la primera imagen (numero_imagen = 1)
-    portada = (
-        db.query(Imagen)
-        .filter(
-            Imagen.id_publicacion == publicacion.id_publicacion,
-            Imagen.numero_imagen == 1
-        )
-        .first()
-    )
-    
-    # Obtener imágenes ordenadas por numero_imagen
-    imagenes = (
-        db.query(Imagen)
-        .filter(Imagen.id_publicacion == publicacion.id_publicacion)
-        .order_by(Imagen.numero_imagen)
-        .all()
-    )
 
+def documento_detalle(fila) -> bytes:
+    """
+    PublicacionDetails serializado a partir de una fila de select_detalle(). Los
+    datos de la base ya tienen los tipos del esquema: van directo a orjson sin
+    pasar por pydantic.
+    """
+    portada = portada_de(fila.imagenes)
+    return orjson.dumps({
+        **datos_comunes(fila),
+        "like_count": fila.Publicacion.like_count,
+        "url_portada": portada["url_foto"] if portada else None,
+        "placeholder_portada": portada["placeholder"] if portada else None,
+        "imagenes": [img["url_foto"] for img in fila.imagenes],
+        "imagenes_variantes": [
+            {
+                "url_foto": img["url_foto"],
+                "url_thumb": img["url_thumb"],
+                "url_medium": img["url_medium"],
+                "placeholder": img["placeholder"]
+            } for img in fila.imagenes
+        ]
+    })
+
+
+def documento_edicion(fila) -> dict:
+    """PublicacionEditDetails (incluye id_imagen) a partir de una fila de select_detalle()."""
+    portada = portada_de(fila.imagenes)
     return {
-        "id": publicacion.id_publicacion,
-        "id_usuario": publicacion.id_usuario,
-        "nombre_usuario": nombre_usuario,
-        "descripcion": publicacion.descripcion,
-        "descripcion_corta": publicacion.descripcion_corta,
-        "titulo": publicacion.titulo,
-        "url": publicacion.url,
-        "year_vehiculo": publicacion.year_vehiculo,
-        "id_categoria_vehiculo": publicacion.id_categoria_vehiculo,
-        "nombre_categoria_vehiculo": nombre_categoria,
-        "id_marca_vehiculo": publicacion.id_marca_vehiculo,
-        "nombre_marca_vehiculo": nombre_marca,
-        "detalle": publicacion.detalle,
-        "fecha_publicacion": publicacion.fecha_publicacion,
-        "url_portada": portada.url_foto if portada else None,
+        **datos_comunes(fila),
+        "url_portada": portada["url_foto"] if portada else None,
         "imagenes": [
             {
-                "id_imagen": img.id_imagen,
-                "url_foto": img.url_foto,
-                "is_portada": img.numero_imagen == 1,  # True si es la primera imagen
-                "numero_imagen": img.numero_imagen
-            } for img in imagenes
-        ] if imagenes else []
+                "id_imagen": img["id_imagen"],
+                "url_foto": img["url_foto"],
+                "url_thumb": img["url_thumb"],
+                "url_medium": img["url_medium"],
+                "placeholder": img["placeholder"],
+            } for img in fila.imagenes
+        ]
     }
 
 
+# --- Varias publicaciones de una vez (favoritos, comparar, vistas recientes) ---
+# Declarada antes de /{id_publicacion}: si no, "batch" se tomaría como id
+@router.get("/batch", response_model=PublicacionesLote)
+async def obtener_publicaciones_lote(
+    ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Los mismos documentos que GET /{id_publicacion}, en el orden pedido. Una
+    query trae la versión de todos; los que están en el cache de detalle con
+    esa versión no hacen joins y el resto sale de una sola query
+    (select_detalle). Los ids inexistentes o eliminados se informan en
+    `faltantes`.
+    """
+    ids = list(dict.fromkeys(ids))  # sin repetidos, conservando el orden
+    if len(ids) > config.PUBLICACIONES_LOTE_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {config.PUBLICACIONES_LOTE_MAX} ids por consulta")
+
+    # Versión vigente de cada una (por PK): valida lo que hay en el cache
+    versiones = dict((await db.execute(
+        select(Publicacion.id_publicacion, Publicacion.fecha_actualizacion)
+        .where(Publicacion.id_publicacion.in_(ids), vigente())
+    )).all())
+    catalogos = await version_catalogos(db)
+    documentos = await detalle_cache.obtener_varios(versiones, catalogos)
+
+    pendientes = [i for i in versiones if i not in documentos]
+    if pendientes:
+        filas = await db.execute(select_detalle().where(Publicacion.id_publicacion.in_(pendientes), vigente()))
+        for fila in filas:
+            documento = documento_detalle(fila)
+            await detalle_cache.guardar(
+                fila.Publicacion.id_publicacion, fila.Publicacion.fecha_actualizacion, catalogos, documento
+            )
+            documentos[fila.Publicacion.id_publicacion] = documento
+
+    # Los documentos ya están serializados: se arma el JSON sin decodificarlos
+    cuerpo = (
+        b'{"publicaciones":['
+        + b",".join(documentos[i] for i in ids if i in documentos)
+        + b'],"faltantes":'
+        + orjson.dumps([i for i in ids if i not in documentos])
+        + b"}"
+    )
+    return Response(content=cuerpo, media_type="application/json")
+
+
+# --- Obtener publicación detalle ---
+@router.get("/{id_publicacion}", response_model=PublicacionDetails)
+async def obtener_publicacion(
+    id_publicacion: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Con el documento en cache: una lectura por PK (la versión) lo valida y
+    alcanza para el 304. Sin cache (o si cambió): una sola query, select_detalle,
+    que trae la versión junto con los datos.
+    """
+    catalogos = await version_catalogos(db)
+    documento = None
+    entrada = await detalle_cache.leer(id_publicacion, catalogos)
+    if entrada is not None:
+        ultima_modificacion = await db.scalar(
+            select(Publicacion.fecha_actualizacion).where(Publicacion.id_publicacion == id_publicacion, vigente())
+        )
+        if ultima_modificacion is None:
+            raise HTTPException(status_code=404, detail="Publicación no encontrada")
+        if entrada[0] == ultima_modificacion.isoformat():
+            documento = entrada[1]
+    detalle_cache.registrar(documento is not None)
+
+    if documento is None:
+        # Publicación, nombres e imágenes (y la versión) en la misma query
+        fila = (
+            await db.execute(select_detalle().where(Publicacion.id_publicacion == id_publicacion, vigente()))
+        ).first()
+        if fila is None:
+            raise HTTPException(status_code=404, detail="Publicación no encontrada")
+        ultima_modificacion = fila.Publicacion.fecha_actualizacion
+        documento = documento_detalle(fila)
+        await detalle_cache.guardar(id_publicacion, ultima_modificacion, catalogos, documento)
+
+    etag = calcular_etag_version(catalogos, "publicacion", id_publicacion, ultima_modificacion.isoformat())
+    headers = headers_de_cache(etag, ultima_modificacion, config.PUBLICACION_CACHE_CONTROL)
+    if cliente_actualizado(request, etag, ultima_modificacion):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=documento, media_type="application/json", headers=headers)
+
+# Obtener publicación para editar (incluye IDs de imagen y numero_imagen)
+@router.get("/edit-post/{id_publicacion}", response_model=PublicacionEditDetails)
+async def obtener_publicacion_para_editar(id_publicacion: int, db: AsyncSession = Depends(get_async_db)):
+    # Mismo loader que el detalle: una sola query
+    fila = (
+        await db.execute(select_detalle().where(Publicacion.id_publicacion == id_publicacion, vigente()))
+    ).first()
+    if fila is None:
+        raise HTTPException(status_code=404, detail="Publicación no encontrada")
+
+    # Misma forma que PublicacionEditDetails, sin volver a validar
+    return ORJSONResponse(documento_edicion(fila))
+
+
 # --- PUT: actualizar publicación ---
-@router.put("/{id}")
+@router.put("/{id}", openapi_extra=esquema_multipart(PublicacionEdicionFormulario))
 async def actualizar_publicacion(
     id: int,
-    titulo: str = Form(...),
-    descripcion_corta: str = Form(...),
-    descripcion: str = Form(...),
-    detalle: Optional[str] = Form(None),
-    url: Optional[str] = Form(None),
-    year_vehiculo: int = Form(...),
-    id_categoria_vehiculo: int = Form(...),
-    id_marca_vehiculo: int = Form(...),
-    mantener_imagenes: str = Form(""),
-    nueva_portada: Optional[str] = Form(None),
-    files: List[UploadFile] = [],
-    db: Session = Depends(get_db),
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
+    # --- Validación de propiedad (antes de leer el cuerpo con las imágenes) ---
+    publicacion = await db.get(Publicacion, id)
+    if not publicacion or publicacion.fecha_eliminacion is not None:
+        raise HTTPException(status_code=404, detail="Publicación no encontrada")
+    if publicacion.id_usuario != current_user["id"]:
+        raise HTTPException(status_code=403, detail="No tienes permiso para editar esta publicación")
+    await db.commit()  # devuelve la conexión al pool mientras llegan las imágenes (expire_on_commit=False)
+
+    # Las imágenes nuevas van a GCS a medida que llegan
+    datos, archivos = await recibir_formulario(request, db, PublicacionEdicionFormulario)
+    subidas = [a.url for a in archivos]
+    mantener_imagenes, nueva_portada = datos.mantener_imagenes, datos.nueva_portada
     try:
-        # --- Validación de propiedad ---
-        publicacion = db.query(Publicacion).filter(Publicacion.id_publicacion == id).first()
-        if not publicacion:
-            raise HTTPException(status_code=404, detail="Publicación no encontrada")
-        if publicacion.id_usuario != current_user["id"]:
-            raise HTTPException(status_code=403, detail="No tienes permiso para editar esta publicación")
-
         # --- Actualizar campos de la publicación ---
-        publicacion.titulo = titulo
-        publicacion.descripcion_corta = descripcion_corta
-        publicacion.descripcion = descripcion
-        publicacion.detalle = detalle
-        publicacion.url = url
-        publicacion.year_vehiculo = year_vehiculo
-        publicacion.id_categoria_vehiculo = id_categoria_vehiculo
-        publicacion.id_marca_vehiculo = id_marca_vehiculo
+        publicacion.titulo = datos.titulo
+        publicacion.descripcion_corta = datos.descripcion_corta
+        publicacion.descripcion = datos.descripcion
+        publicacion.detalle = datos.detalle
+        publicacion.url = datos.url
+        publicacion.year_vehiculo = datos.year_vehiculo
+        publicacion.id_categoria_vehiculo = datos.id_categoria_vehiculo
+        publicacion.id_marca_vehiculo = datos.id_marca_vehiculo
+        publicacion.fecha_actualizacion = func.now()  # también si solo cambian imágenes
         db.add(publicacion)
 
         # --- Manejo de imágenes ---
@@ -310,35 +561,43 @@ async def actualizar_publicacion(
         if mantener_imagenes:
             keep_ids = [int(x.strip()) for x in mantener_imagenes.split(',') if x.strip()]
             # Eliminar las que no se mantienen
-            db.query(Imagen).filter(
-                Imagen.id_publicacion == id,
-                ~Imagen.id_imagen.in_(keep_ids)
-            ).delete(synchronize_session=False)
+            await db.execute(
+                delete(Imagen)
+                .where(
+                    Imagen.id_publicacion == id,
+                    ~Imagen.id_imagen.in_(keep_ids)
+                )
+                .execution_options(synchronize_session=False)
+            )
         else:
             # Si no mantiene ninguna, eliminar todas
-            db.query(Imagen).filter(Imagen.id_publicacion == id).delete(synchronize_session=False)
+            await db.execute(
+                delete(Imagen)
+                .where(Imagen.id_publicacion == id)
+                .execution_options(synchronize_session=False)
+            )
 
         # Obtener todas las imágenes que quedan (mantenidas + nuevas que se agregarán)
         imagenes_existentes = (
-            db.query(Imagen)
-            .filter(Imagen.id_publicacion == id)
-            .order_by(Imagen.numero_imagen)
-            .all()
-        )
+            await db.scalars(
+                select(Imagen)
+                .where(Imagen.id_publicacion == id)
+                .order_by(Imagen.numero_imagen)
+            )
+        ).all()
 
         # Agregar nuevas imágenes
         nueva_imagen_objs = []
         siguiente_numero = len(imagenes_existentes) + 1
         
-        for i, file in enumerate(files):
-            file_url = upload_to_gcs(file)
+        for i, file_url in enumerate(subidas):
             nueva_img = Imagen(
                 id_publicacion=id,
                 url_foto=file_url,
                 numero_imagen=siguiente_numero + i
             )
             db.add(nueva_img)
-            db.flush()  # Para obtener id_imagen
+            await db.flush()  # Para obtener id_imagen
             nueva_imagen_objs.append(nueva_img)
 
         # --- Lógica para definir la nueva portada ---
@@ -375,11 +634,14 @@ async def actualizar_publicacion(
             for idx, img in enumerate(imagenes_ordenadas, start=1):
                 img.numero_imagen = idx
 
-        db.commit()
+        await db.commit()
+        await detalle_cache.invalidar(id)
+        background_tasks.add_task(generar_derivados_imagenes, [img.id_imagen for img in nueva_imagen_objs])
         return {"mensaje": "Publicación actualizada correctamente", "id": id}
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        await liberar_subidas(db, subidas)
         raise HTTPException(status_code=500, detail=f"Error actualizando publicación: {str(e)}")
 
 
@@ -395,65 +657,26 @@ async def save_image_file(file: UploadFile):
         buffer.write(content)
     return f"/uploads/images/{unique_filename}"
 
-# 🗑️ Helper para borrar archivos en Google Cloud Storage
-def delete_from_gcs(file_url: str) -> bool:
-    """
-    Elimina un archivo de Google Cloud Storage usando su URL.
-
-    Args:
-        file_url (str): URL completa del archivo en GCS
-
-    Returns:
-        bool: True si se eliminó correctamente, False si hubo error
-    """
-    try:
-        client = storage.Client()
-
-        # Extraer bucket y blob de la URL
-        # Ej: https://storage.googleapis.com/tu-bucket/carpeta/archivo.jpg
-        parsed_url = urlparse(file_url)
-        path_parts = parsed_url.path.lstrip('/').split('/', 1)
-        if len(path_parts) < 2:
-            print(f"URL inválida: {file_url}")
-            return False
-
-        bucket_name, blob_name = path_parts
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(blob_name)
-
-        # Eliminar archivo
-        blob.delete()
-        print(f"Archivo eliminado exitosamente: {blob_name}")
-        return True
-
-    except NotFound:
-        print(f"Archivo no encontrado en GCS: {file_url}")
-        return False
-    except Exception as e:
-        print(f"Error eliminando archivo de GCS: {str(e)}")
-        return False
-
-
 # 🗑️ Endpoint DELETE de publicaciones
 @router.delete("/{id_publicacion}", status_code=status.HTTP_204_NO_CONTENT)
 async def eliminar_publicacion(
     id_publicacion: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Elimina una publicación (y sus imágenes asociadas).
+    Elimina una publicación (y sus imágenes, comentarios y likes).
     Solo el propietario puede eliminar su publicación.
+
+    Marca fecha_eliminacion y responde enseguida; los blobs y las filas
+    relacionadas se borran en segundo plano (app/services/purge_service.py).
     """
     try:
         # Buscar la publicación
-        pub = (
-            db.query(Publicacion)
-            .filter(Publicacion.id_publicacion == id_publicacion)
-            .first()
-        )
+        pub = await db.get(Publicacion, id_publicacion)
 
-        if not pub:
+        if not pub or pub.fecha_eliminacion is not None:
             raise HTTPException(status_code=404, detail="Publicación no encontrada")
 
         # Verificar propietario
@@ -463,36 +686,19 @@ async def eliminar_publicacion(
                 detail="No tienes permiso para eliminar esta publicación"
             )
 
-        # Obtener imágenes asociadas (ordenadas por numero_imagen)
-        imagenes = (
-            db.query(Imagen)
-            .filter(Imagen.id_publicacion == id_publicacion)
-            .order_by(Imagen.numero_imagen)
-            .all()
-        )
-
-        # Eliminar imágenes (en GCS y en BD)
-        for img in imagenes:
-            try:
-                ok = delete_from_gcs(img.url_foto)
-                if not ok:
-                    print(f"⚠️ No se pudo eliminar {img.url_foto} de GCS")
-            except Exception as e:
-                print(f"❌ Error eliminando {img.url_foto} de GCS: {e}")
-
-            db.delete(img)
-
-        # Eliminar la publicación
-        db.delete(pub)
-        db.commit()
+        # Tombstone: deja de aparecer en el feed, el detalle y la búsqueda
+        pub.fecha_eliminacion = func.now()
+        await db.commit()
+        await detalle_cache.invalidar(id_publicacion)
+        background_tasks.add_task(purgar_publicacion, id_publicacion)
 
         return  # 204 No Content
 
     except HTTPException:
-        db.rollback()
+        await db.rollback()
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error interno del servidor: {str(e)}"
@@ -504,7 +710,7 @@ async def eliminar_publicacion(
 async def reordenar_imagenes(
     id_publicacion: int,
     nuevos_numeros: List[dict],  # [{"id_imagen": 1, "numero_imagen": 2}, ...]
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -516,22 +722,126 @@ async def reordenar_imagenes(
     """
     try:
         # Verificar propiedad de la publicación
-        publicacion = db.query(Publicacion).filter(Publicacion.id_publicacion == id_publicacion).first()
-        if not publicacion:
+        publicacion = await db.get(Publicacion, id_publicacion)
+        if not publicacion or publicacion.fecha_eliminacion is not None:
             raise HTTPException(status_code=404, detail="Publicación no encontrada")
         if publicacion.id_usuario != current_user["id"]:
             raise HTTPException(status_code=403, detail="No tienes permiso para editar esta publicación")
 
         # Actualizar los números de imagen
         for item in nuevos_numeros:
-            db.query(Imagen).filter(
-                Imagen.id_imagen == item["id_imagen"],
-                Imagen.id_publicacion == id_publicacion
-            ).update({Imagen.numero_imagen: item["numero_imagen"]})
+            await db.execute(
+                update(Imagen)
+                .where(
+                    Imagen.id_imagen == item["id_imagen"],
+                    Imagen.id_publicacion == id_publicacion
+                )
+                .values(numero_imagen=item["numero_imagen"])
+            )
 
-        db.commit()
+        await marcar_actualizada(db, id_publicacion)
+        await db.commit()
+        await detalle_cache.invalidar(id_publicacion)
         return {"mensaje": "Orden de imágenes actualizado correctamente"}
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error reordenando imágenes: {str(e)}")
+
+
+# --- Registrar imágenes subidas directo al bucket (URLs firmadas) ---
+@router.post("/{id_publicacion}/imagenes", status_code=status.HTTP_201_CREATED)
+async def registrar_imagenes_subidas(
+    id_publicacion: int,
+    datos: ImagenesFinalizar,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Crea las filas de Imagen para objetos que el cliente ya subió con
+    POST /upload/signed-urls. Las imágenes se agregan al final, en el orden recibido.
+    """
+    objetos = list(dict.fromkeys(datos.objetos))  # sin duplicados, respetando el orden
+    if not objetos:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos una imagen")
+    # Directo bajo el prefijo: no los temporales de las subidas en streaming (tmp/)
+    if any(not o.startswith(config.GCS_UPLOAD_PREFIX) or "/" in o[len(config.GCS_UPLOAD_PREFIX):] for o in objetos):
+        raise HTTPException(status_code=400, detail="Nombre de objeto inválido")
+
+    # Verificar en el bucket antes de tomar una conexión a la base
+    subidos = await inspeccionar_blobs(objetos, BYTES_FIRMA)
+    faltantes = [o for o in objetos if subidos[o][0] is None]
+    if faltantes:
+        raise HTTPException(
+            status_code=400,
+            detail={"mensaje": "Hay imágenes que no se subieron", "faltantes": faltantes}
+        )
+    # Mismas reglas que la subida multipart: tipo real por los primeros bytes y tamaño.
+    # Los rechazados quedan sin referencia y los borra el reconciliador
+    rechazados = [
+        o for o in objetos
+        if not subida_directa_valida(subidos[o][0].content_type, subidos[o][0].size, subidos[o][1])
+    ]
+    if rechazados:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "mensaje": f"Solo imágenes de hasta {config.MAX_MB_POR_IMAGEN:g} MB del tipo declarado",
+                "rechazados": rechazados,
+            }
+        )
+
+    publicacion = await db.get(Publicacion, id_publicacion)
+    if not publicacion or publicacion.fecha_eliminacion is not None:
+        raise HTTPException(status_code=404, detail="Publicación no encontrada")
+    if publicacion.id_usuario != current_user["id"]:
+        raise HTTPException(status_code=403, detail="No tienes permiso para editar esta publicación")
+
+    try:
+        urls = [public_url(o) for o in objetos]
+        # Idempotente: si el cliente reintenta, no se duplican imágenes
+        ya_registradas = set(
+            (
+                await db.scalars(
+                    select(Imagen.url_foto).where(
+                        Imagen.id_publicacion == id_publicacion,
+                        Imagen.url_foto.in_(urls)
+                    )
+                )
+            ).all()
+        )
+        ultimo_numero = await db.scalar(
+            select(func.max(Imagen.numero_imagen)).where(Imagen.id_publicacion == id_publicacion)
+        ) or 0
+
+        nuevas = []
+        for url_foto in urls:
+            if url_foto in ya_registradas:
+                continue
+            ultimo_numero += 1
+            nuevas.append(Imagen(
+                id_publicacion=id_publicacion,
+                url_foto=url_foto,
+                numero_imagen=ultimo_numero
+            ))
+        db.add_all(nuevas)
+        await marcar_actualizada(db, id_publicacion)
+        await db.commit()
+        await detalle_cache.invalidar(id_publicacion)
+        background_tasks.add_task(generar_derivados_imagenes, [img.id_imagen for img in nuevas])
+
+        return {
+            "id": id_publicacion,
+            "imagenes": [
+                {
+                    "id_imagen": img.id_imagen,
+                    "url_foto": img.url_foto,
+                    "numero_imagen": img.numero_imagen
+                } for img in nuevas
+            ]
+        }
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error registrando imágenes: {str(e)}")
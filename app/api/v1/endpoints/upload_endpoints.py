@@ -1,27 +1,32 @@
-from fastapi import APIRouter, Depends, Query,UploadFile, File, HTTPException, status
-from google.cloud import storage
-from google.auth.transport import requests
-from google.auth import default, compute_engine
+from fastapi import APIRouter, Depends, Request, HTTPException
+from pydantic import BaseModel
 from datetime import timedelta
-import os
-from sqlalchemy.orm import Session
 from app.core.security import get_current_user 
-from app.db.database import get_db
-import logging
+from app.db.database import get_async_db
+from app.core import config
+from app.schemas.imagenes import SubidaFirmadaRequest, SubidaFirmadaOut
+from app.services.storage_service import (
+    get_bucket, new_upload_name, generate_upload_url, upload_headers, public_url, parse_gcs_url
+)
+from app.services.ingest_service import recibir_formulario, esquema_multipart, TIPOS_IMAGEN
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
 
 router = APIRouter()
-BUCKET_NAME = os.getenv("BUCKET_NAME")
 
 
-@router.post("/")
-async def upload_file(file: UploadFile = File(...)):
-    try:
-        client = storage.Client()
-        bucket = client.bucket(BUCKET_NAME)
-        blob = bucket.blob(file.filename)
+class _SinCampos(BaseModel):
+    pass
+
 
-        # sube el archivo al bucket con su content-type correcto
-        blob.upload_from_file(file.file, content_type=file.content_type)
+@router.post("/", openapi_extra=esquema_multipart(_SinCampos, "file", varios=False))
+async def upload_file(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # En streaming y con nombre por contenido (no pisa el de otro usuario con el mismo nombre)
+    _, archivos = await recibir_formulario(request, db, _SinCampos, campo_archivos="file", max_archivos=1)
+    if not archivos:
+        raise HTTPException(status_code=400, detail="Debe enviar un archivo")
+    try:
+        blob = get_bucket().blob(parse_gcs_url(archivos[0].url)[1])
 
                 # Crear signed URL válida por 1 hora
         signed_url = blob.generate_signed_url(
@@ -33,3 +38,42 @@ async def upload_file(file: UploadFile = File(...)):
         return {"signed_url": signed_url}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# --- URLs firmadas para que el cliente suba directo al bucket ---
+@router.post("/signed-urls", response_model=List[SubidaFirmadaOut])
+def crear_urls_de_subida(
+    datos: SubidaFirmadaRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Devuelve una URL PUT firmada (de corta duración) por cada imagen a subir.
+    El PUT tiene que llevar los `headers` devueltos: fijan el Content-Type, el
+    tamaño máximo (MAX_MB_POR_IMAGEN) y que el objeto no se pueda reemplazar.
+    Después de subirlas, el cliente registra los objetos con
+    POST /publicacion/{id}/imagenes.
+    """
+    if not datos.content_types:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos una imagen")
+    if len(datos.content_types) > config.MAX_IMAGENES_POR_SUBIDA:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {config.MAX_IMAGENES_POR_SUBIDA} imágenes por subida"
+        )
+    if any(ct not in TIPOS_IMAGEN for ct in datos.content_types):
+        raise HTTPException(status_code=400, detail=f"Solo se permiten imágenes ({', '.join(TIPOS_IMAGEN)})")
+
+    try:
+        resultado = []
+        for content_type in datos.content_types:
+            objeto = new_upload_name(content_type)
+            resultado.append({
+                "objeto": objeto,
+                "upload_url": generate_upload_url(objeto, content_type),
+                "url_foto": public_url(objeto),
+                "content_type": content_type,
+                "headers": upload_headers(content_type),
+            })
+        return resultado
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,25 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db
 from app.db.models import Usuario
 from app.schemas.usuarios import UsuarioCreate, UsuarioUpdate, UsuarioOut
-from app.core.security import hash_password  # Asegurate de tener esta función en security.py
+from app.core.security import hash_password_async
 
 router = APIRouter()
 
 
 @router.post("/", response_model=UsuarioOut, status_code=status.HTTP_201_CREATED)
-def create_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
-    # Hashear password
+async def create_usuario(usuario: UsuarioCreate, db: AsyncSession = Depends(get_async_db)):
+    # Hashear password (en el executor de bcrypt, antes de tomar conexión)
     usuario_data = usuario.dict()
-    usuario_data["password"] = hash_password(usuario_data["password"])
+    usuario_data["password"] = await hash_password_async(usuario_data["password"])
 
     nuevo = Usuario(**usuario_data)
     db.add(nuevo)
-    db.commit()
-    db.refresh(nuevo)
+    await db.commit()
     return nuevo
 
 
@@ -37,25 +37,24 @@ def get_usuario(usuario_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{usuario_id}", response_model=UsuarioOut)
-def update_usuario(
+async def update_usuario(
     usuario_id: int,
     usuario_data: UsuarioUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    usuario = db.query(Usuario).filter(Usuario.id_usuario == usuario_id).first()
-    if not usuario:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
     update_data = usuario_data.dict(exclude_unset=True)
 
     if "password" in update_data:
-        update_data["password"] = hash_password(update_data["password"])
+        update_data["password"] = await hash_password_async(update_data["password"])
+
+    usuario = await db.get(Usuario, usuario_id)
+    if not usuario:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     for key, value in update_data.items():
         setattr(usuario, key, value)
 
-    db.commit()
-    db.refresh(usuario)
+    await db.commit()
     return usuario
 
 
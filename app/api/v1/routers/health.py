@@ -0,0 +1,5 @@
+from fastapi import APIRouter
+from app.api.v1.endpoints.health_endpoints import router as health_router
+
+router = APIRouter()
+router.include_router(health_router, prefix="/health", tags=["health"])
\ No newline at end of file
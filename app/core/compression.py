@@ -0,0 +1,97 @@
+"""
+Compresión gzip / brotli de las respuestas JSON según Accept-Encoding.
+
+Solo se comprimen respuestas de un único bloque (todas las de la API) desde
+COMPRESION_MINIMO_BYTES: los listados y el detalle, no los errores cortos ni
+los 304. Brotli se usa si el paquete `brotli` está instalado y el cliente lo
+acepta; si no, gzip. El ETag pasa a débil porque el cuerpo cambia con la
+codificación (la comparación de If-None-Match ya es débil).
+"""
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import config
+
+try:
+    import brotli
+except ImportError:  # opcional: sin el paquete se negocia solo gzip
+    brotli = None
+
+
+def elegir_codificacion(accept_encoding: str) -> Optional[str]:
+    """"br", "gzip" o None según las preferencias (q) del cliente."""
+    aceptadas = {}
+    for item in accept_encoding.split(","):
+        nombre, _, parametros = item.strip().partition(";")
+        q = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                q = float(parametros.strip()[2:])
+            except ValueError:
+                q = 0.0
+        aceptadas[nombre.strip().lower()] = q
+
+    comodin = aceptadas.get("*", 0.0)
+    candidatas = [("br", aceptadas.get("br", comodin))] if brotli is not None else []
+    candidatas.append(("gzip", aceptadas.get("gzip", comodin)))
+    codificacion, q = max(candidatas, key=lambda c: c[1])  # ante empate gana la primera (br)
+    return codificacion if q > 0 else None
+
+
+def comprimir(cuerpo: bytes, codificacion: str) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(cuerpo, quality=config.COMPRESION_NIVEL_BROTLI)
+    return gzip.compress(cuerpo, compresslevel=config.COMPRESION_NIVEL_GZIP, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimo: int = config.COMPRESION_MINIMO_BYTES):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio: Optional[Message] = None
+
+        async def enviar(message: Message) -> None:
+            nonlocal inicio
+            if message["type"] == "http.response.start":
+                # Se difiere hasta ver el cuerpo
+                inicio = message
+                return
+            if message["type"] != "http.response.body" or inicio is None:
+                await send(message)
+                return
+
+            cuerpo = message.get("body", b"")
+            headers = MutableHeaders(raw=inicio["headers"])
+            comprimible = (
+                not message.get("more_body", False)
+                and len(cuerpo) >= self.minimo
+                and headers.get("content-type", "").startswith("application/json")
+                and "content-encoding" not in headers
+            )
+            if comprimible:
+                cuerpo = comprimir(cuerpo, codificacion)
+                headers["Content-Encoding"] = codificacion
+                headers["Content-Length"] = str(len(cuerpo))
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                message = {**message, "body": cuerpo}
+            await send(inicio)
+            inicio = None
+            await send(message)
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,106 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+
+def _env_bool(nombre: str, default: bool) -> bool:
+    valor = os.getenv(nombre)
+    if valor is None:
+        return default
+    return valor.strip().lower() in ("1", "true", "yes", "si", "on")
+
+
+# ===========================
+# Pool de conexiones a la base de datos
+# ===========================
+# En Cloud Run cada instancia abre hasta DB_POOL_SIZE + DB_MAX_OVERFLOW conexiones
+# por motor, así que el total debe quedar por debajo del límite de Cloud SQL.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))  # segundos esperando una conexión libre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos antes de reciclar una conexión
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))  # 0 = sin límite
+
+
+# ===========================
+# Contraseñas (bcrypt)
+# ===========================
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # al cambiarlo, los hashes se actualizan en el próximo login
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))  # hilos dedicados a bcrypt por proceso
+PASSWORD_QUEUE_MAX = int(os.getenv("PASSWORD_QUEUE_MAX", "16"))  # en espera antes de responder 503
+
+
+# ===========================
+# Google Cloud Storage
+# ===========================
+BUCKET_NAME = os.getenv("BUCKET_NAME")
+GCS_UPLOAD_CONCURRENCY = int(os.getenv("GCS_UPLOAD_CONCURRENCY", "4"))  # subidas simultáneas por proceso
+GCS_SIGNED_URL_MINUTES = int(os.getenv("GCS_SIGNED_URL_MINUTES", "15"))  # validez de las URLs de subida directa
+GCS_UPLOAD_PREFIX = os.getenv("GCS_UPLOAD_PREFIX", "publicaciones/")
+# Los objetos se nombran por hash de contenido y nunca cambian: se pueden cachear sin revalidar
+GCS_CACHE_CONTROL = os.getenv("GCS_CACHE_CONTROL", "public, max-age=31536000, immutable")
+MAX_IMAGENES_POR_SUBIDA = int(os.getenv("MAX_IMAGENES_POR_SUBIDA", "20"))
+# Subidas multipart en streaming (crear / editar publicación, /upload)
+MAX_MB_POR_IMAGEN = float(os.getenv("MAX_MB_POR_IMAGEN", "15"))
+MAX_MB_POR_REQUEST = float(os.getenv("MAX_MB_POR_REQUEST", "160"))
+MAX_KB_POR_CAMPO = int(os.getenv("MAX_KB_POR_CAMPO", "256"))  # campos de texto del formulario
+# Buffer de la subida resumable a GCS (múltiplo de 256 KiB): es la memoria por archivo en curso
+GCS_STREAM_CHUNK_BYTES = int(os.getenv("GCS_STREAM_CHUNK_BYTES", str(4 * 1024 * 1024)))
+# Un objeto por contenido reutilizado hace menos no se borra (el request que lo reutilizó puede no haber hecho commit)
+GCS_REUTILIZACION_GRACIA_SEGUNDOS = int(os.getenv("GCS_REUTILIZACION_GRACIA_SEGUNDOS", "3600"))
+
+
+# ===========================
+# Derivados de imágenes (miniaturas, WebP, placeholder)
+# ===========================
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))  # procesos para redimensionar
+IMAGE_THUMB_WIDTH = int(os.getenv("IMAGE_THUMB_WIDTH", "480"))  # tarjetas del listado
+IMAGE_MEDIUM_WIDTH = int(os.getenv("IMAGE_MEDIUM_WIDTH", "1280"))  # vista de detalle
+IMAGE_PLACEHOLDER_WIDTH = int(os.getenv("IMAGE_PLACEHOLDER_WIDTH", "16"))
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+
+
+# ===========================
+# Caches
+# ===========================
+FACETS_CACHE_TTL = int(os.getenv("FACETS_CACHE_TTL", "30"))  # segundos
+FACETS_CACHE_MAXSIZE = int(os.getenv("FACETS_CACHE_MAXSIZE", "512"))
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))  # recarga de marcas/categorías entre instancias
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, no-cache")  # el navegador revalida y recibe 304
+PUBLICACION_CACHE_CONTROL = os.getenv("PUBLICACION_CACHE_CONTROL", "public, no-cache")  # detalle
+LISTADO_CACHE_CONTROL = os.getenv("LISTADO_CACHE_CONTROL", "public, no-cache")  # feed y búsqueda
+DETALLE_CACHE_BACKEND = os.getenv("DETALLE_CACHE_BACKEND", "memoria").lower()  # "memoria" o "redis"
+DETALLE_CACHE_TTL = int(os.getenv("DETALLE_CACHE_TTL", "300"))  # segundos
+DETALLE_CACHE_MAXSIZE = int(os.getenv("DETALLE_CACHE_MAXSIZE", "2048"))  # solo backend en memoria
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+# ===========================
+# Compresión de respuestas JSON
+# ===========================
+COMPRESION_MINIMO_BYTES = int(os.getenv("COMPRESION_MINIMO_BYTES", "1024"))  # respuestas más chicas van sin comprimir
+COMPRESION_NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "6"))
+COMPRESION_NIVEL_BROTLI = int(os.getenv("COMPRESION_NIVEL_BROTLI", "4"))  # 0-11; niveles bajos para respuestas dinámicas
+
+
+# ===========================
+# Purga de publicaciones eliminadas
+# ===========================
+PURGA_MAX_INTENTOS = int(os.getenv("PURGA_MAX_INTENTOS", "4"))
+PURGA_BACKOFF_SEGUNDOS = float(os.getenv("PURGA_BACKOFF_SEGUNDOS", "2"))  # se duplica en cada reintento
+PURGA_GRACIA_SEGUNDOS = int(os.getenv("PURGA_GRACIA_SEGUNDOS", "600"))  # antes de que la pasada de pendientes la tome
+RECONCILIADOR_GRACIA_HORAS = float(os.getenv("RECONCILIADOR_GRACIA_HORAS", "24"))  # blobs más nuevos no se tocan
+
+
+# ===========================
+# Likes
+# ===========================
+LIKES_BATCH_MAX = int(os.getenv("LIKES_BATCH_MAX", "100"))  # ids por consulta de contadores / estado
+
+
+# ===========================
+# Publicaciones
+# ===========================
+PUBLICACIONES_LOTE_MAX = int(os.getenv("PUBLICACIONES_LOTE_MAX", "50"))  # ids por GET /publicacion/batch
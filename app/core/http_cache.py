@@ -0,0 +1,80 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+
+def calcular_etag(contenido: Any) -> str:
+    """ETag fuerte a partir del contenido: igual en todas las instancias."""
+    data = json.dumps(jsonable_encoder(contenido), sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha1(data.encode()).hexdigest() + '"'
+
+
+def etag_coincide(request: Request, etag: str) -> bool:
+    """True si el If-None-Match del cliente incluye `etag` (o es *)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidatos = [c.strip() for c in header.split(",")]
+    # Comparación débil: W/"x" equivale a "x"
+    return any(c.removeprefix("W/") == etag for c in candidatos)
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def fecha_http(dt: datetime) -> str:
+    """Fecha en formato HTTP (Last-Modified)."""
+    return format_datetime(_utc(dt).replace(microsecond=0), usegmt=True)
+
+
+def no_modificado_desde(request: Request, ultima_modificacion: datetime) -> bool:
+    """True si If-Modified-Since es igual o posterior a `ultima_modificacion`."""
+    header = request.headers.get("if-modified-since")
+    if not header:
+        return False
+    try:
+        desde = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return _utc(ultima_modificacion).replace(microsecond=0) <= _utc(desde)
+
+
+def cliente_actualizado(request: Request, etag: str, ultima_modificacion: Optional[datetime] = None) -> bool:
+    """
+    True si se puede responder 304. If-None-Match tiene prioridad sobre
+    If-Modified-Since (RFC 9110).
+    """
+    if request.headers.get("if-none-match"):
+        return etag_coincide(request, etag)
+    if ultima_modificacion is not None:
+        return no_modificado_desde(request, ultima_modificacion)
+    return False
+
+
+def no_modificado(etag: str, cache_control: str, extra_headers: Optional[dict] = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control, **(extra_headers or {})}
+    return Response(status_code=304, headers=headers)
+
+
+def respuesta_cacheable(
+    request: Request,
+    contenido: Any,
+    etag: str,
+    cache_control: str,
+    extra_headers: Optional[dict] = None,
+) -> Response:
+    """200 con ETag/Cache-Control, o 304 si el cliente ya tiene esta versión."""
+    if etag_coincide(request, etag):
+        return no_modificado(etag, cache_control, extra_headers)
+    headers = {"ETag": etag, "Cache-Control": cache_control, **(extra_headers or {})}
+    # `contenido` ya viene como dicts planos (model_dump): orjson sin pasar por jsonable_encoder
+    return ORJSONResponse(content=contenido, headers=headers)
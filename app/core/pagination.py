@@ -0,0 +1,26 @@
+import base64
+import json
+from datetime import date, datetime
+
+from fastapi import HTTPException
+
+
+# --- Paginación por cursor (keyset) ---
+def encode_cursor(fecha, id_fila: int) -> str:
+    """Codifica la última fila de la página (fecha, id) como un cursor opaco."""
+    payload = json.dumps([fecha.isoformat(), id_fila])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Devuelve (fecha, id) o lanza 400 si el cursor es inválido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        fecha_str, id_fila = json.loads(base64.urlsafe_b64decode(padded))
+        if len(fecha_str) == 10:
+            fecha = date.fromisoformat(fecha_str)
+        else:
+            fecha = datetime.fromisoformat(fecha_str)
+        return fecha, int(id_fila)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
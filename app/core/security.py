@@ -1,14 +1,18 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer
+from typing import Optional, Tuple
+import asyncio
 import os
-from app.db.database import get_db
+import threading
+from app.core import config
 
 # Hashinng
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Con un costo distinto al configurado, verify_and_update devuelve el hash nuevo
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -17,6 +21,42 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# bcrypt en hilos propios: una ráfaga de logins no ocupa el threadpool de
+# Starlette que atiende los endpoints sync (marcas, categorías, comentarios...)
+_password_executor = ThreadPoolExecutor(
+    max_workers=config.PASSWORD_WORKERS, thread_name_prefix="bcrypt"
+)
+# Trabajos en curso + en cola; pasado el límite se rechaza en lugar de encolar
+_password_slots = threading.BoundedSemaphore(config.PASSWORD_WORKERS + config.PASSWORD_QUEUE_MAX)
+
+
+async def run_password_work(fn, *args):
+    if not _password_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, reintentá en unos segundos",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        futuro = _password_executor.submit(fn, *args)
+    except BaseException:
+        _password_slots.release()
+        raise
+    # Se libera cuando termina el hilo (o se cancela sin empezar), no cuando
+    # se cancela el request
+    futuro.add_done_callback(lambda _: _password_slots.release())
+    return await asyncio.wrap_future(futuro)
+
+
+async def hash_password_async(password: str) -> str:
+    return await run_password_work(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(válida, hash nuevo o None): el hash nuevo viene cuando cambió BCRYPT_ROUNDS."""
+    return await run_password_work(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
 # Clave secreta y algoritmo
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
@@ -40,7 +80,9 @@ def decode_token(token: str):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> dict:
+# Solo decodifica el JWT: sin sesión de base (no toma conexiones del pool) y
+# async para no pasar por el threadpool en cada request autenticado
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar el token",
@@ -60,3 +102,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError as e:
         print("❌ Error al decodificar token:", str(e))
         raise credentials_exception
+
+
+oauth2_scheme_opcional = OAuth2PasswordBearer(tokenUrl="/api/v1/login", auto_error=False)
+
+
+async def get_current_user_opcional(token: Optional[str] = Depends(oauth2_scheme_opcional)) -> Optional[dict]:
+    """Como get_current_user, pero sin token devuelve None (endpoints públicos que suman datos del usuario)."""
+    if token is None:
+        return None
+    return await get_current_user(token)
@@ -1,9 +1,13 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
 import os
 
+from app.core import config
+from app.db.pool import StatsQueuePool, StatsAsyncQueuePool
+
 load_dotenv()
 
 ENV = os.getenv("ENV")  # Default a "test" si no está definida
@@ -19,16 +23,58 @@ else:
         f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}"
     )
 
- 
-engine = create_engine(DB_URL)
+# Opciones comunes del pool (ver app/core/config.py)
+POOL_OPTIONS = {
+    "pool_size": config.DB_POOL_SIZE,
+    "max_overflow": config.DB_MAX_OVERFLOW,
+    "pool_timeout": config.DB_POOL_TIMEOUT,
+    "pool_recycle": config.DB_POOL_RECYCLE,
+    "pool_pre_ping": config.DB_POOL_PRE_PING,
+}
+
+connect_args = {}
+async_connect_args = {}
+if config.DB_STATEMENT_TIMEOUT_MS > 0:
+    # statement_timeout del lado del servidor para cortar queries colgadas
+    connect_args["options"] = f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"
+    async_connect_args["server_settings"] = {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)}
+
+engine = create_engine(DB_URL, poolclass=StatsQueuePool, connect_args=connect_args, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor async (asyncpg) para los endpoints async def: no bloquea el event loop
+ASYNC_DB_URL = DB_URL.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+async_engine = create_async_engine(
+    ASYNC_DB_URL, poolclass=StatsAsyncQueuePool, connect_args=async_connect_args, **POOL_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()  # <-- ACÁ DEFINÍS Y EXPORTÁS Base
 
-# Esta es la función que debes importar en routers
+
+def get_pool_stats() -> dict:
+    """Estado actual de los pools sync y async de este proceso."""
+    return {
+        "sync": engine.pool.stats(),
+        "async": async_engine.sync_engine.pool.stats(),
+    }
+
+# Esta es la función que debes importar en routers.
+# La Session es perezosa: no toma una conexión del pool hasta la primera query,
+# así que un request que no consulta no cuenta en get_pool_stats(). Las
+# dependencias que no consultan (p. ej. get_current_user) no deben pedirla:
+# al ser un generador sync, igual cuesta un salto al threadpool.
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# Equivalente async de get_db para handlers async def
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,190 @@
+"""
+Verifica con EXPLAIN que las queries calientes de los endpoints usan índice.
+
+    python -m app.db.explain_check                 # base configurada (POSTGRES_*)
+    python -m app.db.explain_check --url postgresql+psycopg2://... --seed 20000
+
+Las queries se arman con los mismos helpers que usan los endpoints
+(app.services.publicacion_queries), así el chequeo sigue a los cambios del
+código. Se corre con enable_seqscan = off:
+en una base chica el planner prefiere el seq scan aunque el índice sirva, y lo
+que interesa acá es que la forma de la query pueda usarlo. --seed carga datos
+sintéticos (solo para bases locales) y corre ANALYZE.
+
+Sale con código 1 si alguna query no usa el índice esperado.
+"""
+import argparse
+import json
+import sys
+from datetime import date
+
+from sqlalchemy import create_engine, select, tuple_, and_, text
+from sqlalchemy.pool import NullPool
+
+from app.db.database import DB_URL
+from app.db.models import Publicacion, Comentario, Like, Usuario
+from app.services.publicacion_queries import select_tarjetas, filtros_publicacion, select_detalle, vigente
+
+
+# Un BitmapOr con una rama por índice; si falta alguno, el OR termina en seq scan
+BUSQUEDA_INDICES = (
+    "ix_publicaciones_busqueda_fts",
+    "ix_publicaciones_titulo_trgm",
+    "ix_publicaciones_descripcion_corta_trgm",
+    "ix_publicaciones_marca_fecha_id",
+)
+
+
+def queries_calientes():
+    """(nombre, statement, índice o índices esperados en el plan)"""
+    orden_feed = (Publicacion.fecha_publicacion.desc(), Publicacion.id_publicacion.desc())
+    # Sin filtros: igual lleva vigente() (fecha_eliminacion IS NULL), como el endpoint
+    sin_filtros = filtros_publicacion(None, None, None, None)
+    return [
+        (
+            "feed",
+            select_tarjetas().where(*sin_filtros).order_by(*orden_feed).limit(8),
+            "ix_publicaciones_fecha_id",
+        ),
+        (
+            "feed con cursor",
+            select_tarjetas()
+            .where(
+                *sin_filtros,
+                tuple_(Publicacion.fecha_publicacion, Publicacion.id_publicacion) < tuple_(date(2024, 6, 1), 500),
+            )
+            .order_by(*orden_feed)
+            .limit(8),
+            "ix_publicaciones_fecha_id",
+        ),
+        (
+            "feed por marca",
+            select_tarjetas().where(*filtros_publicacion(1, None, None, None)).order_by(*orden_feed).limit(8),
+            "ix_publicaciones_marca_fecha_id",
+        ),
+        (
+            "feed por categoría",
+            select_tarjetas().where(*filtros_publicacion(None, None, None, 1)).order_by(*orden_feed).limit(8),
+            "ix_publicaciones_categoria_fecha_id",
+        ),
+        (
+            "portada del feed",
+            select_tarjetas().where(*sin_filtros).order_by(*orden_feed).limit(8),
+            "ix_imagenes_publicacion_numero",
+        ),
+        (
+            "detalle con imágenes (json_agg)",
+            select_detalle().where(Publicacion.id_publicacion == 1, vigente()),
+            "ix_imagenes_publicacion_numero",
+        ),
+        (
+            # El predicado real de /buscar y del filtro `modelo`: todas las ramas del OR con índice
+            "búsqueda (texto completo, trigramas y marca)",
+            select(Publicacion.id_publicacion).where(*filtros_publicacion(None, None, "falcon", None)),
+            BUSQUEDA_INDICES,
+        ),
+        (
+            "comentarios de una publicación",
+            select(Comentario, Usuario.nombre_usuario)
+            .join(Usuario, Comentario.id_usuario == Usuario.id_usuario)
+            .where(Comentario.id_publicacion == 1)
+            .order_by(Comentario.fecha_creacion, Comentario.id_comentario)
+            .limit(21),
+            "ix_comentarios_publicacion_fecha",
+        ),
+        (
+            "estado de likes del usuario",
+            select(Publicacion.id_publicacion, Publicacion.like_count, Like.id_like.is_not(None))
+            .outerjoin(Like, and_(Like.id_publicacion == Publicacion.id_publicacion, Like.id_usuario == 1))
+            .where(Publicacion.id_publicacion.in_([1, 2, 3])),
+            "uq_likes_usuario_publicacion",
+        ),
+        (
+            "likes de una publicación",
+            select(Like).where(Like.id_publicacion == 1).order_by(Like.id_like).limit(100),
+            "ix_likes_publicacion",
+        ),
+    ]
+
+
+def nodos(plan: dict):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from nodos(hijo)
+
+
+def sembrar(conn, cantidad: int) -> None:
+    """Datos sintéticos proporcionales a `cantidad` publicaciones."""
+    conn.execute(text(
+        "INSERT INTO usuarios (nombre_usuario, password, tipo_usuario) "
+        "SELECT 'usuario' || g, 'x', 'usuario' FROM generate_series(1, 50) g"
+    ))
+    conn.execute(text(
+        "INSERT INTO marcas_vehiculos (nombre_marca_vehiculo) SELECT 'Marca ' || g FROM generate_series(1, 40) g"
+    ))
+    conn.execute(text(
+        "INSERT INTO categorias_vehiculos (nombre_categoria_vehiculo) SELECT 'Categoría ' || g FROM generate_series(1, 10) g"
+    ))
+    conn.execute(text(
+        """
+        INSERT INTO publicaciones (id_usuario, descripcion, fecha_publicacion, descripcion_corta, titulo,
+                                   year_vehiculo, id_categoria_vehiculo, id_marca_vehiculo, detalle)
+        SELECT (SELECT min(id_usuario) FROM usuarios) + g % 50, 'descripción', DATE '2020-01-01' + g % 1500,
+               'corta ' || g, 'Falcon ' || g, 1960 + g % 60,
+               (SELECT min(id_categoria_vehiculo) FROM categorias_vehiculos) + g % 10,
+               (SELECT min(id_marca_vehiculo) FROM marcas_vehiculos) + g % 40, 'detalle'
+        FROM generate_series(1, :n) g
+        """
+    ), {"n": cantidad})
+    conn.execute(text(
+        "INSERT INTO imagenes (id_publicacion, url_foto, numero_imagen) "
+        "SELECT p.id_publicacion, 'https://example.invalid/' || p.id_publicacion || '_' || n, n "
+        "FROM publicaciones p, generate_series(1, 4) n"
+    ))
+    conn.execute(text(
+        "INSERT INTO comentarios (descripcion_comentario, id_usuario, id_publicacion) "
+        "SELECT 'comentario', p.id_usuario, p.id_publicacion FROM publicaciones p, generate_series(1, 3)"
+    ))
+    conn.execute(text(
+        "INSERT INTO likes (id_usuario, id_publicacion) "
+        "SELECT u.id_usuario, p.id_publicacion FROM publicaciones p "
+        "JOIN usuarios u ON u.id_usuario % 7 = p.id_publicacion % 7 ON CONFLICT DO NOTHING"
+    ))
+    conn.execute(text("ANALYZE"))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=DB_URL)
+    parser.add_argument("--seed", type=int, default=0, help="publicaciones sintéticas a insertar antes del chequeo")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.url, poolclass=NullPool)
+    fallas = 0
+    with engine.connect() as conn:
+        if args.seed:
+            with conn.begin():
+                sembrar(conn, args.seed)
+
+        for nombre, stmt, indice in queries_calientes():
+            sql = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+            with conn.begin() as tx:
+                conn.execute(text("SET LOCAL enable_seqscan = off"))
+                plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+                tx.rollback()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+
+            usados = {n["Index Name"] for n in nodos(plan[0]["Plan"]) if "Index Name" in n}
+            secuenciales = sorted({n["Relation Name"] for n in nodos(plan[0]["Plan"]) if n["Node Type"] == "Seq Scan"})
+            esperados = (indice,) if isinstance(indice, str) else indice
+            ok = set(esperados) <= usados
+            fallas += not ok
+            detalle = f"seq scan en {', '.join(secuenciales)}" if secuenciales else "sin seq scan"
+            print(f"{'OK ' if ok else 'FALLA'} {nombre}: espera {', '.join(esperados)}; usa {sorted(usados) or '-'} ({detalle})")
+
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
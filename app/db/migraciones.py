@@ -0,0 +1,28 @@
+"""
+Helpers para las migraciones de alembic/versions que crean índices sin
+bloquear escrituras.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+def indice_valido(nombre: str):
+    """True si existe y es válido, False si quedó inválido, None si no existe."""
+    return op.get_bind().execute(
+        sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:nombre)"),
+        {"nombre": nombre},
+    ).scalar()
+
+
+def crear_indice_concurrente(nombre: str, definicion: str, unico: bool = False) -> None:
+    """
+    CREATE INDEX CONCURRENTLY reintentable; va dentro de autocommit_block().
+    Si una corrida anterior se cortó, el índice quedó inválido (y un IF NOT
+    EXISTS lo dejaría así): se borra y se vuelve a crear. Uno válido se saltea.
+    """
+    valido = indice_valido(nombre)
+    if valido:
+        return
+    if valido is False:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre}")
+    op.execute(f"CREATE {'UNIQUE ' if unico else ''}INDEX CONCURRENTLY {nombre} {definicion}")
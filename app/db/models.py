@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, LargeBinary
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, LargeBinary, Index, UniqueConstraint, CheckConstraint, func, literal_column, text
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -35,6 +35,26 @@ class Usuario(Base):
 
 class Publicacion(Base):
     __tablename__ = 'publicaciones'
+    __table_args__ = (
+        # Misma expresión que `documento_busqueda` (ver abajo)
+        Index(
+            "ix_publicaciones_busqueda_fts",
+            text("to_tsvector('spanish'::regconfig, titulo || ' ' || descripcion_corta)"),
+            postgresql_using="gin",
+        ),
+        # Orden del feed (fecha_publicacion DESC, id_publicacion DESC) y seek del cursor
+        Index("ix_publicaciones_fecha_id", "fecha_publicacion", "id_publicacion"),
+        # Feed filtrado por marca / categoría con el mismo orden
+        Index("ix_publicaciones_marca_fecha_id", "id_marca_vehiculo", "fecha_publicacion", "id_publicacion"),
+        Index("ix_publicaciones_categoria_fecha_id", "id_categoria_vehiculo", "fecha_publicacion", "id_publicacion"),
+        Index("ix_publicaciones_usuario", "id_usuario"),
+        # Pendientes de purga (pocas filas: se borran al terminar la purga)
+        Index(
+            "ix_publicaciones_eliminacion",
+            "fecha_eliminacion",
+            postgresql_where=text("fecha_eliminacion IS NOT NULL"),
+        ),
+    )
 
     id_publicacion = Column(Integer, primary_key=True)
     id_usuario = Column(Integer, ForeignKey('usuarios.id_usuario'), nullable=False)
@@ -47,6 +67,14 @@ class Publicacion(Base):
     id_categoria_vehiculo =  Column(Integer, ForeignKey('categorias_vehiculos.id_categoria_vehiculo'),nullable=False)
     id_marca_vehiculo = Column(Integer, ForeignKey('marcas_vehiculos.id_marca_vehiculo'),nullable=False)
     detalle = Column(String, nullable= False)
+    # Contador mantenido por like_endpoints (evita count(*) sobre likes)
+    like_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    # Se actualiza en cada cambio de la publicación o de sus imágenes (ETag / Last-Modified)
+    fecha_actualizacion = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+    # Tombstone: la publicación deja de verse y app/services/purge_service la borra después
+    fecha_eliminacion = Column(DateTime(timezone=True), nullable=True)
 
     usuario = relationship("Usuario", back_populates="publicaciones")
     comentarios = relationship("Comentario", back_populates="publicacion")
@@ -59,11 +87,17 @@ class Publicacion(Base):
 
 class Comentario(Base):
     __tablename__ = 'comentarios'
+    __table_args__ = (
+        # Comentarios de una publicación en orden cronológico (paginación keyset)
+        Index("ix_comentarios_publicacion_fecha", "id_publicacion", "fecha_creacion", "id_comentario"),
+    )
 
     id_comentario = Column(Integer, primary_key=True)
     descripcion_comentario = Column(String, nullable=False)
     id_usuario = Column(Integer, ForeignKey('usuarios.id_usuario'), nullable=False)
     id_publicacion = Column(Integer, ForeignKey('publicaciones.id_publicacion'), nullable=False)
+    fecha_creacion = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    like_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     usuario = relationship("Usuario", back_populates="comentarios")
     publicacion = relationship("Publicacion", back_populates="comentarios")
@@ -72,6 +106,15 @@ class Comentario(Base):
     
 class Like(Base):
     __tablename__ = 'likes'
+    __table_args__ = (
+        # Un like por usuario y objetivo; los NULL no chocan entre sí
+        UniqueConstraint("id_usuario", "id_publicacion", name="uq_likes_usuario_publicacion"),
+        UniqueConstraint("id_usuario", "id_comentario", name="uq_likes_usuario_comentario"),
+        CheckConstraint("(id_comentario IS NULL) <> (id_publicacion IS NULL)", name="ck_likes_un_objetivo"),
+        # Likes de un objetivo (filtros de GET /like/ y borrado en cascada)
+        Index("ix_likes_publicacion", "id_publicacion", postgresql_where=text("id_publicacion IS NOT NULL")),
+        Index("ix_likes_comentario", "id_comentario", postgresql_where=text("id_comentario IS NOT NULL")),
+    )
 
     id_like = Column(Integer, primary_key=True)
     id_usuario = Column(Integer, ForeignKey('usuarios.id_usuario'), nullable=False)
@@ -85,10 +128,48 @@ class Like(Base):
 
 class Imagen(Base):
     __tablename__ = 'imagenes'
+    __table_args__ = (
+        # Portada (numero_imagen = 1) e imágenes ordenadas de una publicación;
+        # incluye id_imagen para que la subconsulta de portada sea index-only
+        Index("ix_imagenes_publicacion_numero", "id_publicacion", "numero_imagen", "id_imagen"),
+        # Conteo de referencias de los objetos por contenido (varias filas, un blob)
+        Index("ix_imagenes_url_foto", "url_foto"),
+    )
 
     id_imagen = Column(Integer, primary_key=True)
     id_publicacion = Column(Integer, ForeignKey('publicaciones.id_publicacion'), nullable=False)
     url_foto = Column(String, nullable=False)
     numero_imagen = Column(Integer, nullable = False)
+    # Derivados generados después de la subida (null hasta que terminen)
+    url_thumb = Column(String, nullable=True)
+    url_medium = Column(String, nullable=True)
+    placeholder = Column(String, nullable=True)
 
     publicacion = relationship("Publicacion", back_populates="imagenes")
+
+
+# ===========================
+# Búsqueda de texto (Postgres)
+# ===========================
+# La configuración y el separador van como literales (no parámetros) para que la
+# expresión de las queries coincida con la del índice y el planner lo use.
+SEARCH_CONFIG = literal_column("'spanish'::regconfig")
+
+documento_busqueda = func.to_tsvector(
+    SEARCH_CONFIG,
+    Publicacion.titulo.concat(literal_column("' '")).concat(Publicacion.descripcion_corta),
+)
+
+# Requiere CREATE EXTENSION pg_trgm
+Index(
+    "ix_publicaciones_titulo_trgm",
+    Publicacion.titulo,
+    postgresql_using="gin",
+    postgresql_ops={"titulo": "gin_trgm_ops"},
+)
+Index(
+    "ix_publicaciones_descripcion_corta_trgm",
+    Publicacion.descripcion_corta,
+    postgresql_using="gin",
+    postgresql_ops={"descripcion_corta": "gin_trgm_ops"},
+)
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class _PoolStatsMixin:
+    """Mide cuánto esperan los requests para obtener una conexión del pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_total += espera
+                self._wait_max = max(self._wait_max, espera)
+
+    def recreate(self):
+        # Mantener las métricas al recrear el pool (pre-ping, invalidaciones)
+        nuevo = super().recreate()
+        nuevo._stats_lock = self._stats_lock
+        nuevo._checkouts = self._checkouts
+        nuevo._timeouts = self._timeouts
+        nuevo._wait_total = self._wait_total
+        nuevo._wait_max = self._wait_max
+        return nuevo
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            checkouts = self._checkouts
+            return {
+                "pool_size": self.size(),
+                "checked_out": self.checkedout(),
+                "checked_in": self.checkedin(),
+                "overflow": max(self.overflow(), 0),
+                "max_overflow": self._max_overflow,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "wait_avg_ms": round(self._wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+class StatsQueuePool(_PoolStatsMixin, QueuePool):
+    pass
+
+
+class StatsAsyncQueuePool(_PoolStatsMixin, AsyncAdaptedQueuePool):
+    pass
@@ -1,14 +1,61 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.api.v1.api import api_router
 from app.api.v1.endpoints import login_endpoints
+from app.core.compression import CompressionMiddleware
+from app.services.image_service import shutdown_process_pool
+from app.services.catalog_service import cargar_catalogos
+from app.services.purge_service import purgar_pendientes
+from app.db.database import SessionLocal
 import uvicorn
+import asyncio
 import logging
 
 
+def precargar_catalogos():
+    # Marcas y categorías en memoria desde el arranque; si la base no responde
+    # se cargan en el primer request
+    db = SessionLocal()
+    try:
+        cargar_catalogos(db)
+    except Exception as e:
+        logging.warning(f"No se pudieron precargar los catálogos: {e}")
+    finally:
+        db.close()
+
+
+async def _purgar_pendientes_al_arrancar():
+    try:
+        await purgar_pendientes()
+    except Exception as e:
+        logging.warning(f"No se pudo completar la purga de publicaciones pendientes: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    precargar_catalogos()
+    # Eliminaciones que quedaron a medias (reinicio de la instancia, reintentos agotados)
+    # Se guarda la referencia para que la tarea no sea recolectada antes de terminar
+    app.state.purga_pendientes = asyncio.create_task(_purgar_pendientes_al_arrancar())
+    try:
+        yield
+    finally:
+        # Una purga larga no debe frenar el apagado: lo que quede se retoma al próximo arranque
+        app.state.purga_pendientes.cancel()
+        try:
+            await app.state.purga_pendientes
+        except asyncio.CancelledError:
+            pass
+        shutdown_process_pool()
+
+
 app = FastAPI(
     title="Guincho Backend",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,  # orjson en lugar de json de la stdlib
+    lifespan=lifespan,
 )
 
 # Configurar CORS para los frontends
@@ -23,12 +70,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link"],  # página siguiente de los comentarios
 )
 
+# gzip / brotli para listados y detalle (agregado después de CORS: queda por fuera)
+app.add_middleware(CompressionMiddleware)
+
 
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(login_endpoints.router, prefix="/api/v1")
 
+
 if __name__ == "__main__":
     import os
     import uvicorn
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from pydantic import BaseModel, validator
-from typing import Optional 
+from typing import Optional
+from datetime import datetime
 from typing import TYPE_CHECKING
 
 
@@ -22,9 +23,10 @@ class ComentarioCreate(ComentarioBase):
     
 class ComentarioOut(ComentarioBase):
     id_comentario: int
+    like_count: int = 0
     # Campos calculados que se agregarán en el endpoint
     nombre_usuario: Optional[str] = None
-    fecha_comentario: Optional[str] = None
+    fecha_comentario: Optional[datetime] = None  # comentarios.fecha_creacion
 
     model_config = {
         "from_attributes": True
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Dict
 
 class ImagenBase(BaseModel):
     id_publicacion: int
@@ -16,3 +16,22 @@ class ImagenOut(ImagenBase):
     model_config = {
         "from_attributes": True
     }
+
+
+# ===========================
+# Subida directa al bucket (URLs firmadas)
+# ===========================
+class SubidaFirmadaRequest(BaseModel):
+    content_types: List[str]
+
+
+class SubidaFirmadaOut(BaseModel):
+    objeto: str
+    upload_url: str
+    url_foto: str
+    content_type: str
+    headers: Dict[str, str]  # a enviar tal cual en el PUT (van firmados)
+
+
+class ImagenesFinalizar(BaseModel):
+    objetos: List[str]
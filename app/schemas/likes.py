@@ -18,3 +18,14 @@ class LikesOut(LikesBase):
     model_config = {
         "from_attributes": True
     }
+
+
+class LikeToggleOut(BaseModel):
+    liked: bool
+    like_count: int
+
+
+class LikeEstadoOut(BaseModel):
+    id: int  # id_publicacion o id_comentario según el endpoint
+    like_count: int
+    liked: bool = False
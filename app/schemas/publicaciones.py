@@ -37,6 +37,26 @@ class PublicacionUpdate(BaseModel):
     detalle: Optional[str]
 
 
+# ===========================
+# Formularios multipart (campos de texto; las imágenes van en "files")
+# ===========================
+class PublicacionFormulario(BaseModel):
+    titulo: str
+    descripcion_corta: str
+    descripcion: str
+    detalle: str
+    url: Optional[str] = None
+    year_vehiculo: int
+    id_categoria_vehiculo: int
+    id_marca_vehiculo: int
+
+
+class PublicacionEdicionFormulario(PublicacionFormulario):
+    detalle: Optional[str] = None
+    mantener_imagenes: str = ""  # ids separados por coma
+    nueva_portada: Optional[str] = None  # id de imagen existente o "nueva_<índice>"
+
+
 # ===========================
 # Modelos de salida
 # ===========================
@@ -48,6 +68,13 @@ class PublicacionOut(PublicacionBase):
     }
 
 
+class ImagenVariantes(BaseModel):
+    url_foto: str
+    url_thumb: Optional[str] = None  # miniatura WebP para tarjetas
+    url_medium: Optional[str] = None  # WebP para la vista de detalle
+    placeholder: Optional[str] = None  # data URI de baja calidad (LQIP)
+
+
 class PublicacionDetails(BaseModel):
     id: int
     id_usuario: int
@@ -63,20 +90,31 @@ class PublicacionDetails(BaseModel):
     nombre_marca_vehiculo: str
     detalle: str
     fecha_publicacion: datetime
+    like_count: int = 0
     url_portada: Optional[str]
+    placeholder_portada: Optional[str] = None
     imagenes: List[str] = []
+    imagenes_variantes: List[ImagenVariantes] = []
 
     model_config = {
         "from_attributes": True
     }
 
 
+class PublicacionesLote(BaseModel):
+    publicaciones: List[PublicacionDetails] = []  # en el orden pedido
+    faltantes: List[int] = []  # ids inexistentes o eliminados
+
+
 # ===========================
 # Modelos de edición y detalle
 # ===========================
 class ImagenDetalle(BaseModel):
     id_imagen: int
     url_foto: str
+    url_thumb: Optional[str] = None
+    url_medium: Optional[str] = None
+    placeholder: Optional[str] = None
 
 
 class PublicacionEditDetails(BaseModel):
@@ -108,7 +146,11 @@ class PublicacionEditDetails(BaseModel):
 PublicacionBase.model_rebuild()
 PublicacionCreate.model_rebuild()
 PublicacionUpdate.model_rebuild()
+PublicacionFormulario.model_rebuild()
+PublicacionEdicionFormulario.model_rebuild()
 PublicacionOut.model_rebuild()
+ImagenVariantes.model_rebuild()
 PublicacionDetails.model_rebuild()
+PublicacionesLote.model_rebuild()
 ImagenDetalle.model_rebuild()
 PublicacionEditDetails.model_rebuild()
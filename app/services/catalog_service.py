@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.core.http_cache import calcular_etag
+from app.db.models import MarcaVehiculo, CategoriaVehiculo
+from app.schemas.marcas_vehiculos import MarcaVehiculosOut
+from app.schemas.categorias_vehiculos import CategoriaVehiculosOut
+
+
+class CatalogoCache:
+    """
+    Copia en memoria de una tabla chica que casi no cambia (marcas, categorías).
+
+    Se carga al arrancar, se recarga desde los endpoints que la modifican y se
+    recarga sola cada CATALOG_CACHE_TTL segundos para tomar cambios hechos por
+    otras instancias. Su ETag entra en los de listados y detalle (llevan los
+    nombres), así que también vence con el TTL.
+    """
+
+    def __init__(self, modelo, schema, campo_id: str, campo_nombre: str):
+        self.modelo = modelo
+        self.schema = schema
+        self.campo_id = campo_id
+        self.campo_nombre = campo_nombre
+        self._lock = threading.Lock()
+        self._items: Optional[List[dict]] = None
+        self._por_id: dict = {}
+        self._etag: Optional[str] = None
+        self._cargado_en = 0.0
+
+    def cargar(self, db: Session) -> Tuple[List[dict], dict, str]:
+        filas = db.query(self.modelo).order_by(getattr(self.modelo, self.campo_nombre)).all()
+        items = [self.schema.model_validate(f).model_dump() for f in filas]
+        por_id = {item[self.campo_id]: item for item in items}
+        etag = calcular_etag(items)
+        with self._lock:
+            self._items = items
+            self._por_id = por_id
+            self._etag = etag
+            self._cargado_en = time.monotonic()
+        return items, por_id, etag
+
+    def invalidar(self, db: Session) -> None:
+        """Recarga después de un cambio: el ETag nuevo se ve enseguida en esta instancia."""
+        self.cargar(db)
+
+    def _vigente(self) -> Optional[Tuple[List[dict], dict, str]]:
+        with self._lock:
+            if self._items is not None and time.monotonic() - self._cargado_en < config.CATALOG_CACHE_TTL:
+                return self._items, self._por_id, self._etag
+        return None
+
+    def _snapshot(self, db: Session) -> Tuple[List[dict], dict, str]:
+        return self._vigente() or self.cargar(db)
+
+    async def etag_vigente(self, db: AsyncSession) -> str:
+        """ETag del catálogo para los endpoints async; recarga si venció el TTL."""
+        vigente = self._vigente()
+        if vigente is not None:
+            return vigente[2]
+        _, _, etag = await db.run_sync(self.cargar)
+        return etag
+
+    def obtener(self, db: Session) -> Tuple[List[dict], str]:
+        items, _, etag = self._snapshot(db)
+        return items, etag
+
+    def buscar(self, db: Session, id_item) -> Optional[dict]:
+        _, por_id, _ = self._snapshot(db)
+        return por_id.get(id_item)
+
+
+marcas_catalogo = CatalogoCache(
+    MarcaVehiculo, MarcaVehiculosOut, "id_marca_vehiculo", "nombre_marca_vehiculo"
+)
+categorias_catalogo = CatalogoCache(
+    CategoriaVehiculo, CategoriaVehiculosOut, "id_categoria_vehiculo", "nombre_categoria_vehiculo"
+)
+
+
+def cargar_catalogos(db: Session) -> None:
+    marcas_catalogo.cargar(db)
+    categorias_catalogo.cargar(db)
+
+
+async def version_catalogos(db: AsyncSession) -> str:
+    """Versión conjunta de marcas y categorías, para ETags y el cache de detalle."""
+    return f"{await marcas_catalogo.etag_vigente(db)}|{await categorias_catalogo.etag_vigente(db)}"
@@ -0,0 +1,194 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.core import config
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class _Contadores:
+    """Aciertos / fallos para exponer el hit ratio."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errores = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, acierto: bool) -> None:
+        with self._lock:
+            if acierto:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def error(self) -> None:
+        with self._lock:
+            self.errores += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errores": self.errores,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class MemoriaBackend:
+    """LRU con TTL dentro del proceso (una copia por instancia)."""
+
+    nombre = "memoria"
+
+    def __init__(self, ttl: int, maxsize: int):
+        self._cache = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    async def get(self, clave: str) -> Optional[bytes]:
+        return self._cache.get(clave)
+
+    async def get_many(self, claves: List[str]) -> List[Optional[bytes]]:
+        return [self._cache.get(clave) for clave in claves]
+
+    async def set(self, clave: str, valor: bytes) -> None:
+        self._cache.set(clave, valor)
+
+    async def delete(self, *claves: str) -> None:
+        for clave in claves:
+            self._cache.delete(clave)
+
+
+class RedisBackend:
+    """Redis (o compatible, p. ej. Memorystore) compartido entre instancias."""
+
+    nombre = "redis"
+
+    def __init__(self, url: str, ttl: int, cliente=None):
+        if cliente is None:
+            from redis.asyncio import Redis
+            cliente = Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._redis = cliente
+        self.ttl = ttl
+
+    async def get(self, clave: str) -> Optional[bytes]:
+        return await self._redis.get(clave)
+
+    async def get_many(self, claves: List[str]) -> List[Optional[bytes]]:
+        # MGET: una sola ida a Redis para todo el lote
+        return await self._redis.mget(claves) if claves else []
+
+    async def set(self, clave: str, valor: bytes) -> None:
+        await self._redis.set(clave, valor, ex=self.ttl)
+
+    async def delete(self, *claves: str) -> None:
+        if claves:
+            await self._redis.delete(*claves)
+
+
+class DetalleCache:
+    """
+    Documento de detalle ya serializado (JSON) por publicación, guardado junto
+    con la fecha_actualizacion y la versión de catálogos con que se armó (lleva
+    los nombres de marca y categoría).
+
+    Es read-through: el endpoint lo llena en un fallo y los endpoints que
+    modifican la publicación lo invalidan después del commit. Una entrada solo
+    se sirve si su versión es la vigente (una lectura por PK): un lector lento
+    que guarda un documento viejo después de la invalidación no lo deja
+    visible. Si el backend falla se sigue sin cache
+    (solo se cuenta el error).
+    """
+
+    def __init__(self, backend, prefijo: str = "publicacion:detalle:"):
+        self.backend = backend
+        self.prefijo = prefijo
+        self._contadores = _Contadores()
+
+    def _clave(self, id_publicacion: int) -> str:
+        return f"{self.prefijo}{id_publicacion}"
+
+    def _documento(self, valor: Optional[bytes], version: datetime, catalogos: str) -> Optional[bytes]:
+        if valor is None:
+            return None
+        # Formato: "<fecha_actualizacion ISO>\n<versión de catálogos>\n<json>"
+        guardada, _, resto = valor.partition(b"\n")
+        version_catalogos, _, cuerpo = resto.partition(b"\n")
+        if guardada.decode() == version.isoformat() and version_catalogos.decode() == catalogos:
+            return cuerpo
+        return None
+
+    async def leer(self, id_publicacion: int, catalogos: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Entrada armada con esta versión de catálogos, todavía sin validar contra
+        la fila: (fecha_actualizacion ISO con que se guardó, documento). Así el
+        detalle va a la base por la versión solo si hay algo que validar; quien
+        llama cuenta el resultado con registrar().
+        """
+        try:
+            valor = await self.backend.get(self._clave(id_publicacion))
+        except Exception:
+            logger.warning("Cache de detalle no disponible", exc_info=True)
+            self._contadores.error()
+            return None
+        if valor is None:
+            return None
+        guardada, _, resto = valor.partition(b"\n")
+        version_catalogos, _, cuerpo = resto.partition(b"\n")
+        if version_catalogos.decode() != catalogos:
+            return None
+        return guardada.decode(), cuerpo
+
+    def registrar(self, acierto: bool) -> None:
+        self._contadores.registrar(acierto)
+
+    async def obtener_varios(self, versiones: Dict[int, datetime], catalogos: str) -> Dict[int, bytes]:
+        """
+        Documentos de un lote {id: fecha_actualizacion vigente}, en una sola ida al
+        backend; solo los guardados con esa versión y la de catálogos.
+        """
+        ids = list(versiones)
+        try:
+            valores = await self.backend.get_many([self._clave(i) for i in ids])
+        except Exception:
+            logger.warning("Cache de detalle no disponible", exc_info=True)
+            self._contadores.error()
+            valores = [None] * len(ids)
+        documentos = {}
+        for id_publicacion, valor in zip(ids, valores):
+            documento = self._documento(valor, versiones[id_publicacion], catalogos)
+            self._contadores.registrar(documento is not None)
+            if documento is not None:
+                documentos[id_publicacion] = documento
+        return documentos
+
+    async def guardar(
+        self, id_publicacion: int, ultima_modificacion: datetime, catalogos: str, documento: bytes
+    ) -> None:
+        valor = ultima_modificacion.isoformat().encode() + b"\n" + catalogos.encode() + b"\n" + documento
+        try:
+            await self.backend.set(self._clave(id_publicacion), valor)
+        except Exception:
+            logger.warning("No se pudo guardar en la cache de detalle", exc_info=True)
+            self._contadores.error()
+
+    async def invalidar(self, *ids_publicacion: int) -> None:
+        try:
+            await self.backend.delete(*(self._clave(i) for i in ids_publicacion))
+        except Exception:
+            logger.warning("No se pudo invalidar la cache de detalle", exc_info=True)
+            self._contadores.error()
+
+    def stats(self) -> dict:
+        return {"backend": self.backend.nombre, **self._contadores.stats()}
+
+
+def crear_backend():
+    if config.DETALLE_CACHE_BACKEND == "redis":
+        return RedisBackend(config.REDIS_URL, ttl=config.DETALLE_CACHE_TTL)
+    return MemoriaBackend(ttl=config.DETALLE_CACHE_TTL, maxsize=config.DETALLE_CACHE_MAXSIZE)
+
+
+detalle_cache = DetalleCache(crear_backend())
@@ -0,0 +1,50 @@
+"""
+Generación de derivados de una imagen (CPU pura).
+
+Se ejecuta dentro de un ProcessPoolExecutor, por eso este módulo solo depende de Pillow:
+los workers no necesitan importar FastAPI, SQLAlchemy ni el cliente de GCS.
+"""
+import base64
+import io
+
+from PIL import Image, ImageOps
+
+
+def _redimensionar(imagen: Image.Image, ancho: int) -> Image.Image:
+    if imagen.width <= ancho:
+        return imagen.copy()
+    alto = max(1, round(imagen.height * ancho / imagen.width))
+    return imagen.resize((ancho, alto), Image.Resampling.LANCZOS)
+
+
+def _a_webp(imagen: Image.Image, calidad: int) -> bytes:
+    # Guardar sin exif/icc: los derivados no llevan metadatos (GPS, cámara, etc.)
+    buffer = io.BytesIO()
+    imagen.save(buffer, format="WEBP", quality=calidad, method=4)
+    return buffer.getvalue()
+
+
+def generar_derivados(
+    data: bytes,
+    ancho_thumb: int,
+    ancho_medium: int,
+    ancho_placeholder: int,
+    calidad: int,
+) -> dict:
+    """
+    Devuelve {"thumb": bytes, "medium": bytes, "placeholder": str}.
+
+    `placeholder` es un data URI WebP de pocos píxeles (LQIP) para mostrar
+    mientras carga la imagen real.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        # Aplicar la orientación EXIF antes de descartar los metadatos
+        imagen = ImageOps.exif_transpose(original)
+        imagen = imagen.convert("RGBA" if imagen.mode in ("RGBA", "LA", "P") else "RGB")
+
+    placeholder = _a_webp(_redimensionar(imagen, ancho_placeholder), 30)
+    return {
+        "thumb": _a_webp(_redimensionar(imagen, ancho_thumb), calidad),
+        "medium": _a_webp(_redimensionar(imagen, ancho_medium), calidad),
+        "placeholder": "data:image/webp;base64," + base64.b64encode(placeholder).decode(),
+    }
@@ -0,0 +1,160 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.db.database import AsyncSessionLocal
+from app.db.models import Imagen, Publicacion
+from app.services.detail_cache import detalle_cache
+from app.services.image_processing import generar_derivados
+from app.services.storage_service import (
+    parse_gcs_url, run_in_storage_executor, download_bytes, upload_bytes, delete_blobs_sin_uso
+)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Pool de procesos para el redimensionado (no compite con el event loop ni el GIL)."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=config.IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def nombre_derivado(blob_name: str, sufijo: str) -> str:
+    """publicaciones/abc.jpg -> publicaciones/abc_thumb.webp (junto al original)."""
+    base = blob_name.rsplit(".", 1)[0] if "." in blob_name.rsplit("/", 1)[-1] else blob_name
+    return f"{base}_{sufijo}.webp"
+
+
+async def originales_sin_referencias(
+    db: AsyncSession, urls: Iterable[str], excluir_publicacion: Optional[int] = None
+) -> Set[str]:
+    """
+    Conteo de referencias de los objetos por contenido: de estas url_foto, las que
+    ninguna fila de `imagenes` usa (sin contar las de `excluir_publicacion`).
+    Solo esas se pueden borrar del bucket, con delete_blobs_sin_uso (un request
+    en curso puede haberlas reutilizado sin commit todavía); sus derivados
+    siguen al original.
+    """
+    urls = set(urls)
+    if not urls:
+        return set()
+    stmt = select(Imagen.url_foto).where(Imagen.url_foto.in_(urls)).distinct()
+    if excluir_publicacion is not None:
+        stmt = stmt.where(Imagen.id_publicacion != excluir_publicacion)
+    return urls - set((await db.scalars(stmt)).all())
+
+
+async def liberar_subidas(db: AsyncSession, urls: List[str]) -> None:
+    """
+    Después de un rollback: borra las subidas que no quedaron referenciadas por
+    nadie. Las que este u otro request reutilizaron se quedan (las limpia el
+    reconciliador si nadie las registra).
+    """
+    libres = await originales_sin_referencias(db, urls)
+    if libres:
+        await run_in_storage_executor(
+            delete_blobs_sin_uso, sorted(libres), timedelta(seconds=config.GCS_REUTILIZACION_GRACIA_SEGUNDOS)
+        )
+
+
+async def _procesar_imagen(url_foto: str) -> dict:
+    partes = parse_gcs_url(url_foto)
+    if not partes:
+        raise ValueError(f"URL inválida: {url_foto}")
+    _, blob_name = partes
+
+    # Mismo tope que la subida: un objeto más grande no se trae a memoria
+    data = await run_in_storage_executor(download_bytes, blob_name, int(config.MAX_MB_POR_IMAGEN * 1024 * 1024))
+    loop = asyncio.get_running_loop()
+    derivados = await loop.run_in_executor(
+        get_process_pool(),
+        partial(
+            generar_derivados,
+            data,
+            config.IMAGE_THUMB_WIDTH,
+            config.IMAGE_MEDIUM_WIDTH,
+            config.IMAGE_PLACEHOLDER_WIDTH,
+            config.IMAGE_WEBP_QUALITY,
+        ),
+    )
+    url_thumb, url_medium = await asyncio.gather(
+        run_in_storage_executor(upload_bytes, nombre_derivado(blob_name, "thumb"), derivados["thumb"], "image/webp"),
+        run_in_storage_executor(upload_bytes, nombre_derivado(blob_name, "md"), derivados["medium"], "image/webp"),
+    )
+    return {"url_thumb": url_thumb, "url_medium": url_medium, "placeholder": derivados["placeholder"]}
+
+
+async def generar_derivados_imagenes(ids_imagen: List[int]) -> None:
+    """
+    Background task: genera miniatura, tamaño medio WebP y placeholder de cada imagen
+    y los guarda en la fila de Imagen. Mientras tanto las respuestas usan el original.
+    """
+    if not ids_imagen:
+        return
+
+    async with AsyncSessionLocal() as db:
+        imagenes = (
+            await db.execute(
+                select(Imagen.id_imagen, Imagen.url_foto).where(Imagen.id_imagen.in_(ids_imagen))
+            )
+        ).all()
+
+        # Una foto repetida (mismo objeto por contenido) reutiliza los derivados que ya tiene
+        previos = {
+            fila.url_foto: {"url_thumb": fila.url_thumb, "url_medium": fila.url_medium, "placeholder": fila.placeholder}
+            for fila in await db.execute(
+                select(Imagen.url_foto, Imagen.url_thumb, Imagen.url_medium, Imagen.placeholder)
+                .where(Imagen.url_foto.in_({img.url_foto for img in imagenes}), Imagen.url_thumb.is_not(None))
+                .distinct(Imagen.url_foto)
+            )
+        }
+
+    # Sin conexión tomada mientras se descarga, procesa y sube (cada objeto una sola vez)
+    pendientes = list({img.url_foto for img in imagenes} - previos.keys())
+    procesadas = await asyncio.gather(
+        *[_procesar_imagen(url) for url in pendientes], return_exceptions=True
+    )
+    derivados = {**previos, **dict(zip(pendientes, procesadas))}
+
+    async with AsyncSessionLocal() as db:
+        for img in imagenes:
+            resultado = derivados[img.url_foto]
+            if isinstance(resultado, BaseException):
+                print(f"⚠️ No se pudieron generar derivados de {img.url_foto}: {resultado}")
+                continue
+            await db.execute(
+                update(Imagen).where(Imagen.id_imagen == img.id_imagen).values(**resultado)
+            )
+        # Las respuestas cambian (miniaturas nuevas): invalidar ETags y cache de detalle
+        actualizadas = await db.scalars(
+            update(Publicacion)
+            .where(
+                Publicacion.id_publicacion.in_(
+                    select(Imagen.id_publicacion).where(Imagen.id_imagen.in_(ids_imagen))
+                )
+            )
+            .values(fecha_actualizacion=func.now())
+            .returning(Publicacion.id_publicacion)
+        )
+        ids_publicacion = actualizadas.all()
+        await db.commit()
+    await detalle_cache.invalidar(*ids_publicacion)
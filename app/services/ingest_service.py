@@ -0,0 +1,298 @@
+"""
+Ingesta de formularios multipart en streaming.
+
+Starlette, con `UploadFile`, guarda cada parte en un archivo temporal antes de
+que corra el endpoint, y después había que leerlo otra vez para subirlo. Acá
+se parsea el cuerpo a medida que llega y cada imagen va directo a GCS
+(StreamUpload) mientras se calcula el hash. El tipo se detecta por los
+primeros bytes, no por el Content-Type que declara el cliente. Una parte que
+no es imagen o que supera el tamaño máximo corta el request en ese momento.
+
+Cuando termina una parte, el cierre de su subida (último bloque, copia al
+nombre por contenido y borrado del temporal) corre en el executor de storage
+mientras se sigue leyendo la siguiente: las fotos de un mismo request se
+terminan de subir en paralelo, hasta GCS_UPLOAD_CONCURRENCY a la vez.
+
+Memoria por request: el archivo que se está leyendo (≈ 2 × GCS_STREAM_CHUNK_BYTES)
+más, como mucho, un bloque por cada subida que se está cerrando, y los campos
+de texto. No se escribe nada a disco.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Type, TypeVar
+from urllib.parse import parse_qsl
+
+from fastapi import HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.services.image_service import liberar_subidas
+from app.services.storage_service import StreamUpload, run_in_storage_executor
+
+Modelo = TypeVar("Modelo", bound=BaseModel)
+
+MB = 1024 * 1024
+
+# Bytes necesarios para reconocer el formato
+BYTES_FIRMA = 12
+
+
+# Los que reconoce detectar_tipo_imagen; también son los únicos que se firman para subida directa.
+# Sin HEIC: Pillow no lo decodifica y la imagen se quedaría sin miniaturas
+TIPOS_IMAGEN = ("image/jpeg", "image/png", "image/gif", "image/webp", "image/avif")
+
+
+def detectar_tipo_imagen(cabecera: bytes) -> Optional[str]:
+    """Content-Type real a partir de los primeros bytes; None si no es una imagen admitida."""
+    if cabecera.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if cabecera.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if cabecera[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+        return "image/webp"
+    if cabecera[4:8] == b"ftyp" and cabecera[8:12] in (b"avif", b"avis"):
+        return "image/avif"
+    return None
+
+
+def subida_directa_valida(content_type: Optional[str], size: Optional[int], cabecera: bytes) -> bool:
+    """
+    Objeto subido con URL firmada: tipo admitido, que coincida con los primeros
+    bytes, y dentro del tamaño máximo (las mismas reglas que la subida multipart).
+    """
+    return (
+        content_type in TIPOS_IMAGEN
+        and 0 < (size or 0) <= config.MAX_MB_POR_IMAGEN * MB
+        and detectar_tipo_imagen(cabecera) == content_type
+    )
+
+
+@dataclass
+class ArchivoSubido:
+    url: str
+    filename: str
+    content_type: str
+    size: int
+
+
+class _ParteEnCurso:
+    def __init__(self, nombre: str, filename: Optional[str]):
+        self.nombre = nombre
+        self.filename = filename
+        self.datos = bytearray()  # campo de texto, o bytes del archivo aún no enviados
+        self.subida: Optional[StreamUpload] = None
+        self.size = 0
+
+
+def _rechazar(codigo: int, detalle: str) -> HTTPException:
+    return HTTPException(status_code=codigo, detail=detalle)
+
+
+async def _esperar_cierres(
+    cerrando: List[Tuple[_ParteEnCurso, "asyncio.Future[str]"]], subidos: List[ArchivoSubido]
+) -> Optional[BaseException]:
+    """
+    Espera todos los cierres en curso (corren en hilos: no se pueden cancelar) y
+    pasa a `subidos`, en el orden del formulario, los que terminaron bien.
+    Devuelve el primer error, si hubo.
+    """
+    resultados = await asyncio.gather(*(cierre for _, cierre in cerrando), return_exceptions=True)
+    for (parte, _), resultado in zip(cerrando, resultados):
+        if not isinstance(resultado, BaseException):
+            subidos.append(ArchivoSubido(resultado, parte.filename, parte.subida.content_type, parte.size))
+    return next((r for r in resultados if isinstance(r, BaseException)), None)
+
+
+async def _recibir(
+    request: Request, campo_archivos: str, max_archivos: int, subidos: List[ArchivoSubido]
+) -> Dict[str, str]:
+    cerrando: List[Tuple[_ParteEnCurso, "asyncio.Future[str]"]] = []
+    try:
+        campos = await _leer_partes(request, campo_archivos, max_archivos, cerrando)
+    except BaseException:
+        # Lo que ya se subió queda en `subidos` para que recibir_formulario lo libere
+        await _esperar_cierres(cerrando, subidos)
+        raise
+    error = await _esperar_cierres(cerrando, subidos)
+    if error is not None:
+        raise error
+    return campos
+
+
+async def _leer_partes(
+    request: Request,
+    campo_archivos: str,
+    max_archivos: int,
+    cerrando: List[Tuple[_ParteEnCurso, "asyncio.Future[str]"]],
+) -> Dict[str, str]:
+    max_request = config.MAX_MB_POR_REQUEST * MB
+    max_imagen = config.MAX_MB_POR_IMAGEN * MB
+    max_campo = config.MAX_KB_POR_CAMPO * 1024
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    largo = request.headers.get("content-length")
+    if largo and largo.isdigit() and int(largo) > max_request:
+        # Se rechaza antes de leer el cuerpo
+        raise _rechazar(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "El request supera el tamaño máximo")
+
+    if content_type == b"application/x-www-form-urlencoded":
+        # Solo campos de texto (imágenes subidas directo al bucket)
+        cuerpo = bytearray()
+        async for chunk in request.stream():
+            cuerpo += chunk
+            if len(cuerpo) > max_campo * 16:
+                raise _rechazar(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "El request supera el tamaño máximo")
+        return dict(parse_qsl(cuerpo.decode("utf-8", "replace"), keep_blank_values=True))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise _rechazar(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "Se espera multipart/form-data")
+
+    # El parser es sincrónico: los callbacks encolan eventos y se procesan
+    # después de cada bloque, ya en código async (igual que Starlette)
+    eventos: List[Tuple[str, bytes]] = []
+    cabecera = {"campo": b"", "valor": b"", "disposition": b""}
+
+    def on_header_field(data, start, end):
+        cabecera["campo"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        cabecera["valor"] += data[start:end]
+
+    def on_header_end():
+        if cabecera["campo"].lower() == b"content-disposition":
+            cabecera["disposition"] = cabecera["valor"]
+        cabecera["campo"] = cabecera["valor"] = b""
+
+    def on_headers_finished():
+        eventos.append(("inicio", cabecera["disposition"]))
+        cabecera["disposition"] = b""
+
+    def on_part_data(data, start, end):
+        eventos.append(("datos", bytes(data[start:end])))
+
+    def on_part_end():
+        eventos.append(("fin", b""))
+
+    parser = MultipartParser(
+        params[b"boundary"],
+        callbacks={
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+
+    campos: Dict[str, str] = {}
+    parte: Optional[_ParteEnCurso] = None
+    recibidos = 0
+
+    async def iniciar_subida() -> StreamUpload:
+        tipo_real = detectar_tipo_imagen(bytes(parte.datos[:BYTES_FIRMA]))
+        if tipo_real is None:
+            raise _rechazar(
+                status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                f"{parte.filename}: solo se permiten imágenes JPEG, PNG, GIF, WebP o AVIF",
+            )
+        if len(cerrando) >= max_archivos:
+            raise _rechazar(status.HTTP_400_BAD_REQUEST, f"Máximo {max_archivos} imágenes por subida")
+        # Armar el blob puede crear el cliente de GCS (credenciales): fuera del event loop
+        return await run_in_storage_executor(StreamUpload, tipo_real)
+
+    async def enviar(forzar: bool = False) -> None:
+        # Se junta un bloque antes de pasar al executor: un salto de hilo por bloque, no por chunk de red
+        if parte.datos and (forzar or len(parte.datos) >= config.GCS_STREAM_CHUNK_BYTES):
+            datos, parte.datos = bytes(parte.datos), bytearray()
+            await run_in_storage_executor(parte.subida.write, datos)
+
+    async for chunk in request.stream():
+        recibidos += len(chunk)
+        if recibidos > max_request:
+            raise _rechazar(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "El request supera el tamaño máximo")
+        parser.write(chunk)
+
+        for tipo, data in eventos:
+            if tipo == "inicio":
+                _, opciones = parse_options_header(data)
+                filename = opciones.get(b"filename")
+                parte = _ParteEnCurso(
+                    opciones.get(b"name", b"").decode("utf-8", "replace"),
+                    filename.decode("utf-8", "replace") if filename is not None else None,
+                )
+                if parte.filename is not None and parte.nombre != campo_archivos:
+                    raise _rechazar(status.HTTP_400_BAD_REQUEST, f"Archivo inesperado en el campo '{parte.nombre}'")
+
+            elif tipo == "datos":
+                parte.size += len(data)
+                parte.datos += data
+                if parte.filename is None:
+                    if parte.size > max_campo:
+                        raise _rechazar(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"Campo '{parte.nombre}' demasiado largo")
+                    continue
+                if parte.size > max_imagen:
+                    raise _rechazar(
+                        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        f"{parte.filename}: máximo {config.MAX_MB_POR_IMAGEN:g} MB por imagen",
+                    )
+                if parte.subida is None and parte.size >= BYTES_FIRMA:
+                    parte.subida = await iniciar_subida()
+                if parte.subida is not None:
+                    await enviar()
+
+            elif tipo == "fin":
+                if parte.filename is None:
+                    campos[parte.nombre] = parte.datos.decode("utf-8", "replace")
+                elif parte.size == 0 and not parte.filename:
+                    pass  # input de archivo vacío del navegador
+                else:
+                    if parte.subida is None:
+                        # Más corto que la firma completa: se decide con lo que llegó
+                        parte.subida = await iniciar_subida()
+                    await enviar(forzar=True)
+                    # El cierre sigue en el executor mientras se lee la parte siguiente
+                    cerrando.append((parte, asyncio.ensure_future(run_in_storage_executor(parte.subida.finish))))
+                parte = None
+        eventos.clear()
+
+    parser.finalize()
+    return campos
+
+
+async def recibir_formulario(
+    request: Request,
+    db: AsyncSession,
+    modelo: Type[Modelo],
+    campo_archivos: str = "files",
+    max_archivos: int = config.MAX_IMAGENES_POR_SUBIDA,
+) -> Tuple[Modelo, List[ArchivoSubido]]:
+    """
+    Lee el formulario multipart en streaming: sube las imágenes de `campo_archivos`
+    a medida que llegan y valida los campos de texto con `modelo` (422 como FastAPI).
+    Si algo falla, borra las imágenes ya subidas que nadie más referencia.
+    """
+    subidos: List[ArchivoSubido] = []
+    try:
+        campos = await _recibir(request, campo_archivos, max_archivos, subidos)
+        try:
+            return modelo.model_validate(campos), subidos
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+            )
+    except Exception:
+        await liberar_subidas(db, [s.url for s in subidos])
+        raise
+
+
+def esquema_multipart(modelo: Type[BaseModel], campo_archivos: str = "files", varios: bool = True) -> dict:
+    """openapi_extra para endpoints que leen el cuerpo con recibir_formulario."""
+    esquema = modelo.model_json_schema()
+    archivo = {"type": "string", "format": "binary"}
+    esquema["properties"][campo_archivos] = {"type": "array", "items": archivo} if varios else archivo
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": esquema}}}}
@@ -0,0 +1,126 @@
+"""
+Queries de publicaciones compartidas por los endpoints, el chequeo de EXPLAIN
+(app.db.explain_check) y los benchmarks: armarlas en un solo lugar hace que el
+chequeo mida exactamente lo que corre en producción.
+"""
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.orm import aliased
+
+from app.db.models import Publicacion, Imagen, Usuario, MarcaVehiculo, CategoriaVehiculo
+from app.services.search_service import condicion_busqueda
+
+
+def vigente():
+    """Excluye las publicaciones eliminadas que todavía esperan la purga."""
+    return Publicacion.fecha_eliminacion.is_(None)
+
+
+# --- Listado (tarjetas del feed) ---
+def filtros_publicacion(marca, año, modelo, categoria) -> list:
+    filtros = [vigente()]
+    if marca:
+        filtros.append(Publicacion.id_marca_vehiculo == marca)
+    if año:
+        filtros.append(Publicacion.year_vehiculo == año)
+    if modelo and modelo.strip():
+        # Búsqueda indexada (texto completo + trigramas) en vez de ILIKE '%x%'
+        filtros.append(condicion_busqueda(modelo.strip()))
+    if categoria:
+        filtros.append(Publicacion.id_categoria_vehiculo == categoria)
+    return filtros
+
+
+def select_tarjetas(*extra_columnas):
+    """
+    SELECT de las tarjetas del feed: marca, categoría y portada en la misma query (sin N+1).
+    """
+    # Portada (numero_imagen = 1): se elige su id con una subconsulta escalar y se
+    # hace join por id, así nunca duplica filas y evita una query por fila
+    portada_id_sq = (
+        select(Imagen.id_imagen)
+        .where(
+            Imagen.id_publicacion == Publicacion.id_publicacion,
+            Imagen.numero_imagen == 1
+        )
+        .order_by(Imagen.id_imagen)
+        .limit(1)
+        .correlate(Publicacion)
+        .scalar_subquery()
+    )
+    Portada = aliased(Imagen)
+
+    return (
+        select(
+            Publicacion.id_publicacion,
+            Publicacion.titulo,
+            Publicacion.descripcion_corta,
+            Publicacion.year_vehiculo,
+            Publicacion.id_marca_vehiculo,
+            Publicacion.id_categoria_vehiculo,
+            Publicacion.fecha_publicacion,
+            Publicacion.like_count,
+            MarcaVehiculo.nombre_marca_vehiculo,
+            CategoriaVehiculo.nombre_categoria_vehiculo,
+            Portada.url_foto.label("url_portada"),
+            Portada.url_thumb.label("url_portada_thumb"),
+            Portada.placeholder.label("placeholder_portada"),
+            *extra_columnas,
+        )
+        .select_from(Publicacion)
+        .outerjoin(Portada, Portada.id_imagen == portada_id_sq)
+        .outerjoin(MarcaVehiculo, MarcaVehiculo.id_marca_vehiculo == Publicacion.id_marca_vehiculo)
+        .outerjoin(CategoriaVehiculo, CategoriaVehiculo.id_categoria_vehiculo == Publicacion.id_categoria_vehiculo)
+    )
+
+
+def select_total(filtros: list):
+    # La segunda columna (última modificación) arma el ETag del listado.
+    return select(func.count(), func.max(Publicacion.fecha_actualizacion)).where(*filtros)
+
+
+# --- Detalle y edición ---
+def select_detalle():
+    """
+    Loader del detalle y de la edición en una sola query: publicación, nombres de
+    usuario, marca y categoría, y las imágenes ordenadas por numero_imagen
+    agregadas con json_agg (usa ix_imagenes_publicacion_numero).
+    Columnas: Publicacion, nombre_usuario, nombre_marca_vehiculo,
+    nombre_categoria_vehiculo, imagenes (lista de dicts).
+    """
+    imagenes = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(
+                        func.json_build_object(
+                            "id_imagen", Imagen.id_imagen,
+                            "url_foto", Imagen.url_foto,
+                            "url_thumb", Imagen.url_thumb,
+                            "url_medium", Imagen.url_medium,
+                            "placeholder", Imagen.placeholder,
+                            "numero_imagen", Imagen.numero_imagen,
+                        ),
+                        Imagen.numero_imagen,
+                    )
+                ),
+                literal_column("'[]'::json"),
+                type_=JSON,
+            )
+        )
+        .where(Imagen.id_publicacion == Publicacion.id_publicacion)
+        .correlate(Publicacion)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            Publicacion,
+            Usuario.nombre_usuario,
+            MarcaVehiculo.nombre_marca_vehiculo,
+            CategoriaVehiculo.nombre_categoria_vehiculo,
+            imagenes.label("imagenes"),
+        )
+        .join(Usuario, Usuario.id_usuario == Publicacion.id_usuario)
+        .join(MarcaVehiculo, MarcaVehiculo.id_marca_vehiculo == Publicacion.id_marca_vehiculo)
+        .join(CategoriaVehiculo, CategoriaVehiculo.id_categoria_vehiculo == Publicacion.id_categoria_vehiculo)
+    )
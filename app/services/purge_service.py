@@ -0,0 +1,153 @@
+"""
+Purga de publicaciones eliminadas (tombstone).
+
+`eliminar_publicacion` solo marca fecha_eliminacion y responde; acá se borran
+los blobs en GCS (los originales que nadie usa ni reutilizó hace poco y sus
+derivados, estos con la API batch) y después, en una transacción, likes,
+comentarios, imágenes y la publicación. Con reintentos y backoff exponencial.
+
+    python -m app.services.purge_service   # purga las pendientes (p. ej. desde un cron)
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import select, delete, or_
+
+from app.core import config
+from app.db.database import AsyncSessionLocal
+from app.db.models import Publicacion, Imagen, Comentario, Like
+from app.services.image_service import originales_sin_referencias
+from app.services.storage_service import delete_blobs_batch, delete_blobs_sin_uso, run_in_storage_executor
+
+logger = logging.getLogger(__name__)
+
+
+class _MetricasPurga:
+    def __init__(self):
+        self._valores = {
+            "publicaciones_purgadas": 0,
+            "publicaciones_fallidas": 0,
+            "reintentos": 0,
+            "blobs_borrados": 0,
+            "blobs_fallidos": 0,
+        }
+        self._lock = threading.Lock()
+
+    def sumar(self, nombre: str, cantidad: int = 1) -> None:
+        with self._lock:
+            self._valores[nombre] += cantidad
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._valores)
+
+
+metricas_purga = _MetricasPurga()
+
+
+async def _purgar(id_publicacion: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        eliminada = await db.scalar(
+            select(Publicacion.fecha_eliminacion).where(Publicacion.id_publicacion == id_publicacion)
+        )
+        if eliminada is None:
+            # Ya purgada o no marcada para eliminar
+            return False
+        filas = (
+            await db.execute(
+                select(Imagen.url_foto, Imagen.url_thumb, Imagen.url_medium)
+                .where(Imagen.id_publicacion == id_publicacion)
+            )
+        ).all()
+        # Los objetos son por contenido: los que usa otra publicación se quedan
+        libres = await originales_sin_referencias(
+            db, [fila.url_foto for fila in filas], excluir_publicacion=id_publicacion
+        )
+
+    # Sin conexión tomada mientras se habla con GCS. Un original que alguien
+    # reutilizó hace poco se queda (y sus derivados con él)
+    gracia = timedelta(seconds=config.GCS_REUTILIZACION_GRACIA_SEGUNDOS)
+    borrados, fallidas = (
+        await run_in_storage_executor(delete_blobs_sin_uso, sorted(libres), gracia) if libres else ([], [])
+    )
+    derivados = [url for fila in filas if fila.url_foto in borrados for url in (fila.url_thumb, fila.url_medium) if url]
+    if derivados:
+        fallidas_derivados = await run_in_storage_executor(delete_blobs_batch, derivados)
+        metricas_purga.sumar("blobs_borrados", len(derivados) - len(fallidas_derivados))
+        fallidas += fallidas_derivados
+    metricas_purga.sumar("blobs_borrados", len(borrados))
+    if fallidas:
+        metricas_purga.sumar("blobs_fallidos", len(fallidas))
+        raise RuntimeError(f"{len(fallidas)} blobs sin borrar")
+
+    async with AsyncSessionLocal() as db:
+        comentarios = select(Comentario.id_comentario).where(Comentario.id_publicacion == id_publicacion)
+        await db.execute(
+            delete(Like).where(
+                or_(Like.id_publicacion == id_publicacion, Like.id_comentario.in_(comentarios))
+            )
+        )
+        await db.execute(delete(Comentario).where(Comentario.id_publicacion == id_publicacion))
+        await db.execute(delete(Imagen).where(Imagen.id_publicacion == id_publicacion))
+        borrada = await db.execute(
+            delete(Publicacion).where(
+                Publicacion.id_publicacion == id_publicacion,
+                Publicacion.fecha_eliminacion.is_not(None),
+            )
+        )
+        await db.commit()
+    # 0 filas: otra purga (p. ej. la pasada de pendientes) la borró primero
+    return borrada.rowcount > 0
+
+
+async def purgar_publicacion(id_publicacion: int) -> bool:
+    """
+    Background task: purga una publicación marcada. True solo si esta llamada la
+    borró (False si no estaba marcada, ya estaba purgada o se agotaron los reintentos).
+    """
+    for intento in range(1, config.PURGA_MAX_INTENTOS + 1):
+        try:
+            purgada = await _purgar(id_publicacion)
+            if purgada:
+                metricas_purga.sumar("publicaciones_purgadas")
+            return purgada
+        except Exception as e:
+            if intento == config.PURGA_MAX_INTENTOS:
+                break
+            metricas_purga.sumar("reintentos")
+            espera = config.PURGA_BACKOFF_SEGUNDOS * 2 ** (intento - 1)
+            logger.warning(f"Purga de publicación {id_publicacion} falló ({e}); reintento en {espera}s")
+            await asyncio.sleep(espera)
+
+    metricas_purga.sumar("publicaciones_fallidas")
+    logger.error(f"No se pudo purgar la publicación {id_publicacion}; queda pendiente para la próxima pasada")
+    return False
+
+
+async def purgar_pendientes() -> int:
+    """
+    Purga las marcadas hace más de PURGA_GRACIA_SEGUNDOS (las que quedaron a medias
+    por un reinicio o agotaron los reintentos). Devuelve cuántas se purgaron.
+    """
+    limite = datetime.now(timezone.utc) - timedelta(seconds=config.PURGA_GRACIA_SEGUNDOS)
+    async with AsyncSessionLocal() as db:
+        ids: List[int] = (
+            await db.scalars(
+                select(Publicacion.id_publicacion)
+                .where(Publicacion.fecha_eliminacion.is_not(None), Publicacion.fecha_eliminacion < limite)
+                .order_by(Publicacion.fecha_eliminacion)
+            )
+        ).all()
+
+    purgadas = 0
+    for id_publicacion in ids:
+        purgadas += await purgar_publicacion(id_publicacion)
+    return purgadas
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Publicaciones purgadas: {asyncio.run(purgar_pendientes())}")
@@ -0,0 +1,114 @@
+"""
+Reconciliador bucket ↔ base: encuentra blobs que ninguna fila de `imagenes`
+referencia (url_foto, url_thumb ni url_medium) y los informa o los borra.
+
+    python -m app.services.reconciler                     # solo informa
+    python -m app.services.reconciler --borrar --gracia-horas 48
+
+Recorre el listado del bucket página por página y las URLs de la base con un
+cursor del lado del servidor, los dos ordenados por nombre, y los compara como
+un merge: ninguno de los dos lados se carga entero en memoria. Los blobs
+creados o reutilizados (storage_service.ultimo_uso) dentro del período de
+gracia se saltean (subidas firmadas que el cliente todavía no registró,
+publicaciones que se están creando con una foto que ya estaba). Los
+huérfanos se borran con la API batch, cada uno condicional a la
+metageneración del listado: si alguien lo reutilizó después, se conserva. Con
+STORAGE_EMULATOR_HOST corre contra un GCS falso local.
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator
+
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.db.database import SessionLocal
+from app.db.models import Imagen
+from app.services.storage_service import delete_blobs_condicional, get_bucket, public_url, ultimo_uso, GCS_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def urls_referenciadas(db: Session, base: str, tanda: int) -> Iterator[str]:
+    """URLs de `imagenes` bajo `base`, ordenadas por bytes (mismo orden que el listado de GCS)."""
+    urls = union_all(
+        select(Imagen.url_foto.label("url")),
+        select(Imagen.url_thumb),
+        select(Imagen.url_medium),
+    ).subquery()
+    resultado = db.execute(
+        select(urls.c.url)
+        .where(urls.c.url.startswith(base, autoescape=True))
+        .order_by(urls.c.url.collate("C"))
+        .execution_options(yield_per=tanda)  # cursor del lado del servidor
+    )
+    for (url,) in resultado:
+        yield url
+
+
+def reconciliar(db: Session, prefijo: str, gracia: timedelta, borrar: bool, tanda: int = 1000) -> dict:
+    bucket = get_bucket()
+    base = public_url("")
+    limite = datetime.now(timezone.utc) - gracia
+    resumen = {"examinados": 0, "referenciados": 0, "recientes": 0, "huerfanos": 0, "borrados": 0, "fallidos": 0}
+
+    referencias = urls_referenciadas(db, base, tanda)
+    actual = next(referencias, None)
+    pendientes: Dict[str, int] = {}  # url -> metageneración listada
+
+    def vaciar():
+        borradas, fallidas = delete_blobs_condicional(pendientes)
+        resumen["borrados"] += len(borradas)
+        resumen["fallidos"] += len(fallidas)
+        pendientes.clear()
+
+    for pagina in bucket.list_blobs(prefix=prefijo, page_size=tanda).pages:
+        for blob in pagina:
+            resumen["examinados"] += 1
+            url = public_url(blob.name)
+            # Merge: avanzar las referencias hasta alcanzar al blob actual
+            while actual is not None and actual < url:
+                actual = next(referencias, None)
+            if actual == url:
+                resumen["referenciados"] += 1
+                continue
+            uso = ultimo_uso(blob)
+            if uso and uso > limite:
+                resumen["recientes"] += 1
+                continue
+
+            resumen["huerfanos"] += 1
+            if not borrar:
+                print(f"huérfano: {url} ({blob.size} bytes, último uso {uso:%Y-%m-%d %H:%M})")
+                continue
+            pendientes[url] = blob.metageneration
+            if len(pendientes) >= GCS_BATCH_SIZE:
+                vaciar()
+
+    if pendientes:
+        vaciar()
+    return resumen
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # Por defecto todo el bucket: las subidas viejas quedaron en la raíz, no bajo GCS_UPLOAD_PREFIX
+    parser.add_argument("--prefijo", default="", help="solo blobs bajo este prefijo")
+    parser.add_argument("--gracia-horas", type=float, default=config.RECONCILIADOR_GRACIA_HORAS)
+    parser.add_argument("--borrar", action="store_true", help="borrar los huérfanos (por defecto solo se informan)")
+    parser.add_argument("--tanda", type=int, default=1000, help="blobs por página y filas por fetch")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        resumen = reconciliar(db, args.prefijo, timedelta(hours=args.gracia_horas), args.borrar, args.tanda)
+    finally:
+        db.close()
+    print(" ".join(f"{k}={v}" for k, v in resumen.items()))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,40 @@
+from sqlalchemy import any_, func, literal, or_, select
+
+from app.db.models import Publicacion, MarcaVehiculo, SEARCH_CONFIG, documento_busqueda
+
+
+def consulta_texto(texto: str):
+    """tsquery en español; acepta frases entre comillas y -exclusiones (websearch)."""
+    return func.websearch_to_tsquery(SEARCH_CONFIG, texto)
+
+
+def condicion_busqueda(texto: str):
+    """
+    Coincidencia por texto completo (con stemming) o por similitud de trigramas
+    (tolera errores de tipeo) contra título, descripción corta o marca.
+
+    Todas las ramas del OR son sobre columnas de publicaciones, así el planner
+    las resuelve con un BitmapOr de sus índices: la marca entra como
+    id_marca_vehiculo = ANY(ARRAY(SELECT ...)), que usa el índice por marca.
+    Una rama sobre la tabla unida (marcas_vehiculos) obligaría a recorrer
+    todas las publicaciones. No necesita join con MarcaVehiculo.
+    """
+    termino = literal(texto)
+    marcas = select(MarcaVehiculo.id_marca_vehiculo).where(termino.op("<%")(MarcaVehiculo.nombre_marca_vehiculo))
+    return or_(
+        documento_busqueda.op("@@")(consulta_texto(texto)),
+        termino.op("<%")(Publicacion.titulo),
+        termino.op("<%")(Publicacion.descripcion_corta),
+        Publicacion.id_marca_vehiculo == any_(func.array(marcas.scalar_subquery())),
+    )
+
+
+def relevancia(texto: str):
+    """Puntaje para ordenar resultados: texto completo + similitud en título y marca."""
+    termino = literal(texto)
+    return (
+        func.ts_rank_cd(documento_busqueda, consulta_texto(texto))
+        + func.word_similarity(termino, Publicacion.titulo)
+        + 0.5 * func.word_similarity(termino, MarcaVehiculo.nombre_marca_vehiculo)
+        + 0.25 * func.word_similarity(termino, Publicacion.descripcion_corta)
+    )
@@ -0,0 +1,364 @@
+import asyncio
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from google.auth.credentials import Signing
+from google.auth.transport import requests as google_requests
+from google.cloud import storage
+from google.cloud.exceptions import NotFound, PreconditionFailed
+from requests.adapters import HTTPAdapter
+
+from app.core import config
+
+BUCKET_NAME = config.BUCKET_NAME
+
+# Executor propio para las subidas: no compite con el threadpool de Starlette
+_upload_executor = ThreadPoolExecutor(
+    max_workers=config.GCS_UPLOAD_CONCURRENCY, thread_name_prefix="gcs-upload"
+)
+
+
+@lru_cache(maxsize=1)
+def get_storage_client() -> storage.Client:
+    """
+    Cliente de GCS compartido por todo el proceso.
+
+    Respeta STORAGE_EMULATOR_HOST, así que también sirve contra un fake-gcs-server local.
+    """
+    client = storage.Client()  # credenciales de GOOGLE_APPLICATION_CREDENTIALS
+    # Pool HTTP con tantas conexiones como subidas simultáneas
+    adapter = HTTPAdapter(
+        pool_connections=config.GCS_UPLOAD_CONCURRENCY,
+        pool_maxsize=config.GCS_UPLOAD_CONCURRENCY,
+    )
+    client._http.mount("https://", adapter)
+    client._http.mount("http://", adapter)
+    return client
+
+
+def get_bucket() -> storage.Bucket:
+    return get_storage_client().bucket(BUCKET_NAME)
+
+
+def public_url(blob_name: str) -> str:
+    return f"https://storage.googleapis.com/{BUCKET_NAME}/{blob_name}"
+
+
+def parse_gcs_url(file_url: str) -> Optional[Tuple[str, str]]:
+    """(bucket, blob) a partir de https://storage.googleapis.com/bucket/carpeta/archivo.jpg"""
+    path_parts = urlparse(file_url).path.lstrip('/').split('/', 1)
+    if len(path_parts) < 2 or not path_parts[1]:
+        return None
+    return path_parts[0], path_parts[1]
+
+
+async def run_in_storage_executor(fn, *args):
+    """Ejecuta una llamada bloqueante de GCS en el executor de storage."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_upload_executor, fn, *args)
+
+
+def download_bytes(blob_name: str, max_bytes: Optional[int] = None) -> bytes:
+    """
+    Descarga un objeto entero a memoria. Con `max_bytes` mira el tamaño antes
+    y falla sin descargar si es más grande.
+    """
+    blob = get_bucket().get_blob(blob_name)
+    if blob is None:
+        raise NotFound(f"No existe el objeto {blob_name}")
+    if max_bytes is not None and blob.size > max_bytes:
+        raise ValueError(f"{blob_name} pesa {blob.size} bytes (máximo {max_bytes})")
+    return blob.download_as_bytes(if_generation_match=blob.generation)
+
+
+def upload_bytes(blob_name: str, data: bytes, content_type: str) -> str:
+    blob = get_bucket().blob(blob_name)
+    blob.cache_control = config.GCS_CACHE_CONTROL
+    blob.upload_from_string(data, content_type=content_type)
+    return public_url(blob_name)
+
+
+def extension_de(content_type: Optional[str]) -> str:
+    """image/jpeg -> jpeg, image/svg+xml -> svg"""
+    return (content_type or "").split("/", 1)[-1].split("+")[0] or "bin"
+
+
+def content_blob_name(sha256_hex: str, content_type: Optional[str]) -> str:
+    """Nombre por contenido: prefijo + sha256 + extensión."""
+    return f"{config.GCS_UPLOAD_PREFIX}{sha256_hex}.{extension_de(content_type)}"
+
+
+class StreamUpload:
+    """
+    Subida de un archivo que llega por partes (sin tenerlo entero en memoria ni
+    en disco). Se escribe con una subida resumable a un objeto temporal mientras
+    se calcula el sha256; al terminar se copia (del lado de GCS) al nombre por
+    contenido y se borra el temporal. Así dos fotos iguales quedan en un solo
+    objeto y una URL nunca cambia de contenido (Cache-Control immutable).
+
+    Varias filas de `imagenes` pueden apuntar al mismo objeto: antes de borrar
+    uno hay que verificar que no quede referenciado
+    (image_service.originales_sin_referencias) y borrarlo con
+    delete_blobs_sin_uso, que respeta las reutilizaciones recientes: al
+    reutilizar un objeto se le marca la hora en la metadata `reutilizado`,
+    porque la fila que lo va a referenciar todavía no tiene commit.
+
+    Los métodos bloquean: se llaman desde el executor de storage. Si la subida
+    se abandona sin `finish`, la sesión resumable expira sola y no queda objeto
+    (si llegó a quedar un temporal, lo limpia el reconciliador).
+    """
+
+    def __init__(self, content_type: str):
+        self.content_type = content_type
+        self.size = 0
+        self._sha = hashlib.sha256()
+        self._temp = get_bucket().blob(
+            f"{config.GCS_UPLOAD_PREFIX}tmp/{uuid.uuid4().hex}",
+            chunk_size=config.GCS_STREAM_CHUNK_BYTES,
+        )
+        self._temp.cache_control = config.GCS_CACHE_CONTROL
+        self._writer = None
+
+    def write(self, data: bytes) -> None:
+        if self._writer is None:
+            self._writer = self._temp.open("wb", content_type=self.content_type, ignore_flush=True)
+        self._sha.update(data)
+        self.size += len(data)
+        self._writer.write(data)
+
+    def finish(self) -> str:
+        """Cierra la subida y devuelve la URL pública del objeto por contenido."""
+        if self._writer is None:
+            self.write(b"")
+        self._writer.close()
+
+        bucket = get_bucket()
+        blob_name = content_blob_name(self._sha.hexdigest(), self.content_type)
+        for _ in range(2):
+            try:
+                # Solo crear: si el objeto ya existe (misma foto) es idéntico y se reutiliza
+                bucket.copy_blob(self._temp, bucket, blob_name, if_generation_match=0)
+                break
+            except PreconditionFailed:
+                pass
+            try:
+                _marcar_reutilizado(bucket.blob(blob_name))
+                break
+            except NotFound:
+                # Se borró entre la copia y la marca: se vuelve a crear
+                continue
+        else:
+            raise RuntimeError(f"No se pudo crear ni reutilizar {blob_name}")
+        try:
+            self._temp.delete()
+        except NotFound:
+            pass
+        return public_url(blob_name)
+
+
+def _marcar_reutilizado(blob: storage.Blob) -> None:
+    """Marca la hora de reutilización (sube la metageneración: un borrado condicional en curso falla)."""
+    blob.metadata = {"reutilizado": datetime.now(timezone.utc).isoformat()}
+    blob.patch()
+
+
+def ultimo_uso(blob: storage.Blob) -> Optional[datetime]:
+    """Cuándo se creó o se reutilizó por última vez un objeto (None si no se sabe)."""
+    reutilizado = (blob.metadata or {}).get("reutilizado")
+    if reutilizado:
+        return datetime.fromisoformat(reutilizado)
+    return blob.time_created
+
+
+def delete_blobs_sin_uso(file_urls: List[str], gracia: timedelta) -> Tuple[List[str], List[str]]:
+    """
+    Borra objetos por contenido que ya no tienen filas en `imagenes`, salvo los
+    reutilizados en los últimos `gracia` (un request en curso los va a referenciar).
+    El borrado es condicional a la metageneración leída: si otro request lo
+    reutiliza en el medio, el borrado falla y el objeto se queda.
+
+    Devuelve (borradas, fallidas); las que se conservan no están en ninguna. Un
+    objeto que ya no existe cuenta como borrado.
+    """
+    bucket = get_bucket()
+    limite = datetime.now(timezone.utc) - gracia
+    borradas, fallidas = [], []
+    for url in file_urls:
+        partes = parse_gcs_url(url)
+        if not partes:
+            print(f"URL inválida: {url}")
+            continue
+        try:
+            blob = bucket.get_blob(partes[1])
+            if blob is not None:
+                reutilizado = (blob.metadata or {}).get("reutilizado")
+                if reutilizado and datetime.fromisoformat(reutilizado) > limite:
+                    continue
+                blob.delete(if_metageneration_match=blob.metageneration)
+            borradas.append(url)
+        except NotFound:
+            borradas.append(url)
+        except PreconditionFailed:
+            pass
+        except Exception as e:
+            print(f"Error eliminando {url} de GCS: {e}")
+            fallidas.append(url)
+    return borradas, fallidas
+
+
+# --- Subida directa al bucket con URLs firmadas ---
+def new_upload_name(content_type: str) -> str:
+    """Nombre único para un objeto que el cliente va a subir directamente."""
+    return f"{config.GCS_UPLOAD_PREFIX}{uuid.uuid4().hex}.{extension_de(content_type)}"
+
+
+def upload_headers(content_type: str) -> Dict[str, str]:
+    """
+    Headers que el cliente tiene que mandar en el PUT de una URL firmada. Van
+    dentro de la firma: GCS rechaza el PUT si faltan o no coinciden.
+    """
+    return {
+        "Content-Type": content_type,
+        # Tope de tamaño del lado de GCS: no hay que esperar al registro para cortar
+        "x-goog-content-length-range": f"1,{int(config.MAX_MB_POR_IMAGEN * 1024 * 1024)}",
+        # Solo crear: el objeto ya revisado al registrarlo no se puede reemplazar después
+        "x-goog-if-generation-match": "0",
+    }
+
+
+def generate_upload_url(blob_name: str, content_type: str) -> str:
+    """
+    URL firmada V4 para hacer PUT del objeto directamente en el bucket.
+
+    El cliente debe enviar los headers de upload_headers(content_type).
+    """
+    client = get_storage_client()
+    credentials = client._credentials
+    firma = {}
+    if not isinstance(credentials, Signing):
+        # En Cloud Run las credenciales no tienen clave privada: se firma vía IAM signBlob
+        if not credentials.valid:
+            credentials.refresh(google_requests.Request())
+        firma = {
+            "service_account_email": credentials.service_account_email,
+            "access_token": credentials.token,
+        }
+
+    blob = client.bucket(BUCKET_NAME).blob(blob_name)
+    return blob.generate_signed_url(
+        version="v4",
+        expiration=timedelta(minutes=config.GCS_SIGNED_URL_MINUTES),
+        method="PUT",
+        headers=upload_headers(content_type),
+        **firma,
+    )
+
+
+def _inspeccionar(bucket: storage.Bucket, blob_name: str, bytes_cabecera: int):
+    blob = bucket.get_blob(blob_name)
+    if blob is None:
+        return None, b""
+    if not blob.size:
+        return blob, b""
+    return blob, blob.download_as_bytes(start=0, end=bytes_cabecera - 1, if_generation_match=blob.generation)
+
+
+async def inspeccionar_blobs(
+    blob_names: List[str], bytes_cabecera: int
+) -> Dict[str, Tuple[Optional[storage.Blob], bytes]]:
+    """
+    Metadatos (tamaño, Content-Type) y primeros bytes de cada objeto, en
+    paralelo. (None, b"") para los que no existen.
+    """
+    bucket = get_bucket()
+    loop = asyncio.get_running_loop()
+    resultados = await asyncio.gather(
+        *[loop.run_in_executor(_upload_executor, _inspeccionar, bucket, name, bytes_cabecera) for name in blob_names]
+    )
+    return dict(zip(blob_names, resultados))
+
+
+# La API batch de GCS acepta hasta 100 operaciones por request
+GCS_BATCH_SIZE = 100
+
+
+def delete_blobs_batch(file_urls: List[str]) -> List[str]:
+    """
+    Borra URLs con la API batch de GCS (un request cada 100 blobs).
+
+    Si un batch falla se reintenta blob por blob para saber cuáles quedaron;
+    un blob que ya no existe cuenta como borrado. Devuelve las URLs que no se
+    pudieron borrar (para reintentar). Las URLs que no son de GCS se informan y
+    se saltean: reintentarlas no cambiaría nada.
+    """
+    client = get_storage_client()
+    por_bucket: Dict[str, List[Tuple[str, str]]] = {}
+    fallidas = []
+    for url in file_urls:
+        partes = parse_gcs_url(url)
+        if not partes:
+            print(f"URL inválida: {url}")
+            continue
+        por_bucket.setdefault(partes[0], []).append((url, partes[1]))
+
+    for bucket_name, blobs in por_bucket.items():
+        bucket = client.bucket(bucket_name)
+        for i in range(0, len(blobs), GCS_BATCH_SIZE):
+            tanda = blobs[i:i + GCS_BATCH_SIZE]
+            try:
+                with client.batch():
+                    for _, blob_name in tanda:
+                        bucket.blob(blob_name).delete()
+            except Exception:
+                for url, blob_name in tanda:
+                    try:
+                        bucket.blob(blob_name).delete()
+                    except NotFound:
+                        pass
+                    except Exception as e:
+                        print(f"Error eliminando {url} de GCS: {e}")
+                        fallidas.append(url)
+    return fallidas
+
+
+def delete_blobs_condicional(metageneraciones: Dict[str, int]) -> Tuple[List[str], List[str]]:
+    """
+    Como delete_blobs_batch (un request cada 100 blobs), pero cada borrado es
+    condicional a la metageneración dada, la que se leyó al decidir borrarlo: si
+    el objeto cambió desde entonces (p. ej. se reutilizó) se conserva.
+
+    Devuelve (borradas, fallidas); las que se conservan no están en ninguna. Un
+    objeto que ya no existe cuenta como borrado.
+    """
+    client = get_storage_client()
+    pendientes = []
+    for url, metageneracion in metageneraciones.items():
+        partes = parse_gcs_url(url)
+        if not partes:
+            print(f"URL inválida: {url}")
+            continue
+        pendientes.append((url, partes, metageneracion))
+
+    borradas, fallidas = [], []
+    for i in range(0, len(pendientes), GCS_BATCH_SIZE):
+        tanda = pendientes[i:i + GCS_BATCH_SIZE]
+        try:
+            with client.batch(raise_exception=False) as batch:
+                for _, (bucket_name, blob_name), metageneracion in tanda:
+                    client.bucket(bucket_name).blob(blob_name).delete(if_metageneration_match=metageneracion)
+        except Exception as e:
+            print(f"Error en el batch de borrado: {e}")
+            fallidas.extend(url for url, _, _ in tanda)
+            continue
+        for (url, _, _), respuesta in zip(tanda, batch._responses):
+            if 200 <= respuesta.status_code < 300 or respuesta.status_code == 404:
+                borradas.append(url)
+            elif respuesta.status_code != 412:
+                print(f"Error eliminando {url} de GCS: HTTP {respuesta.status_code}")
+                fallidas.append(url)
+    return borradas, fallidas
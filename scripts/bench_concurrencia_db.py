@@ -0,0 +1,148 @@
+"""
+Throughput del feed con requests concurrentes: Session sync (psycopg2) usada
+dentro de un handler async def, como estaban los endpoints de publicaciones,
+contra AsyncSession (asyncpg), como están ahora.
+
+    python -m scripts.bench_concurrencia_db                          # base configurada (POSTGRES_*)
+    python -m scripts.bench_concurrencia_db --url postgresql+psycopg2://... --seed 20000
+    python -m scripts.bench_concurrencia_db --latencia-ms 5          # simula la red hasta Cloud SQL
+
+Los requests van con httpx a la app ASGI en el mismo proceso (sin sockets), así
+lo que se mide es cuánto se serializan en el event loop. Contra una base local
+cada query tarda muy poco y el handler sync casi no bloquea: --latencia-ms
+agrega un pg_sleep por request para acercarse a una base remota. Además del
+throughput se informa el mayor atraso que sufrió el event loop (un latido cada
+10 ms): con la sesión sync crece con cada query.
+
+--seed carga datos sintéticos (solo para bases locales) igual que
+app/db/explain_check.py.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.services.publicacion_queries import filtros_publicacion, select_tarjetas
+from app.db.database import DB_URL
+from app.db.explain_check import sembrar
+from app.db.models import Publicacion
+
+
+def crear_app(engine, async_engine, limit: int, latencia: float) -> FastAPI:
+    app = FastAPI()
+    SesionSync = sessionmaker(bind=engine)
+    SesionAsync = async_sessionmaker(async_engine, expire_on_commit=False)
+    espera = text("SELECT pg_sleep(:segundos)")
+
+    def pagina():
+        return (
+            select_tarjetas()
+            .where(*filtros_publicacion(None, None, None, None))
+            .order_by(Publicacion.fecha_publicacion.desc(), Publicacion.id_publicacion.desc())
+            .limit(limit)
+        )
+
+    @app.get("/sync")
+    async def feed_sync():
+        # Bloquea el event loop mientras espera a la base
+        with SesionSync() as db:
+            if latencia:
+                db.execute(espera, {"segundos": latencia})
+            filas = db.execute(pagina()).all()
+        return {"publicaciones": len(filas)}
+
+    @app.get("/async")
+    async def feed_async():
+        async with SesionAsync() as db:
+            if latencia:
+                await db.execute(espera, {"segundos": latencia})
+            filas = (await db.execute(pagina())).all()
+        return {"publicaciones": len(filas)}
+
+    return app
+
+
+async def medir(app: FastAPI, ruta: str, total: int, concurrencia: int) -> dict:
+    latencias = []
+    atraso_max = 0.0
+    terminado = asyncio.Event()
+
+    async def latido():
+        nonlocal atraso_max
+        while not terminado.is_set():
+            antes = time.perf_counter()
+            await asyncio.sleep(0.01)
+            atraso_max = max(atraso_max, time.perf_counter() - antes - 0.01)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cliente:
+        semaforo = asyncio.Semaphore(concurrencia)
+
+        async def uno():
+            async with semaforo:
+                inicio = time.perf_counter()
+                respuesta = await cliente.get(ruta)
+                respuesta.raise_for_status()
+                latencias.append(time.perf_counter() - inicio)
+
+        # Calentamiento: abre las conexiones del pool antes de medir
+        await asyncio.gather(*(cliente.get(ruta) for _ in range(concurrencia)))
+        latidos = asyncio.create_task(latido())
+        inicio = time.perf_counter()
+        await asyncio.gather(*(uno() for _ in range(total)))
+        duracion = time.perf_counter() - inicio
+        terminado.set()
+        await latidos
+
+    latencias.sort()
+    return {
+        "req/s": round(total / duracion, 1),
+        "p50 ms": round(statistics.median(latencias) * 1000, 1),
+        "p95 ms": round(latencias[int(len(latencias) * 0.95) - 1] * 1000, 1),
+        "atraso máx. del loop ms": round(atraso_max * 1000, 1),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=DB_URL, help="URL psycopg2; la async se deriva con asyncpg")
+    parser.add_argument("--seed", type=int, default=0, help="publicaciones sintéticas a insertar antes de medir")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20, help="tarjetas por página")
+    parser.add_argument("--latencia-ms", type=float, default=0, help="pg_sleep por request (red simulada)")
+    args = parser.parse_args(argv)
+
+    # Mismo tamaño de pool para los dos lados: la diferencia es solo sync / async
+    pool = {"pool_size": args.concurrencia, "max_overflow": 0}
+    engine = create_engine(args.url, **pool)
+    async_engine = create_async_engine(
+        engine.url.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False), **pool
+    )
+    if args.seed:
+        with engine.begin() as conn:
+            sembrar(conn, args.seed)
+
+    app = crear_app(engine, async_engine, args.limit, args.latencia_ms / 1000)
+
+    async def correr():
+        try:
+            for ruta in ("/sync", "/async"):
+                resultado = await medir(app, ruta, args.requests, args.concurrencia)
+                print(f"{ruta:7} " + "  ".join(f"{k}={v}" for k, v in resultado.items()))
+        finally:
+            await async_engine.dispose()
+
+    print(f"{args.requests} requests, {args.concurrencia} concurrentes, latencia simulada {args.latencia_ms} ms")
+    asyncio.run(correr())
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
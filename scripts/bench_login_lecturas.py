@@ -0,0 +1,127 @@
+"""
+Tráfico mixto de logins y lecturas: bcrypt dentro de un handler sync (en el
+threadpool de Starlette, como estaba login) contra bcrypt en el executor propio
+(run_password_work, como está ahora), con lecturas sync de un catálogo en memoria
+(como marcas y categorías) corriendo al mismo tiempo.
+
+    python -m scripts.bench_login_lecturas
+    python -m scripts.bench_login_lecturas --logins 200 --lecturas 2000 --rounds 12
+
+No usa la base: el hash se calcula una vez al arrancar y cada login lo verifica.
+Los requests van con httpx a la app ASGI en el mismo proceso. Lo que interesa es
+la latencia de las lecturas mientras hay una ráfaga de logins: con bcrypt en el
+threadpool compartido esperan detrás de los hash; con el executor propio solo
+compiten por CPU. También se informa cuántos logins recibieron 503 (cola llena,
+PASSWORD_WORKERS + PASSWORD_QUEUE_MAX).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from passlib.context import CryptContext
+
+from app.core import config
+from app.core.security import run_password_work
+
+CLAVE = "una clave de prueba"
+
+
+def crear_app(contexto: CryptContext, hash_guardado: str) -> FastAPI:
+    app = FastAPI()
+    catalogo = [{"id_marca_vehiculo": i, "nombre_marca_vehiculo": f"Marca {i}"} for i in range(60)]
+
+    @app.post("/antes/login")
+    def login_sync():
+        # Ocupa un hilo del threadpool compartido mientras corre bcrypt
+        if not contexto.verify(CLAVE, hash_guardado):
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    @app.post("/ahora/login")
+    async def login_async():
+        if not await run_password_work(contexto.verify, CLAVE, hash_guardado):
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    @app.get("/marcas")
+    def marcas():
+        # Handler sync como get_all_brands: necesita un hilo libre del threadpool
+        return catalogo
+
+    return app
+
+
+def percentil(valores: list, p: float) -> float:
+    return valores[max(int(len(valores) * p) - 1, 0)] * 1000
+
+
+async def medir(app: FastAPI, modo: str, logins: int, lecturas: int, concurrencia: int) -> dict:
+    latencias = {"login": [], "lectura": []}
+    rechazados = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as cliente:
+        # Todos los logins a la vez (la ráfaga); las lecturas con concurrencia acotada
+        semaforo = asyncio.Semaphore(concurrencia)
+
+        async def login():
+            nonlocal rechazados
+            inicio = time.perf_counter()
+            respuesta = await cliente.post(f"/{modo}/login")
+            if respuesta.status_code == 503:
+                rechazados += 1
+                return
+            respuesta.raise_for_status()
+            latencias["login"].append(time.perf_counter() - inicio)
+
+        async def lectura():
+            async with semaforo:
+                inicio = time.perf_counter()
+                (await cliente.get("/marcas")).raise_for_status()
+                latencias["lectura"].append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)), *(lectura() for _ in range(lecturas)))
+        duracion = time.perf_counter() - inicio
+
+    lect = sorted(latencias["lectura"])
+    log = sorted(latencias["login"])
+    return {
+        "duración s": round(duracion, 2),
+        "lecturas p50 ms": round(statistics.median(lect) * 1000, 1),
+        "lecturas p95 ms": round(percentil(lect, 0.95), 1),
+        "lecturas máx ms": round(lect[-1] * 1000, 1),
+        "logins ok": len(log),
+        "logins 503": rechazados,
+        "logins p95 ms": round(percentil(log, 0.95), 1) if log else None,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100, help="logins simultáneos de la ráfaga")
+    parser.add_argument("--lecturas", type=int, default=1000)
+    parser.add_argument("--concurrencia", type=int, default=20, help="lecturas en vuelo a la vez")
+    parser.add_argument("--rounds", type=int, default=config.BCRYPT_ROUNDS, help="costo de bcrypt")
+    args = parser.parse_args(argv)
+
+    contexto = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+    app = crear_app(contexto, contexto.hash(CLAVE))
+
+    print(
+        f"{args.logins} logins + {args.lecturas} lecturas, bcrypt {args.rounds} rounds, "
+        f"PASSWORD_WORKERS={config.PASSWORD_WORKERS} PASSWORD_QUEUE_MAX={config.PASSWORD_QUEUE_MAX}"
+    )
+
+    async def correr():
+        for modo in ("antes", "ahora"):
+            resultado = await medir(app, modo, args.logins, args.lecturas, args.concurrencia)
+            print(f"{modo:6} " + "  ".join(f"{k}={v}" for k, v in resultado.items()))
+
+    asyncio.run(correr())
+
+
+if __name__ == "__main__":
+    main()
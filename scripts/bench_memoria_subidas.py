@@ -0,0 +1,138 @@
+"""
+Memoria y disco de un POST con muchas fotos grandes: el camino de antes
+(UploadFile de Starlette, que guarda cada parte en un temporal, y después
+upload_from_file en paralelo) contra la ingesta en streaming de ahora
+(recibir_formulario: cada parte va directo a GCS mientras llega).
+
+    STORAGE_EMULATOR_HOST=http://localhost:4443 python -m scripts.bench_memoria_subidas
+    python -m scripts.bench_memoria_subidas --fotos 40 --mb 8
+
+Sube al bucket configurado (BUCKET_NAME): usar un GCS falso local
+(fake-gcs-server, ver tests/conftest.py) o un bucket de pruebas; con el
+emulador el bucket se crea si no existe. No usa la base.
+
+El cuerpo se arma una vez, antes de medir, y se manda en trozos de 64 KB como
+llegaría por la red. Se informa el pico de tracemalloc durante el request (lo
+que Python tuvo en memoria a la vez), los bytes que Starlette pasó a disco y
+la duración.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+import tracemalloc
+
+import httpx
+from fastapi import FastAPI, Request
+from pydantic import BaseModel
+
+from app.core import config
+from app.services.ingest_service import recibir_formulario
+from app.services.storage_service import (
+    content_blob_name, get_bucket, get_storage_client, public_url, run_in_storage_executor,
+)
+
+TROZO = 64 * 1024
+
+
+class Formulario(BaseModel):
+    titulo: str
+
+
+def subir_archivo(archivo) -> str:
+    """Lo que hacía upload_to_gcs: hash del temporal y upload_from_file."""
+    sha = hashlib.sha256()
+    for bloque in iter(lambda: archivo.file.read(1024 * 1024), b""):
+        sha.update(bloque)
+    archivo.file.seek(0)
+    blob = get_bucket().blob(content_blob_name(sha.hexdigest(), archivo.content_type))
+    blob.cache_control = config.GCS_CACHE_CONTROL
+    # Sin size ni chunk_size: la subida resumable lee el archivo entero a memoria
+    blob.upload_from_file(archivo.file, content_type=archivo.content_type)
+    return public_url(blob.name)
+
+
+def crear_app(medidas: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/antes")
+    async def antes(request: Request):
+        formulario = await request.form(max_files=1000)
+        archivos = formulario.getlist("files")
+        # SpooledTemporaryFile: pasado 1 MB la parte ya se escribió a disco
+        medidas["a disco"] = sum(a.size for a in archivos if getattr(a.file, "_rolled", False))
+        urls = await asyncio.gather(*(run_in_storage_executor(subir_archivo, a) for a in archivos))
+        await formulario.close()
+        return {"imagenes": len(urls)}
+
+    @app.post("/ahora")
+    async def ahora(request: Request):
+        # Sin base: en el benchmark un error corta la corrida, no hay nada que liberar
+        _, subidos = await recibir_formulario(request, None, Formulario, max_archivos=1000)
+        medidas["a disco"] = 0
+        return {"imagenes": len(subidos)}
+
+    return app
+
+
+def armar_cuerpo(fotos: int, mb: float) -> tuple:
+    """(headers, cuerpo multipart) con `fotos` JPEG distintos de `mb` MB."""
+    tamaño = int(mb * 1024 * 1024)
+    archivos = [
+        ("files", (f"foto_{i}.jpg", b"\xff\xd8\xff\xe0" + os.urandom(16) + bytes([i % 256]) * (tamaño - 20), "image/jpeg"))
+        for i in range(fotos)
+    ]
+    pedido = httpx.Request("POST", "http://bench/", data={"titulo": "Falcon"}, files=archivos)
+    return {"content-type": pedido.headers["content-type"]}, pedido.read()
+
+
+async def trozos(cuerpo: bytes):
+    vista = memoryview(cuerpo)
+    for i in range(0, len(vista), TROZO):
+        yield bytes(vista[i:i + TROZO])
+
+
+def medir(modo: str, headers: dict, cuerpo: bytes) -> None:
+    medidas = {}
+    app = crear_app(medidas)
+
+    async def enviar():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as cliente:
+            respuesta = await cliente.post(f"/{modo}", headers=headers, content=trozos(cuerpo))
+            respuesta.raise_for_status()
+            return respuesta.json()
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = asyncio.run(enviar())
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{modo:6} {resultado['imagenes']} fotos  pico de memoria={pico / 1024 / 1024:.1f} MB  "
+        f"a disco={medidas['a disco'] / 1024 / 1024:.1f} MB  {duracion:.2f} s"
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fotos", type=int, default=20)
+    parser.add_argument("--mb", type=float, default=5, help="tamaño de cada foto")
+    args = parser.parse_args(argv)
+
+    if os.getenv("STORAGE_EMULATOR_HOST") and not get_bucket().exists():
+        get_storage_client().create_bucket(config.BUCKET_NAME)
+    headers, cuerpo = armar_cuerpo(args.fotos, args.mb)
+    print(
+        f"{args.fotos} fotos de {args.mb:g} MB en un request, GCS_UPLOAD_CONCURRENCY={config.GCS_UPLOAD_CONCURRENCY}, "
+        f"GCS_STREAM_CHUNK_BYTES={config.GCS_STREAM_CHUNK_BYTES}"
+    )
+    for modo in ("antes", "ahora"):
+        medir(modo, headers, cuerpo)
+
+
+if __name__ == "__main__":
+    main()
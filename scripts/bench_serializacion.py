@@ -0,0 +1,168 @@
+"""
+Costo de serializar la respuesta de cada endpoint de lectura: el camino de
+antes (response_model de FastAPI + jsonable_encoder + json de la stdlib) contra
+el de ahora (dicts armados a mano directo a orjson, sin revalidar).
+
+    python -m scripts.bench_serializacion
+    python -m scripts.bench_serializacion --repeticiones 2000 --tarjetas 50 --imagenes 10
+
+No usa la base: las filas son sintéticas con la forma de select_tarjetas() y
+select_detalle(), y pasan por las mismas funciones que usan los endpoints
+(tarjeta, documento_detalle, documento_edicion). También se informa el tamaño
+y el tiempo de gzip / brotli (si está instalado) del cuerpo resultante, con
+los niveles de app.core.config.
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.api.v1.endpoints.publicacion_endpoints import documento_detalle, documento_edicion, tarjeta
+from app.core.compression import brotli, comprimir
+from app.schemas.publicaciones import PublicacionDetails, PublicacionEditDetails
+
+
+def json_stdlib(contenido) -> bytes:
+    """Lo que hacía JSONResponse.render."""
+    return json.dumps(contenido, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def fila_tarjeta(i: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id_publicacion=i,
+        titulo=f"Ford Falcon Futura {i}",
+        descripcion_corta="Motor 3.6, caja de cuatro, papeles al día",
+        url_portada=f"https://storage.googleapis.com/guincho/publicaciones/{i:064x}.jpg",
+        url_portada_thumb=f"https://storage.googleapis.com/guincho/publicaciones/{i:064x}_thumb.webp",
+        placeholder_portada="data:image/webp;base64," + "A" * 120,
+        year_vehiculo=1970 + i % 20,
+        id_marca_vehiculo=1 + i % 10,
+        nombre_marca_vehiculo="Ford",
+        id_categoria_vehiculo=1 + i % 4,
+        nombre_categoria_vehiculo="Auto",
+        fecha_publicacion=date(2024, 1, 1),
+        like_count=i * 3,
+    )
+
+
+def fila_detalle(i: int, cantidad_imagenes: int) -> SimpleNamespace:
+    publicacion = SimpleNamespace(
+        id_publicacion=i,
+        id_usuario=7,
+        descripcion="Descripción larga del vehículo. " * 20,
+        descripcion_corta="Motor 3.6, caja de cuatro, papeles al día",
+        titulo=f"Ford Falcon Futura {i}",
+        url=None,
+        year_vehiculo=1978,
+        id_categoria_vehiculo=1,
+        id_marca_vehiculo=1,
+        detalle="Detalle técnico. " * 10,
+        fecha_publicacion=date(2024, 1, 1),
+        like_count=42,
+    )
+    imagenes = [
+        {
+            "id_imagen": i * 100 + n,
+            "numero_imagen": n,
+            "url_foto": f"https://storage.googleapis.com/guincho/publicaciones/{i * 100 + n:064x}.jpg",
+            "url_thumb": f"https://storage.googleapis.com/guincho/publicaciones/{i * 100 + n:064x}_thumb.webp",
+            "url_medium": f"https://storage.googleapis.com/guincho/publicaciones/{i * 100 + n:064x}_medium.webp",
+            "placeholder": "data:image/webp;base64," + "A" * 120,
+        }
+        for n in range(1, cantidad_imagenes + 1)
+    ]
+    return SimpleNamespace(
+        Publicacion=publicacion,
+        nombre_usuario="ana",
+        nombre_marca_vehiculo="Ford",
+        nombre_categoria_vehiculo="Auto",
+        imagenes=imagenes,
+    )
+
+
+def casos(tarjetas: int, imagenes: int, lote: int):
+    """(endpoint, antes, ahora): cada función devuelve el cuerpo en bytes."""
+    filas_feed = [fila_tarjeta(i) for i in range(tarjetas)]
+    detalle = fila_detalle(1, imagenes)
+    filas_lote = [fila_detalle(i, imagenes) for i in range(lote)]
+    marcas = [{"id_marca_vehiculo": i, "nombre_marca_vehiculo": f"Marca {i}"} for i in range(60)]
+
+    detalles = TypeAdapter(list[PublicacionDetails])
+
+    def detalle_antes(fila):
+        # El handler devolvía el dict y FastAPI lo validaba contra response_model
+        # (el orjson.loads para reconstruir el dict suma unos pocos µs)
+        documento = orjson.loads(documento_detalle(fila))
+        documento["fecha_publicacion"] = datetime.fromisoformat(documento["fecha_publicacion"])
+        return PublicacionDetails.model_validate(documento)
+
+    return [
+        (
+            f"feed ({tarjetas} tarjetas)",
+            lambda: json_stdlib(jsonable_encoder({"total": 500, "publicaciones": [tarjeta(f) for f in filas_feed]})),
+            lambda: orjson.dumps({"total": 500, "publicaciones": [tarjeta(f) for f in filas_feed]}),
+        ),
+        (
+            f"detalle ({imagenes} imágenes)",
+            lambda: json_stdlib(jsonable_encoder(detalle_antes(detalle))),
+            lambda: documento_detalle(detalle),
+        ),
+        (
+            "edición",
+            lambda: json_stdlib(jsonable_encoder(PublicacionEditDetails.model_validate(documento_edicion(detalle)))),
+            lambda: orjson.dumps(documento_edicion(detalle)),
+        ),
+        (
+            f"lote ({lote} publicaciones)",
+            lambda: json_stdlib(jsonable_encoder(detalles.validate_python([detalle_antes(f) for f in filas_lote]))),
+            lambda: b'{"publicaciones":[' + b",".join(documento_detalle(f) for f in filas_lote) + b'],"faltantes":[]}',
+        ),
+        (
+            # respuesta_cacheable ya devolvía un Response (sin response_model): solo cambia el encoder
+            "marcas (catálogo)",
+            lambda: json_stdlib(jsonable_encoder(marcas)),
+            lambda: orjson.dumps(marcas),
+        ),
+    ]
+
+
+def medir(funcion, repeticiones: int) -> float:
+    """Microsegundos por llamada (mejor de 3 corridas)."""
+    mejores = []
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        mejores.append((time.perf_counter() - inicio) / repeticiones * 1e6)
+    return min(mejores)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=500)
+    parser.add_argument("--tarjetas", type=int, default=50, help="tarjetas por página del feed")
+    parser.add_argument("--imagenes", type=int, default=8, help="imágenes por publicación")
+    parser.add_argument("--lote", type=int, default=20, help="publicaciones en /batch")
+    args = parser.parse_args(argv)
+
+    codificaciones = ["gzip"] + (["br"] if brotli is not None else [])
+    for nombre, antes, ahora in casos(args.tarjetas, args.imagenes, args.lote):
+        cuerpo = ahora()
+        us_antes = medir(antes, args.repeticiones)
+        us_ahora = medir(ahora, args.repeticiones)
+        print(f"{nombre}: antes {us_antes:.1f} µs, ahora {us_ahora:.1f} µs (x{us_antes / us_ahora:.1f}), {len(cuerpo)} bytes")
+        for codificacion in codificaciones:
+            comprimido = comprimir(cuerpo, codificacion)
+            us = medir(lambda: comprimir(cuerpo, codificacion), max(args.repeticiones // 10, 1))
+            print(f"    {codificacion}: {len(comprimido)} bytes ({len(comprimido) / len(cuerpo):.0%}) en {us:.1f} µs")
+    if brotli is None:
+        print("(brotli no instalado: solo gzip)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+def test_apagado_cancela_la_purga_pendiente(monkeypatch):
+    """Una purga que sigue corriendo al apagar se cancela, no deja la tarea colgada."""
+    cerrados = []
+
+    async def purga_eterna():
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(main, "precargar_catalogos", lambda: None)
+    monkeypatch.setattr(main, "purgar_pendientes", purga_eterna)
+    monkeypatch.setattr(main, "shutdown_process_pool", lambda: cerrados.append(True))
+
+    with TestClient(main.app):
+        tarea = main.app.state.purga_pendientes
+        assert not tarea.done()
+
+    assert tarea.cancelled()
+    assert cerrados == [True]
@@ -0,0 +1,64 @@
+from sqlalchemy import select
+
+from app.api.v1.endpoints import publicacion_endpoints
+from app.db.models import MarcaVehiculo
+from app.services.cache import TTLCache
+
+
+def test_busqueda_por_marca_sin_join(client, sentencias, publicaciones):
+    """La marca se busca por id (subconsulta), no con una rama sobre la tabla unida."""
+    respuesta = client.get("/api/v1/publicacion/buscar", params={"q": "Fiat", "limit": 50})
+
+    assert respuesta.status_code == 200
+    cuerpo = respuesta.json()
+    assert cuerpo["total"] == len(publicaciones) // 2
+    assert {p["nombre_marca_vehiculo"] for p in cuerpo["publicaciones"]} == {"Fiat"}
+    conteo = next(s for s in sentencias if "count(" in s.lower())
+    assert "marcas_vehiculos.nombre_marca_vehiculo" in conteo
+    assert "JOIN marcas_vehiculos" not in conteo
+
+
+def test_filtro_modelo_del_feed_incluye_la_marca(client, publicaciones):
+    respuesta = client.get("/api/v1/publicacion/", params={"modelo": "Fiat", "limit": 50})
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["total"] == len(publicaciones) // 2
+
+
+def conteos(facetas: dict, clave: str, campo: str) -> dict:
+    return {f[campo]: f["cantidad"] for f in facetas[clave]}
+
+
+def test_facetas_cuentan_cada_una_sin_su_propio_filtro(client, engine, sentencias, publicaciones, monkeypatch):
+    """
+    60 publicaciones: impares Fiat, pares Ford, una categoría, año 1970 + i % 5.
+    Cada faceta aplica los demás filtros pero no el suyo (bits de GROUPING()).
+    """
+    monkeypatch.setattr(publicacion_endpoints, "facetas_cache", TTLCache(ttl=60, maxsize=10))
+    with engine.connect() as conn:
+        marcas = dict(conn.execute(select(MarcaVehiculo.nombre_marca_vehiculo, MarcaVehiculo.id_marca_vehiculo)).all())
+    url = "/api/v1/publicacion/facetas"
+
+    todas = client.get(url).json()
+    assert todas["total"] == 60
+    assert conteos(todas, "marcas", "nombre_marca_vehiculo") == {"Fiat": 30, "Ford": 30}
+    assert conteos(todas, "categorias", "nombre_categoria_vehiculo") == {"Auto": 60}
+    assert conteos(todas, "years", "year_vehiculo") == {1970 + r: 12 for r in range(5)}
+    assert [f["year_vehiculo"] for f in todas["years"]] == [1974, 1973, 1972, 1971, 1970]
+
+    ford = client.get(url, params={"marca": marcas["Ford"]}).json()
+    assert ford["total"] == 30
+    assert conteos(ford, "marcas", "nombre_marca_vehiculo") == {"Fiat": 30, "Ford": 30}
+    assert conteos(ford, "categorias", "nombre_categoria_vehiculo") == {"Auto": 30}
+    assert conteos(ford, "years", "year_vehiculo") == {1970 + r: 6 for r in range(5)}
+
+    ford_1971 = client.get(url, params={"marca": marcas["Ford"], "año": 1971}).json()
+    assert ford_1971["total"] == 6
+    assert conteos(ford_1971, "marcas", "nombre_marca_vehiculo") == {"Fiat": 6, "Ford": 6}
+    assert conteos(ford_1971, "categorias", "nombre_categoria_vehiculo") == {"Auto": 6}
+    assert conteos(ford_1971, "years", "year_vehiculo") == {1970 + r: 6 for r in range(5)}
+
+    # Misma combinación de filtros: sale del TTLCache, sin ir a la base
+    sentencias.clear()
+    assert client.get(url, params={"marca": marcas["Ford"], "año": 1971}).json() == ford_1971
+    assert sentencias == []
@@ -0,0 +1,51 @@
+from sqlalchemy import update
+
+from app.core import config
+from app.db.models import MarcaVehiculo
+
+URL_PUBLICACIONES = "/api/v1/publicacion/"
+
+
+def renombrar(engine, anterior: str, nuevo: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            update(MarcaVehiculo)
+            .where(MarcaVehiculo.nombre_marca_vehiculo == anterior)
+            .values(nombre_marca_vehiculo=nuevo)
+        )
+
+
+def test_renombrar_marca_cambia_etag_y_detalle(client, publicaciones):
+    url = f"{URL_PUBLICACIONES}{publicaciones[0]}"
+    antes = client.get(url)
+    feed = client.get(URL_PUBLICACIONES, params={"limit": 5})
+    id_marca = antes.json()["id_marca_vehiculo"]
+    nombre = antes.json()["nombre_marca_vehiculo"]
+
+    try:
+        assert client.put(f"/api/v1/marca/{id_marca}", json={"nombre_marca_vehiculo": "Renombrada"}).status_code == 200
+
+        despues = client.get(url, headers={"If-None-Match": antes.headers["ETag"]})
+        assert despues.status_code == 200
+        assert despues.json()["nombre_marca_vehiculo"] == "Renombrada"
+        assert client.get(
+            URL_PUBLICACIONES, params={"limit": 5}, headers={"If-None-Match": feed.headers["ETag"]}
+        ).status_code == 200
+    finally:
+        client.put(f"/api/v1/marca/{id_marca}", json={"nombre_marca_vehiculo": nombre})
+
+
+def test_cambio_hecho_por_otra_instancia_vence_con_el_ttl(client, engine, publicaciones, monkeypatch):
+    url = f"{URL_PUBLICACIONES}{publicaciones[0]}"
+    antes = client.get(url)
+    nombre = antes.json()["nombre_marca_vehiculo"]
+
+    # Otra instancia renombra: esta no se entera hasta que vence el TTL del catálogo
+    renombrar(engine, nombre, "Otra")
+    try:
+        monkeypatch.setattr(config, "CATALOG_CACHE_TTL", 0)
+        despues = client.get(url, headers={"If-None-Match": antes.headers["ETag"]})
+        assert despues.status_code == 200
+        assert despues.json()["nombre_marca_vehiculo"] == "Otra"
+    finally:
+        renombrar(engine, "Otra", nombre)
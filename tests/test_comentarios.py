@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, insert, select
+
+from app.db.models import Comentario, Usuario
+
+URL_COMENTARIOS = "/api/v1/comentario/publicacion/{}"
+
+
+def test_paginas_de_comentarios_por_fecha_e_id(client, engine, publicaciones):
+    """
+    Siete comentarios, cinco con la misma fecha: el id desempata, el cursor del
+    header Link sigue justo después del último y la última página no trae Link.
+    """
+    id_publicacion = publicaciones[10]
+    misma = datetime(2024, 3, 1, 12, tzinfo=timezone.utc)
+    fechas = [datetime(2024, 3, 2, tzinfo=timezone.utc), misma, misma, misma, misma, misma,
+              datetime(2024, 2, 1, tzinfo=timezone.utc)]
+    with engine.begin() as conn:
+        id_usuario = conn.scalar(select(Usuario.id_usuario).where(Usuario.nombre_usuario == "ana"))
+        ids = [
+            conn.scalar(
+                insert(Comentario)
+                .values(descripcion_comentario=f"comentario {n}", id_usuario=id_usuario,
+                        id_publicacion=id_publicacion, fecha_creacion=fecha)
+                .returning(Comentario.id_comentario)
+            )
+            for n, fecha in enumerate(fechas)
+        ]
+    esperados = [ids[6], *sorted(ids[1:6]), ids[0]]
+
+    try:
+        vistos, paginas = [], []
+        url, params = URL_COMENTARIOS.format(id_publicacion), {"limit": 3}
+        while url:
+            respuesta = client.get(url, params=params)
+            assert respuesta.status_code == 200
+            cuerpo = respuesta.json()
+            assert isinstance(cuerpo, list)  # el cuerpo sigue siendo la lista de siempre
+            paginas.append(len(cuerpo))
+            vistos.extend(c["id_comentario"] for c in cuerpo)
+            url, params = respuesta.links.get("next", {}).get("url"), None
+
+        assert vistos == esperados
+        assert paginas == [3, 3, 1]
+
+        # Página justa: el límite coincide con lo que queda y no hay Link de más
+        completa = client.get(URL_COMENTARIOS.format(id_publicacion), params={"limit": 7})
+        assert [c["id_comentario"] for c in completa.json()] == esperados
+        assert "link" not in completa.headers
+
+        assert client.get(URL_COMENTARIOS.format(id_publicacion), params={"cursor": "basura"}).status_code == 400
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(Comentario).where(Comentario.id_comentario.in_(ids)))
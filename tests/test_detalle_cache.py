@@ -0,0 +1,123 @@
+import asyncio
+
+import fakeredis
+from sqlalchemy import func, update
+
+from app.db.models import Publicacion
+from app.services.detail_cache import RedisBackend, detalle_cache
+
+URL_PUBLICACIONES = "/api/v1/publicacion/"
+
+
+def cambiar_titulo(engine, id_publicacion: int, titulo: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(update(Publicacion).where(Publicacion.id_publicacion == id_publicacion).values(titulo=titulo))
+
+
+def test_documento_viejo_guardado_tarde_no_se_sirve(client, engine, publicaciones):
+    """Un lector lento que guarda después de la invalidación no deja visible el documento viejo."""
+    id_publicacion = publicaciones[1]
+    url = f"{URL_PUBLICACIONES}{id_publicacion}"
+    titulo = client.get(url).json()["titulo"]
+    clave = detalle_cache._clave(id_publicacion)
+    entrada_vieja = asyncio.run(detalle_cache.backend.get(clave))
+    assert entrada_vieja is not None
+
+    try:
+        cambiar_titulo(engine, id_publicacion, "Nuevo")
+        asyncio.run(detalle_cache.invalidar(id_publicacion))
+        # El lector que leyó antes del UPDATE guarda recién ahora
+        asyncio.run(detalle_cache.backend.set(clave, entrada_vieja))
+
+        assert client.get(url).json()["titulo"] == "Nuevo"
+        asyncio.run(detalle_cache.backend.set(clave, entrada_vieja))
+        lote = client.get(f"{URL_PUBLICACIONES}batch", params={"ids": [id_publicacion]})
+        assert lote.json()["publicaciones"][0]["titulo"] == "Nuevo"
+    finally:
+        cambiar_titulo(engine, id_publicacion, titulo)
+
+
+def test_lote_lee_el_cache_con_un_solo_mget(client, publicaciones, monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    comandos = []
+    for nombre in ("get", "mget"):
+        original = getattr(redis, nombre)
+
+        async def espiar(*args, _nombre=nombre, _original=original, **kwargs):
+            comandos.append(_nombre)
+            return await _original(*args, **kwargs)
+
+        monkeypatch.setattr(redis, nombre, espiar)
+    monkeypatch.setattr(detalle_cache, "backend", RedisBackend("redis://no-usado", ttl=60, cliente=redis))
+    ids = publicaciones[:10]
+
+    primera = client.get(f"{URL_PUBLICACIONES}batch", params={"ids": ids})
+    comandos.clear()
+    segunda = client.get(f"{URL_PUBLICACIONES}batch", params={"ids": ids})
+
+    assert segunda.content == primera.content
+    assert comandos == ["mget"]
+
+
+def test_detalle_una_ida_a_la_base_con_y_sin_cache(client, sentencias, publicaciones):
+    """Fallo: solo select_detalle (trae la versión). Acierto o 304: solo la versión por PK."""
+    id_publicacion = publicaciones[2]
+    url = f"{URL_PUBLICACIONES}{id_publicacion}"
+    client.get(URL_PUBLICACIONES)  # catálogos ya cargados
+    asyncio.run(detalle_cache.invalidar(id_publicacion))
+
+    sentencias.clear()
+    fallo = client.get(url)
+    assert fallo.status_code == 200
+    assert len(sentencias) == 1 and "json_agg" in sentencias[0]
+
+    sentencias.clear()
+    acierto = client.get(url)
+    assert acierto.content == fallo.content and acierto.headers["ETag"] == fallo.headers["ETag"]
+    assert len(sentencias) == 1 and "json_agg" not in sentencias[0]
+
+    asyncio.run(detalle_cache.invalidar(id_publicacion))
+    sentencias.clear()
+    condicional = client.get(url, headers={"If-None-Match": fallo.headers["ETag"]})
+    assert condicional.status_code == 304
+    assert len(sentencias) == 1
+
+
+def test_lote_en_orden_pedido_con_faltantes(client, engine, publicaciones):
+    eliminada = publicaciones[5]
+    with engine.begin() as conn:
+        conn.execute(update(Publicacion).where(Publicacion.id_publicacion == eliminada).values(fecha_eliminacion=func.now()))
+    try:
+        inexistente = max(publicaciones) + 1000
+        ids = [publicaciones[3], inexistente, publicaciones[0], eliminada, publicaciones[7], publicaciones[0]]
+        lote = client.get(f"{URL_PUBLICACIONES}batch", params={"ids": ids}).json()
+
+        assert [p["id"] for p in lote["publicaciones"]] == [publicaciones[3], publicaciones[0], publicaciones[7]]
+        assert lote["faltantes"] == [inexistente, eliminada]
+    finally:
+        with engine.begin() as conn:
+            conn.execute(update(Publicacion).where(Publicacion.id_publicacion == eliminada).values(fecha_eliminacion=None))
+
+
+def test_lote_mezcla_aciertos_y_fallos_del_mget(client, publicaciones, monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(detalle_cache, "backend", RedisBackend("redis://no-usado", ttl=60, cliente=redis))
+    ids = [publicaciones[9], publicaciones[2], publicaciones[6], publicaciones[4]]
+    # Solo dos en cache (una con una versión vieja: cuenta como fallo)
+    client.get(f"{URL_PUBLICACIONES}batch", params={"ids": ids[:2]})
+    clave = detalle_cache._clave(ids[1])
+    _, _, resto = asyncio.run(redis.get(clave)).partition(b"\n")
+    asyncio.run(redis.set(clave, b"2000-01-01T00:00:00+00:00\n" + resto))
+    antes = detalle_cache.stats()
+
+    lote = client.get(f"{URL_PUBLICACIONES}batch", params={"ids": ids})
+
+    despues = detalle_cache.stats()
+    assert despues["hits"] - antes["hits"] == 1
+    assert despues["misses"] - antes["misses"] == 3
+    assert lote.json()["faltantes"] == []
+    assert lote.json()["publicaciones"] == [client.get(f"{URL_PUBLICACIONES}{i}").json() for i in ids]
+    # Los fallos quedaron guardados con su versión: la próxima vez son todos aciertos
+    antes = detalle_cache.stats()
+    client.get(f"{URL_PUBLICACIONES}batch", params={"ids": ids})
+    assert detalle_cache.stats()["hits"] - antes["hits"] == len(ids)
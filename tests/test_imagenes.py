@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from app.core import config
+from app.services.image_service import _procesar_imagen
+from app.services.ingest_service import TIPOS_IMAGEN, detectar_tipo_imagen
+from app.services.storage_service import public_url
+
+
+@pytest.mark.parametrize(
+    "cabecera, tipo",
+    [
+        (b"\xff\xd8\xff\xe0\x00\x10JFIF\x00", "image/jpeg"),
+        (b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0d", "image/png"),
+        (b"RIFF\x00\x00\x00\x00WEBP", "image/webp"),
+        (b"\x00\x00\x00\x1cftypavif", "image/avif"),
+        # HEIC: Pillow no lo decodifica, se rechaza al subir
+        (b"\x00\x00\x00\x18ftypheic", None),
+        (b"<svg xmlns='", None),
+    ],
+)
+def test_detectar_tipo_imagen(cabecera, tipo):
+    assert detectar_tipo_imagen(cabecera) == tipo
+    assert tipo is None or tipo in TIPOS_IMAGEN
+
+
+def test_derivados_no_descargan_objetos_grandes(bucket, monkeypatch):
+    nombre = f"{config.GCS_UPLOAD_PREFIX}grande.jpeg"
+    bucket.blob(nombre).upload_from_string(b"\xff\xd8\xff\xe0" + b"0" * 2 * 1024 * 1024, content_type="image/jpeg")
+    monkeypatch.setattr(config, "MAX_MB_POR_IMAGEN", 1)
+
+    with pytest.raises(ValueError):
+        asyncio.run(_procesar_imagen(public_url(nombre)))
@@ -0,0 +1,85 @@
+from sqlalchemy import delete, insert, select
+
+from app.api.v1.endpoints import like_endpoints
+from app.core import config
+from app.db.models import Comentario, Usuario
+
+URL_LIKE = "/api/v1/like/"
+
+
+def test_like_quitado_entre_insert_y_select_se_reintenta(client, engine, publicaciones, monkeypatch):
+    """ON CONFLICT no insertó, pero el like ya no está al buscarlo: se vuelve a insertar, no un 500."""
+    with engine.connect() as conn:
+        id_usuario = conn.scalar(select(Usuario.id_usuario).where(Usuario.nombre_usuario == "ana"))
+    like = {"id_usuario": id_usuario, "id_publicacion": publicaciones[2]}
+    insertar = like_endpoints.insertar_like
+    intentos = []
+
+    async def conflicto_y_borrado(db, datos):
+        intentos.append(datos)
+        # Primer intento: como si otro request hubiera tenido la fila y la borrara enseguida
+        return None if len(intentos) == 1 else await insertar(db, datos)
+
+    monkeypatch.setattr(like_endpoints, "insertar_like", conflicto_y_borrado)
+    try:
+        respuesta = client.post(URL_LIKE, json=like)
+
+        assert respuesta.status_code == 201
+        assert len(intentos) == 2
+    finally:
+        client.request("DELETE", URL_LIKE, json=like)
+
+
+def test_estado_de_likes_por_lote_solo_para_el_usuario_del_token(client, engine, auth, publicaciones):
+    with engine.begin() as conn:
+        id_usuario = conn.scalar(select(Usuario.id_usuario).where(Usuario.nombre_usuario == "ana"))
+        id_comentario = conn.scalar(
+            insert(Comentario)
+            .values(descripcion_comentario="lindo", id_usuario=id_usuario, id_publicacion=publicaciones[3])
+            .returning(Comentario.id_comentario)
+        )
+    con_like, sin_like = publicaciones[3], publicaciones[4]
+    likes = [{"id_usuario": id_usuario, "id_publicacion": con_like}, {"id_usuario": id_usuario, "id_comentario": id_comentario}]
+    previos = {f["id"]: f["like_count"] for f in client.get(f"{URL_LIKE}publicaciones", params={"ids": [con_like, sin_like]}).json()}
+    for like in likes:
+        assert client.post(URL_LIKE, json=like).status_code == 201
+
+    try:
+        propios = client.get(f"{URL_LIKE}publicaciones", params={"ids": [con_like, sin_like]}, headers=auth).json()
+        assert {f["id"]: (f["like_count"], f["liked"]) for f in propios} == {
+            con_like: (previos[con_like] + 1, True),
+            sin_like: (previos[sin_like], False),
+        }
+        comentarios = client.get(f"{URL_LIKE}comentarios", params={"ids": [id_comentario]}, headers=auth).json()
+        assert comentarios == [{"id": id_comentario, "like_count": 1, "liked": True}]
+
+        # Sin token: contadores sí, estado de nadie (un id_usuario en la query no cuenta)
+        anonimo = client.get(f"{URL_LIKE}publicaciones", params={"ids": [con_like], "id_usuario": id_usuario}).json()
+        assert anonimo == [{"id": con_like, "like_count": previos[con_like] + 1, "liked": False}]
+        assert client.get(f"{URL_LIKE}comentarios", params={"ids": [id_comentario]}).json()[0]["liked"] is False
+
+        demasiados = client.get(f"{URL_LIKE}publicaciones", params={"ids": list(range(1, config.LIKES_BATCH_MAX + 2))})
+        assert demasiados.status_code == 400
+    finally:
+        for like in likes:
+            client.request("DELETE", URL_LIKE, json=like)
+        with engine.begin() as conn:
+            conn.execute(delete(Comentario).where(Comentario.id_comentario == id_comentario))
+
+
+def test_like_repetido_es_400_y_no_suma(client, engine, publicaciones):
+    with engine.connect() as conn:
+        id_usuario = conn.scalar(select(Usuario.id_usuario).where(Usuario.nombre_usuario == "ana"))
+    like = {"id_usuario": id_usuario, "id_publicacion": publicaciones[5]}
+    url_conteo = f"{URL_LIKE}publicaciones"
+    assert client.post(URL_LIKE, json=like).status_code == 201
+
+    try:
+        conteo = client.get(url_conteo, params={"ids": [publicaciones[5]]}).json()[0]["like_count"]
+        repetido = client.post(URL_LIKE, json=like)
+
+        assert repetido.status_code == 400
+        assert repetido.json()["detail"] == "Ya diste like"
+        assert client.get(url_conteo, params={"ids": [publicaciones[5]]}).json()[0]["like_count"] == conteo
+    finally:
+        client.request("DELETE", URL_LIKE, json=like)
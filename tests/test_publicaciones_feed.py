@@ -0,0 +1,39 @@
+URL_FEED = "/api/v1/publicacion/"
+
+
+def test_feed_no_hace_una_query_por_publicacion(client, sentencias, publicaciones):
+    """Marca, categoría y portada vienen en la misma query: la página grande no suma queries."""
+    client.get(URL_FEED)  # catálogos ya cargados: no cuentan en ninguna de las dos
+    por_limite = {}
+    for limit in (5, 50):
+        sentencias.clear()
+        respuesta = client.get(URL_FEED, params={"limit": limit})
+        assert respuesta.status_code == 200
+        tarjetas = respuesta.json()["publicaciones"]
+        assert len(tarjetas) == limit
+        assert all(t["nombre_marca_vehiculo"] and t["nombre_categoria_vehiculo"] and t["url_portada"] for t in tarjetas)
+        por_limite[limit] = len(sentencias)
+
+    assert por_limite[5] == por_limite[50]
+
+
+def test_paginas_con_cursor_no_cuentan(client, sentencias, publicaciones):
+    """El total (count + max sobre todas las filas) va solo en la primera página."""
+    primera = client.get(URL_FEED, params={"limit": 5})
+    assert primera.json()["total"] == len(publicaciones)
+
+    sentencias.clear()
+    siguiente = client.get(URL_FEED, params={"limit": 5, "cursor": primera.json()["next_cursor"]})
+    assert siguiente.status_code == 200
+    assert siguiente.json()["total"] is None
+    assert len(siguiente.json()["publicaciones"]) == 5
+    assert len(sentencias) == 1
+    assert "count(" not in sentencias[0].lower()
+
+    # La página con cursor sigue respondiendo 304 con su propio ETag
+    repetida = client.get(
+        URL_FEED,
+        params={"limit": 5, "cursor": primera.json()["next_cursor"]},
+        headers={"If-None-Match": siguiente.headers["ETag"]},
+    )
+    assert repetida.status_code == 304
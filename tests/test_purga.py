@@ -0,0 +1,51 @@
+import asyncio
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Publicacion
+from app.services import purge_service
+
+
+@pytest.fixture
+def sesiones_async(async_engine, monkeypatch):
+    """La purga abre sus propias sesiones (corre como background task)."""
+    monkeypatch.setattr(purge_service, "AsyncSessionLocal", async_sessionmaker(async_engine, expire_on_commit=False))
+
+
+def eliminada_sin_imagenes(engine, publicaciones) -> int:
+    with sessionmaker(bind=engine)() as db:
+        modelo = db.get(Publicacion, publicaciones[0])
+        publicacion = Publicacion(
+            id_usuario=modelo.id_usuario,
+            descripcion="descripción",
+            fecha_publicacion=date(2024, 1, 1),
+            descripcion_corta="corta",
+            titulo="Eliminada",
+            year_vehiculo=1980,
+            id_categoria_vehiculo=modelo.id_categoria_vehiculo,
+            id_marca_vehiculo=modelo.id_marca_vehiculo,
+            detalle="detalle",
+            fecha_eliminacion=datetime.now(timezone.utc),
+        )
+        db.add(publicacion)
+        db.commit()
+        return publicacion.id_publicacion
+
+
+def test_purga_informa_si_borro_esta_llamada(engine, publicaciones, sesiones_async):
+    id_publicacion = eliminada_sin_imagenes(engine, publicaciones)
+    antes = purge_service.metricas_purga.stats()["publicaciones_purgadas"]
+
+    assert asyncio.run(purge_service.purgar_publicacion(id_publicacion)) is True
+    # Ya purgada: ni True ni métrica
+    assert asyncio.run(purge_service.purgar_publicacion(id_publicacion)) is False
+    # No marcada para eliminar: tampoco
+    assert asyncio.run(purge_service.purgar_publicacion(publicaciones[0])) is False
+
+    assert purge_service.metricas_purga.stats()["publicaciones_purgadas"] == antes + 1
+    with engine.connect() as conn:
+        assert conn.scalar(select(Publicacion.id_publicacion).where(Publicacion.id_publicacion == id_publicacion)) is None
@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1.endpoints import publicacion_endpoints
+from app.core import config
+from app.db.models import Imagen, Publicacion
+from app.services import reconciler, storage_service
+from app.services.storage_service import (
+    StreamUpload, delete_blobs_sin_uso, get_storage_client, parse_gcs_url, run_in_storage_executor, ultimo_uso,
+)
+
+URL_PUBLICACIONES = "/api/v1/publicacion/"
+
+FORMULARIO = {
+    "titulo": "Falcon",
+    "descripcion_corta": "corta",
+    "descripcion": "descripción",
+    "detalle": "detalle",
+    "year_vehiculo": "1980",
+    "id_categoria_vehiculo": "1",
+    "id_marca_vehiculo": "1",
+}
+
+
+def jpeg(relleno: int, tamaño: int) -> bytes:
+    return b"\xff\xd8\xff\xe0" + bytes([relleno]) * tamaño
+
+
+def subir(datos: bytes) -> str:
+    subida = StreamUpload("image/jpeg")
+    subida.write(datos)
+    return subida.finish()
+
+
+def nombres_en(bucket) -> set:
+    return {blob.name for blob in get_storage_client().list_blobs(bucket)}
+
+
+def test_subidas_concurrentes_con_el_cliente_compartido(bucket):
+    async def subir_todas():
+        return await asyncio.gather(*(run_in_storage_executor(subir, jpeg(i, 300_000)) for i in range(8)))
+
+    urls = asyncio.run(subir_todas())
+
+    assert get_storage_client() is get_storage_client()
+    # Cada una en su objeto por contenido y sin temporales
+    assert nombres_en(bucket) == {parse_gcs_url(url)[1] for url in urls}
+    for blob in get_storage_client().list_blobs(bucket):
+        assert blob.content_type == "image/jpeg"
+        assert blob.cache_control == config.GCS_CACHE_CONTROL
+
+
+def test_misma_foto_un_solo_objeto(bucket):
+    assert subir(jpeg(7, 1000)) == subir(jpeg(7, 1000))
+    assert len(nombres_en(bucket)) == 1
+
+
+def test_subida_fallida_borra_lo_ya_subido(client, auth, bucket):
+    """Si una parte falla, las imágenes anteriores del mismo request no quedan en el bucket."""
+    archivos = [
+        ("files", ("a.jpg", jpeg(1, 50_000), "image/jpeg")),
+        ("files", ("b.jpg", jpeg(2, 50_000), "image/jpeg")),
+        ("files", ("c.pdf", b"%PDF-1.4" + b"0" * 100, "image/jpeg")),
+    ]
+    respuesta = client.post(URL_PUBLICACIONES, data=FORMULARIO, files=archivos, headers=auth)
+
+    assert respuesta.status_code == 415
+    assert nombres_en(bucket) == set()
+
+
+def test_urls_firmadas_solo_para_tipos_admitidos(client, auth):
+    respuesta = client.post("/api/v1/upload/signed-urls", json={"content_types": ["image/svg+xml"]}, headers=auth)
+    assert respuesta.status_code == 400
+
+
+def test_registro_rechaza_objetos_que_no_cumplen(client, auth, bucket, publicaciones, monkeypatch):
+    """Al registrar subidas directas se revisan tamaño, tipo declarado y tipo real."""
+    subir_directo = {
+        f"{config.GCS_UPLOAD_PREFIX}a.svg": (b"<svg xmlns='http://www.w3.org/2000/svg'/>", "image/svg+xml"),
+        f"{config.GCS_UPLOAD_PREFIX}b.jpeg": (b"%PDF-1.4" + b"0" * 100, "image/jpeg"),
+        f"{config.GCS_UPLOAD_PREFIX}c.jpeg": (jpeg(3, 2 * 1024 * 1024), "image/jpeg"),
+    }
+    valida = f"{config.GCS_UPLOAD_PREFIX}d.jpeg"
+    for nombre, (datos, content_type) in subir_directo.items():
+        bucket.blob(nombre).upload_from_string(datos, content_type=content_type)
+    bucket.blob(valida).upload_from_string(jpeg(4, 1000), content_type="image/jpeg")
+    monkeypatch.setattr(config, "MAX_MB_POR_IMAGEN", 1)
+
+    respuesta = client.post(
+        f"{URL_PUBLICACIONES}{publicaciones[0]}/imagenes", json={"objetos": [*subir_directo, valida]}, headers=auth
+    )
+
+    assert respuesta.status_code == 400
+    assert sorted(respuesta.json()["detail"]["rechazados"]) == sorted(subir_directo)
+
+
+def test_registro_no_acepta_temporales(client, auth, publicaciones):
+    respuesta = client.post(
+        f"{URL_PUBLICACIONES}{publicaciones[0]}/imagenes",
+        json={"objetos": [f"{config.GCS_UPLOAD_PREFIX}tmp/abc"]},
+        headers=auth,
+    )
+    assert respuesta.status_code == 400
+
+
+def test_fotos_de_un_request_se_cierran_en_paralelo_y_en_orden(client, auth, bucket, engine, monkeypatch):
+    """El cierre de cada foto corre mientras se lee la siguiente; el orden del formulario se mantiene."""
+    en_curso, maximo = 0, 0
+    lock = threading.Lock()
+    finish = StreamUpload.finish
+
+    def finish_lento(self):
+        nonlocal en_curso, maximo
+        with lock:
+            en_curso += 1
+            maximo = max(maximo, en_curso)
+        time.sleep(0.2)
+        try:
+            return finish(self)
+        finally:
+            with lock:
+                en_curso -= 1
+
+    monkeypatch.setattr(StreamUpload, "finish", finish_lento)
+    # Las miniaturas (background task con su propia sesión) no son parte de este test
+    monkeypatch.setattr(publicacion_endpoints, "generar_derivados_imagenes", lambda ids: None)
+    archivos = [("files", (f"{i}.jpg", jpeg(i, 100_000), "image/jpeg")) for i in range(4)]
+    respuesta = client.post(URL_PUBLICACIONES, data=FORMULARIO, files=archivos, headers=auth)
+
+    try:
+        assert respuesta.status_code == 201
+        assert respuesta.json()["imagenes"] == [f"{i}.jpg" for i in range(4)]
+        assert maximo > 1
+        assert len(nombres_en(bucket)) == 4
+    finally:
+        # Fuera del feed de los demás tests (sin pasar por la purga)
+        with engine.begin() as conn:
+            conn.execute(
+                update(Publicacion)
+                .where(Publicacion.id_publicacion == respuesta.json()["id"])
+                .values(fecha_eliminacion=func.now())
+            )
+
+
+def test_objeto_reutilizado_no_se_borra_durante_la_gracia(bucket):
+    url = subir(jpeg(3, 1000))
+    creado = bucket.get_blob(parse_gcs_url(url)[1])
+    assert subir(jpeg(3, 1000)) == url
+
+    reutilizado = bucket.get_blob(parse_gcs_url(url)[1])
+    assert ultimo_uso(reutilizado) > creado.time_created
+    # Otro request lo reutilizó y todavía puede hacer commit: se queda
+    assert delete_blobs_sin_uso([url], timedelta(hours=1)) == ([], [])
+    assert len(nombres_en(bucket)) == 1
+    # Pasada la gracia, sin filas que lo usen, se borra
+    assert delete_blobs_sin_uso([url], timedelta(0)) == ([url], [])
+    assert nombres_en(bucket) == set()
+
+
+def test_reutilizacion_entre_lectura_y_borrado_conserva_el_objeto(bucket, monkeypatch):
+    url = subir(jpeg(4, 1000))
+    get_blob = storage_service.storage.Bucket.get_blob
+
+    def get_blob_y_reutilizar(self, blob_name, *args, **kwargs):
+        leido = get_blob(self, blob_name, *args, **kwargs)
+        subir(jpeg(4, 1000))  # otro request reutiliza el objeto justo después de leerlo
+        return leido
+
+    monkeypatch.setattr(storage_service.storage.Bucket, "get_blob", get_blob_y_reutilizar)
+    assert delete_blobs_sin_uso([url], timedelta(0)) == ([], [])
+    assert len(nombres_en(bucket)) == 1
+
+
+def test_subida_fallida_no_borra_un_objeto_que_reutilizo(client, auth, bucket):
+    """La foto ya estaba (otro request en curso la subió): el rollback de este no la borra."""
+    url_ajena = subir(jpeg(1, 50_000))
+    archivos = [
+        ("files", ("a.jpg", jpeg(1, 50_000), "image/jpeg")),
+        ("files", ("b.jpg", jpeg(2, 50_000), "image/jpeg")),
+        ("files", ("c.pdf", b"%PDF-1.4" + b"0" * 100, "image/jpeg")),
+    ]
+    respuesta = client.post(URL_PUBLICACIONES, data=FORMULARIO, files=archivos, headers=auth)
+
+    assert respuesta.status_code == 415
+    assert nombres_en(bucket) == {parse_gcs_url(url_ajena)[1]}
+
+
+def test_reconciliador_solo_toca_huerfanos_fuera_de_la_gracia(bucket, engine, publicaciones, capsys):
+    viejo = subir(jpeg(5, 1000))
+    time.sleep(3)
+    reciente = subir(jpeg(6, 1000))
+    referenciado = subir(jpeg(7, 1000))
+    with engine.begin() as conn:
+        conn.execute(Imagen.__table__.insert().values(id_publicacion=publicaciones[0], url_foto=referenciado, numero_imagen=9))
+    gracia = timedelta(seconds=2)
+
+    try:
+        with sessionmaker(bind=engine)() as db:
+            informe = reconciler.reconciliar(db, "", gracia, borrar=False)
+            listados = [linea.split()[1] for linea in capsys.readouterr().out.splitlines() if linea.startswith("huérfano:")]
+            assert listados == [viejo]
+            assert informe["huerfanos"] == 1 and informe["recientes"] == 1 and informe["referenciados"] == 1
+            assert informe["borrados"] == 0
+            assert len(nombres_en(bucket)) == 3
+
+            borrado = reconciler.reconciliar(db, "", gracia, borrar=True)
+        assert borrado["borrados"] == 1 and borrado["fallidos"] == 0
+        assert nombres_en(bucket) == {parse_gcs_url(reciente)[1], parse_gcs_url(referenciado)[1]}
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(Imagen).where(Imagen.url_foto == referenciado))